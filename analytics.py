@@ -0,0 +1,219 @@
+"""Per-test analytics for the report: how hard each test was and how its marks spread.
+
+per_test_stats() takes every number from the test x student score matrix in one vectorized pass:
+attendance, mean %, pass rate, percentile bands (read off one row-wise sort) and the score
+histogram of every test (one bincount). Nothing loops over the tests.
+
+The charts are drawn straight from those arrays with numpy into Pillow images (a pixel column
+knows which test it belongs to, so 100+ tests cost no more than 5) and kept process-wide by a
+fingerprint of the numbers they show: a rerun, a new title or another profile's download reuses
+the image. Axes and labels are drawn as PDF text around the image, so they stay sharp.
+"""
+import math
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+from reportlab.lib import colors
+from reportlab.lib.units import mm
+from reportlab.platypus import Flowable
+
+import image_readers
+import instrument
+from scoring import build_score_matrix
+from config import COLOR_BLUE_HEADER
+
+PERCENTILES = (10, 25, 50, 75, 90)
+HIST_BINS = 10           # 0-10%, 10-20%, ... 90-100% (above 100% counts in the top bin)
+CHART_CACHE_SIZE = 24    # chart images kept; a month's report has three per profile
+CHART_HEIGHT_PX = 240    # 100% spread over this many pixel rows, whatever the print size
+
+# Plot colours: the zone bands under the spread chart, and the solid pass-rate bars (green, yellow, red)
+ZONE_TINTS = ("#E8F5E9", "#FFFDE7", "#FFEBEE")
+ZONE_SOLID = ("#43A047", "#F9A825", "#E53935")
+SPREAD_OUTER = "#A9C4DC"
+SPREAD_MEDIAN = "#0B2942"
+ATTENDANCE_BAR = "#CFD4DB"
+
+_charts = OrderedDict()
+_charts_lock = threading.Lock()
+
+
+def _percentile_rows(values, present, qs):
+    # Linear-interpolated percentiles of every row at once: NaN sorts to the end of its row, so a
+    # row's first `present` entries are its marks in order (same method as np.percentile)
+    ordered = np.sort(values, axis=1)
+    pos = np.asarray(qs, dtype=float)[:, None] / 100 * np.maximum(present - 1, 0)[None, :]
+    lo = np.floor(pos).astype(int)
+    hi = np.minimum(lo + 1, np.maximum(present - 1, 0)[None, :])
+    rows = np.arange(len(values))[None, :]
+    low, high = ordered[rows, lo], ordered[rows, hi]
+    out = low + (high - low) * (pos - lo)
+    out[:, present == 0] = np.nan
+    return out
+
+def per_test_stats(per_file_data, thresh_yellow):
+    """Per-test numbers, each an array with one entry per test in upload order.
+
+    "max", "present", "attendance" (% of the class), "mean" and "pass" (% of those present scoring
+    >= thresh_yellow), "percentiles" (len(PERCENTILES) x tests, % of the max), "hist" (tests x
+    HIST_BINS counts), plus "tests", "students" and "fingerprint" (hash of all of the above).
+    """
+    with instrument.stage("analytics.stats", tests=len(per_file_data)) as s:
+        students, matrix = build_score_matrix(per_file_data)
+        s.add(students=len(students))
+        maxes = np.array([f['file_max'] for f in per_file_data], dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = matrix / np.where(maxes > 0, maxes, np.nan)[:, None] * 100
+        taken = ~np.isnan(pct)
+        present = taken.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(present > 0, np.nansum(pct, axis=1) / present, np.nan)
+            passed = np.where(present > 0, (pct >= thresh_yellow).sum(axis=1) / present * 100, np.nan)
+            attendance = present / len(students) * 100 if len(students) else np.zeros(len(maxes))
+
+        bins = np.clip(np.floor(pct[taken] / (100 / HIST_BINS)), 0, HIST_BINS - 1).astype(int)
+        test_of = np.nonzero(taken)[0]
+        hist = np.bincount(test_of * HIST_BINS + bins, minlength=len(maxes) * HIST_BINS).reshape(len(maxes), HIST_BINS)
+
+        stats = {"tests": len(maxes), "students": len(students), "max": maxes, "present": present,
+                 "attendance": attendance, "mean": mean, "pass": passed,
+                 "percentiles": _percentile_rows(pct, present, PERCENTILES), "hist": hist}
+        h = hashlib.sha256(repr((thresh_yellow, len(maxes), len(students))).encode())
+        for name in ("max", "present", "attendance", "mean", "pass", "percentiles", "hist"):
+            h.update(np.ascontiguousarray(stats[name]).tobytes())
+        stats["fingerprint"] = h.hexdigest()
+    return stats
+
+def difficulty_bands(mean, thresh_green, thresh_yellow):
+    """0 easy (mean in the green zone), 1 moderate, 2 hard, per test; a test nobody sat counts as hard."""
+    return np.select([mean >= thresh_green, mean >= thresh_yellow], [0, 1], 2)
+
+# ---------------- CHART IMAGES ----------------
+def _rgb(color):
+    if isinstance(color, str): color = colors.HexColor(color)
+    return np.array([round(v * 255) for v in color.rgb()], dtype=np.uint8)
+
+def _grid(tests, width, height):
+    # Which test every pixel column shows (with a gap between bars when they are wide enough),
+    # and the percentage at the centre of every pixel row, top row 100%
+    x = np.arange(width)
+    test = (x * tests) // width
+    frac = x * tests / width - test
+    gap = frac >= 0.8 if width >= 5 * tests else np.zeros(width, dtype=bool)
+    level = 100 - (np.arange(height) + 0.5) / height * 100
+    return test, gap, level[:, None]
+
+def _spread_chart(stats, thresh_yellow, thresh_green, width, height):
+    test, gap, level = _grid(stats["tests"], width, height)
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    zone = np.select([level >= thresh_green, level >= thresh_yellow], [0, 1], 2)[:, 0]
+    img[:] = np.stack([_rgb(c) for c in ZONE_TINTS])[zone][:, None, :]
+    p10, p25, p50, p75, p90 = stats["percentiles"][:, test]
+    half_px = 100 / height   # the median line is two pixel rows thick
+    for lo, hi, color in ((p10, p90, SPREAD_OUTER), (p25, p75, COLOR_BLUE_HEADER), (p50 - half_px, p50 + half_px, SPREAD_MEDIAN)):
+        img[(level >= lo) & (level <= hi) & ~gap] = _rgb(color)
+    return img
+
+def _distribution_chart(stats, thresh_yellow, thresh_green, width, height):
+    test, gap, level = _grid(stats["tests"], width, height)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        share = np.nan_to_num(stats["hist"] / stats["present"][:, None])
+    top = share.max() or 1.0
+    bins = np.clip((level[:, 0] // (100 / HIST_BINS)).astype(int), 0, HIST_BINS - 1)
+    weight = (share[test][:, bins].T / top)[:, :, None]
+    img = (255 * (1 - weight) + _rgb(COLOR_BLUE_HEADER) * weight).astype(np.uint8)
+    img[:, gap] = 255
+    for thresh in (thresh_yellow, thresh_green):
+        row = min(height - 1, max(0, round((100 - thresh) / 100 * height)))
+        img[row] = _rgb(colors.gray)
+    return img
+
+def _participation_chart(stats, thresh_yellow, thresh_green, width, height):
+    test, gap, level = _grid(stats["tests"], width, height)
+    img = np.full((height, width, 3), 255, dtype=np.uint8)
+    img[(level <= stats["attendance"][test]) & ~gap] = _rgb(ATTENDANCE_BAR)
+    # Pass rate as a narrower bar inside the attendance one, in the colour of the test's difficulty
+    frac = np.arange(width) * stats["tests"] / width - test
+    inner = (frac >= 0.2) & (frac < 0.6) if width >= 5 * stats["tests"] else ~gap
+    band = difficulty_bands(stats["mean"], thresh_green, thresh_yellow)[test]
+    solid = np.stack([_rgb(c) for c in ZONE_SOLID])[band]
+    mask = (level <= np.nan_to_num(stats["pass"])[test]) & inner
+    img[mask] = np.broadcast_to(solid, (height, width, 3))[mask]
+    return img
+
+_CHARTS = {"spread": _spread_chart, "distribution": _distribution_chart, "participation": _participation_chart}
+
+def chart_reader(kind, stats, thresh_yellow, thresh_green, width_px):
+    """Process-wide image of one chart, drawn once per fingerprint, threshold and size."""
+    key = (kind, stats["fingerprint"], thresh_yellow, thresh_green, width_px)
+    with _charts_lock:
+        if key in _charts:
+            _charts.move_to_end(key)
+            instrument.count("analytics.charts.cached", charts=1)
+            return _charts[key]
+    with instrument.stage("analytics.charts", charts=1):
+        img = _CHARTS[kind](stats, thresh_yellow, thresh_green, width_px, CHART_HEIGHT_PX)
+        reader = image_readers.SharedImageReader(Image.fromarray(img, "RGB"))
+    with _charts_lock:
+        reader = _charts.setdefault(key, reader)
+        while len(_charts) > CHART_CACHE_SIZE: _charts.popitem(last=False)
+    return reader
+
+def clear_caches():
+    with _charts_lock: _charts.clear()
+
+# ---------------- CHART PAGE ----------------
+CHARTS = (
+    ("spread", "SCORE SPREAD PER TEST (% OF MAX)", "light: 10th-90th percentile  ·  dark: 25th-75th  ·  line: median  ·  background: zones"),
+    ("distribution", "SCORE DISTRIBUTION PER TEST", "darker = more of those present scored in that 10% band  ·  lines: zone thresholds"),
+    ("participation", "ATTENDANCE AND PASS RATE PER TEST (%)", "grey: attendance  ·  coloured: pass rate, green easy / yellow moderate / red hard"),
+)
+
+class ChartPage(Flowable):
+    """The three per-test charts stacked, each with its heading, axes and key."""
+    HEADING_H = 11 * mm
+    AXIS_W = 9 * mm
+    LABELS_H = 5 * mm
+    GAP_H = 4 * mm
+
+    def __init__(self, stats, thresh_yellow, thresh_green, width, height, dpi):
+        super().__init__()
+        self.stats, self.thresh_yellow, self.thresh_green = stats, thresh_yellow, thresh_green
+        self.width, self.height = width, height
+        self.plot_w = width - self.AXIS_W
+        self.plot_h = (height - len(CHARTS) * (self.HEADING_H + self.LABELS_H + self.GAP_H))
+        self.plot_h = self.plot_h / len(CHARTS)
+        # One pixel column per printed dot at the profile's dpi, never fewer than one per test
+        self.width_px = max(stats["tests"], round(self.plot_w / 72.0 * dpi))
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        c = self.canv
+        tests = self.stats["tests"]
+        step = max(1, math.ceil(tests / 25))   # test numbers along the bottom, at most ~25 of them
+        # A white panel like the tables' cells, so the charts read the same over any background
+        c.setFillColor(colors.white); c.rect(-2*mm, -2*mm, self.width + 4*mm, self.height + 2*mm, stroke=0, fill=1)
+        y = self.height
+        for kind, heading, key in CHARTS:
+            y -= self.HEADING_H
+            c.setFillColor(COLOR_BLUE_HEADER); c.setFont("Helvetica-Bold", 10)
+            c.drawString(0, y + 6.5*mm, heading)
+            c.setFillColor(colors.gray); c.setFont("Helvetica", 6.5)
+            c.drawString(0, y + 2.5*mm, key)
+            y -= self.plot_h
+            reader = chart_reader(kind, self.stats, self.thresh_yellow, self.thresh_green, self.width_px)
+            c.drawImage(reader, self.AXIS_W, y, width=self.plot_w, height=self.plot_h)
+            c.setStrokeColor(colors.HexColor("#666666")); c.setLineWidth(0.5)
+            c.rect(self.AXIS_W, y, self.plot_w, self.plot_h)
+            c.setFillColor(colors.black); c.setFont("Helvetica", 6)
+            for v in (0, 25, 50, 75, 100):
+                c.drawRightString(self.AXIS_W - 1.5*mm, y + v / 100 * self.plot_h - 2, f"{v}%")
+            col_w = self.plot_w / tests
+            for t in range(0, tests, step):
+                c.drawCentredString(self.AXIS_W + (t + 0.5) * col_w, y - 3.5*mm, str(t + 1))
+            y -= self.LABELS_H + self.GAP_H
@@ -0,0 +1,213 @@
+"""Image assets (background, logo, signature, award characters) from Google Drive.
+
+Lookup order for every asset:
+  1. in-process memory (a rerun or a second session costs nothing)
+  2. local asset directory (SCORECARD_ASSET_DIR) - files named <file_id>.* or <name>.*
+  3. on-disk cache (SCORECARD_ASSET_CACHE) - content addressed, shared by all worker processes
+  4. Google Drive, fetched concurrently over one pooled session (skipped when SCORECARD_OFFLINE=1)
+
+Every download is kept in the content-addressed cache, so once each asset has been fetched the app
+runs with SCORECARD_OFFLINE=1 and never touches the network.
+"""
+import os
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import instrument
+
+ASSET_CACHE_DIR = os.environ.get("SCORECARD_ASSET_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "murlidhar-scorecard", "assets"))
+LOCAL_ASSET_DIR = os.environ.get("SCORECARD_ASSET_DIR", "")
+OFFLINE = os.environ.get("SCORECARD_OFFLINE", "").strip().lower() in ("1", "true", "yes")
+
+FETCH_TIMEOUT = (5, 20)   # (connect, read) seconds
+MAX_WORKERS = 8
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png')
+PRINT_DPI = 300
+
+_memory = {}
+_memory_lock = threading.Lock()
+_names = {}
+_readers = {}
+_readers_lock = threading.Lock()
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_drive_url(file_id):
+    return f'https://drive.google.com/uc?export=download&id={file_id}'
+
+def _get_session():
+    global _session
+    import requests
+    from requests.adapters import HTTPAdapter
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS)
+            _session.mount("https://", adapter)
+    return _session
+
+# ---------------- LOCAL DIRECTORY ----------------
+def read_local_asset(name, file_id, local_dir=None):
+    local_dir = LOCAL_ASSET_DIR if local_dir is None else local_dir
+    if not local_dir or not os.path.isdir(local_dir): return None
+    wanted = {file_id.lower(), name.lower()}
+    for fname in sorted(os.listdir(local_dir)):
+        stem, ext = os.path.splitext(fname)
+        if ext.lower() in IMAGE_EXTS and stem.lower() in wanted:
+            with open(os.path.join(local_dir, fname), 'rb') as f:
+                return f.read()
+    return None
+
+# ---------------- DISK CACHE ----------------
+def _object_path(digest, cache_dir):
+    return os.path.join(cache_dir, "objects", digest[:2], digest)
+
+def _ref_path(file_id, cache_dir):
+    return os.path.join(cache_dir, "refs", file_id)
+
+def _atomic_write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'wb') as f: f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp): os.remove(tmp)
+        raise
+
+def read_cached_asset(file_id, cache_dir=None):
+    cache_dir = cache_dir or ASSET_CACHE_DIR
+    try:
+        with open(_ref_path(file_id, cache_dir)) as f: digest = f.read().strip()
+        with open(_object_path(digest, cache_dir), 'rb') as f: data = f.read()
+    except OSError:
+        return None
+    # A torn or tampered object is treated as a miss and re-downloaded
+    return data if hashlib.sha256(data).hexdigest() == digest else None
+
+def write_cached_asset(file_id, data, cache_dir=None):
+    cache_dir = cache_dir or ASSET_CACHE_DIR
+    digest = hashlib.sha256(data).hexdigest()
+    try:
+        if not os.path.exists(_object_path(digest, cache_dir)):
+            _atomic_write(_object_path(digest, cache_dir), data)
+        _atomic_write(_ref_path(file_id, cache_dir), digest.encode())
+    except OSError as e:
+        print(f"Could not cache asset {file_id}: {e}")
+
+# ---------------- DOWNLOAD ----------------
+def download_from_drive(file_id):
+    import requests
+    try:
+        response = _get_session().get(get_drive_url(file_id), allow_redirects=True, timeout=FETCH_TIMEOUT)
+        if response.status_code == 200:
+            return response.content
+        return None
+    except requests.RequestException as e:
+        print(f"Error downloading {file_id}: {e}")
+        return None
+
+def register_assets(assets):
+    """Remember {name: file_id} so lookups by ID alone can still find <name>.* in the local folder."""
+    with _memory_lock:
+        for name, file_id in assets.items(): _names.setdefault(file_id, name)
+
+def load_asset(name, file_id, offline=None, local_dir=None, cache_dir=None):
+    """Bytes for one asset, or None if it is not available anywhere."""
+    offline = OFFLINE if offline is None else offline
+    with _memory_lock:
+        _names.setdefault(file_id, name)
+        if file_id in _memory: return _memory[file_id]
+
+    data = read_local_asset(name, file_id, local_dir) or read_cached_asset(file_id, cache_dir)
+    if data is None and not offline:
+        with instrument.stage("assets.download", files=1) as s:
+            data = download_from_drive(file_id)
+            if data: s.add(bytes=len(data))
+        if data: write_cached_asset(file_id, data, cache_dir)
+
+    if data:
+        with _memory_lock: _memory[file_id] = data
+    return data
+
+def fetch_assets(assets, offline=None, local_dir=None, cache_dir=None):
+    """{name: file_id} -> {name: bytes or None}, all lookups run concurrently."""
+    if not assets: return {}
+    with instrument.stage("assets.fetch", files=len(assets)), ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(assets))) as pool:
+        futures = {name: pool.submit(instrument.propagate(load_asset), name, file_id, offline, local_dir, cache_dir) for name, file_id in assets.items()}
+        return {name: fut.result() for name, fut in futures.items()}
+
+# ---------------- BACKGROUND PREFETCH ----------------
+_prefetch = None
+_prefetch_lock = threading.Lock()
+
+def prefetch_assets(assets, offline=None, local_dir=None, cache_dir=None):
+    """Starts fetch_assets() on a background thread, once per process; returns its Future.
+
+    The app calls this after its first paint and only waits (wait_for_assets) when a render needs
+    the images, so a slow Drive never holds up the page.
+    """
+    global _prefetch
+    with _prefetch_lock:
+        if _prefetch is None:
+            _prefetch = Future()
+            _prefetch.set_running_or_notify_cancel()
+            threading.Thread(target=_run_prefetch, args=(_prefetch, assets, offline, local_dir, cache_dir),
+                             name="asset-prefetch", daemon=True).start()
+        return _prefetch
+
+def _run_prefetch(future, assets, offline, local_dir, cache_dir):
+    try:
+        future.set_result(fetch_assets(assets, offline, local_dir, cache_dir))
+    except BaseException as e:
+        future.set_exception(e)
+
+def prefetched_status():
+    """{name: available} once the background fetch has finished, None while it is still running."""
+    future = _prefetch
+    if future is None or not future.done(): return None
+    if future.exception() is not None: return {}
+    return {name: bool(data) for name, data in future.result().items()}
+
+def wait_for_assets(timeout=None):
+    """Blocks until the background fetch (if any) is done; lookups then come straight from memory."""
+    future = _prefetch
+    if future is None: return
+    with instrument.stage("assets.wait"):
+        try:
+            future.result(timeout)
+        except Exception as e:
+            # Renders go on without the missing images, as they do when Drive is unreachable
+            print(f"Background asset fetch failed: {e}")
+
+# ---------------- IMAGE READERS ----------------
+def get_image_reader(file_id, opacity=None, size=None, dpi=PRINT_DPI, jpeg_quality=None, binary_alpha=False):
+    """Process-wide ImageReader for an asset, or None if the asset is unavailable.
+
+    opacity: None draws the image as it is, otherwise the alpha channel is scaled by it.
+    size: (width, height) in points of the box it is drawn into; larger images are downsampled to dpi.
+    jpeg_quality: re-encode every opaque image as JPEG at this quality (None keeps them as they are).
+    binary_alpha: give cut-outs whose alpha is only ever 0 or 255 a 1-bit mask instead of an 8-bit one.
+    """
+    key = (file_id, opacity, tuple(round(v, 2) for v in size) if size else None, dpi, jpeg_quality, binary_alpha)
+    with _readers_lock:
+        if key in _readers: return _readers[key]
+    data = load_asset(_names.get(file_id, file_id), file_id)
+    if not data: return None
+    # numpy, PIL and reportlab load with the first image a render asks for, not with the page
+    from image_readers import build_reader
+    try:
+        with instrument.stage("assets.decode", images=1):
+            reader = build_reader(data, opacity, size, dpi, jpeg_quality, binary_alpha)
+    except Exception as e:
+        print(f"Error processing image {file_id}: {e}")
+        return None
+    with _readers_lock:
+        return _readers.setdefault(key, reader)
+
+def reader_options(profile):
+    """get_image_reader() keyword arguments for an output profile (config.OUTPUT_PROFILES)."""
+    return {"dpi": profile["dpi"], "jpeg_quality": profile["jpeg_quality"], "binary_alpha": profile["binary_alpha"]}
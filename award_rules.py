@@ -0,0 +1,85 @@
+"""Who wins which award: a rule table evaluated in one vectorized pass over out_df.
+
+The certificates (one page per winner) and the report's Hall of Fame (winners per award) both
+read select_winners(), so the two documents always name the same students.
+
+A rule picks students by any of
+  ranks        (first, last) rank, inclusive; None leaves that side open
+  percentage   (from, below) zone, "yellow" / "green" thresholds; from inclusive, below exclusive
+  attendance   (from, below) share of tests present; (1.0, None) is full attendance
+  top          keep only the N highest Obtained; ties "include" everyone level with the N-th,
+               "drop" cuts at exactly N
+"""
+import numpy as np
+
+from config import COLOR_BLUE_HEADER, COLOR_SAFFRON, COLOR_GOLD
+
+AWARD_RULES = (
+    {"key": "VIKRAMADITYA", "ranks": (1, 1), "color": COLOR_GOLD,
+     "title": "THE VIKRAMADITYA EXCELLENCE AWARD", "name": "Vikramaditya Excellence Award",
+     "certificate": "Like the legendary King Vikramaditya, known for his wisdom and victory, you have conquered this challenge with supreme excellence! Your hard work has placed you at the very top. Keep ruling!",
+     "hall_of_fame": "The Batch Topper (Rank 1). Awarded for ruling the result sheet with the highest score and supreme excellence."},
+    {"key": "CHANAKYA", "ranks": (2, 2), "color": COLOR_BLUE_HEADER,
+     "title": "THE CHANAKYA NITI AWARD", "name": "Chanakya Niti Award",
+     "certificate": "With the sharp intellect of Acharya Chanakya, you have proven that strategy determines success. Your outstanding intelligence and dedication have secured you the prestigious 2nd Rank.",
+     "hall_of_fame": "The Intellectual Strategist (Rank 2). Awarded for sharp intelligence and securing the second-highest position."},
+    {"key": "ARJUNA", "ranks": (3, 3), "color": COLOR_SAFFRON,
+     "title": "THE ARJUNA FOCUS AWARD", "name": "Arjuna Focus Award",
+     "certificate": "Just like Arjuna saw only the bird's eye, your laser-sharp focus and precision have hit the mark! This award celebrates your unwavering concentration and excellent performance (Rank 3).",
+     "hall_of_fame": "The Focused Archer (Rank 3). Awarded for unwavering focus, precision, and hitting the target score."},
+    {"key": "DHRUVA", "ranks": (4, 5), "color": COLOR_BLUE_HEADER,
+     "title": "THE DHRUVA TARA AWARD", "name": "Dhruva Tara Award",
+     "certificate": "Like the eternal Dhruva Tara (Pole Star), your performance shines bright with stability and consistency. You are a rising star with immense potential to lead the sky!",
+     "hall_of_fame": "The Shining Stars (Rank 4 & 5). Awarded for maintaining a high position consistently like the eternal Pole Star."},
+    {"key": "KARNA", "ranks": (6, 10), "color": COLOR_SAFFRON,
+     "title": "THE KARNA VEERTA AWARD", "name": "Karna Veerta Award",
+     "certificate": "A true warrior is defined by their spirit! Like Maharathi Karna, you fought bravely and showed immense talent. You are just steps away from the top. Keep fighting, victory is yours!",
+     "hall_of_fame": "The Brave Warriors (Rank 6 to 10). Talented fighters who fought hard and missed the top 5 by a narrow margin."},
+    {"key": "ANGAD", "ranks": (11, None), "percentage": ("yellow", None), "attendance": (1.0, None), "top": 5, "ties": "include",
+     "color": COLOR_BLUE_HEADER, "title": "THE ANGAD STAMBH AWARD", "name": "Angad Stambh Award",
+     "certificate": "Firm as Angad's foot in Ravana's court! Your unshakeable discipline and 100% Attendance prove that consistency is the key to success. You stood firm in every test!",
+     "hall_of_fame": "The Unmovable Pillar. 100% Attendance & Passing All Tests. They stood firm in every exam!"},
+    {"key": "BHAGIRATH", "ranks": (11, None), "percentage": ("yellow", "green"), "attendance": (0.8, 1.0), "top": 5, "ties": "include",
+     "color": COLOR_SAFFRON, "title": "THE BHAGIRATH PRAYAS AWARD", "name": "Bhagirath Prayas Award",
+     "certificate": "Like Bhagirath's relentless penance to bring Ganga to Earth, your hard work and persistence are truly inspiring. This award honors your 'Never Give Up' attitude and continuous improvement.",
+     "hall_of_fame": "The Relentless Effort. High Attendance & Hard Work. Students striving to turn the tide and improve."},
+)
+
+_OPEN = (None, None)
+
+
+def _within(values, bounds, last_inclusive=False):
+    # (rules x students): every rule's (from, below) bounds against one column; None is unbounded
+    lo = np.array([-np.inf if b[0] is None else b[0] for b in bounds], dtype=float)[:, None]
+    hi = np.array([np.inf if b[1] is None else b[1] for b in bounds], dtype=float)[:, None]
+    above = (values >= lo) | np.isneginf(lo)   # an open side also lets NaN through
+    below = ((values <= hi) if last_inclusive else (values < hi)) | np.isposinf(hi)
+    return above & below
+
+def eligible(out_df, thresh_yellow, thresh_green, rules=AWARD_RULES):
+    """(rules x students) boolean matrix: who meets each rule's conditions, before any top-N cut."""
+    zones = {"yellow": thresh_yellow, "green": thresh_green, None: None}
+    rank = out_df['Rank'].to_numpy(dtype=float)
+    pct = out_df['Percentage'].to_numpy(dtype=float)
+    attendance = out_df['Present'].to_numpy(dtype=float) / out_df['Total Tests'].to_numpy(dtype=float)
+    return (_within(rank, [r.get("ranks", _OPEN) for r in rules], last_inclusive=True)
+            & _within(pct, [tuple(zones[z] for z in r.get("percentage", _OPEN)) for r in rules])
+            & _within(attendance, [r.get("attendance", _OPEN) for r in rules]))
+
+def _top(positions, obtained, n, ties):
+    # Best Obtained first; a stable sort keeps students on the same score in out_df (rank) order
+    order = positions[np.argsort(-obtained[positions], kind='stable')]
+    if len(order) <= n: return order
+    if ties == "drop": return order[:n]
+    return order[obtained[order] >= obtained[order[n - 1]]]
+
+def select_winners(out_df, thresh_yellow, thresh_green, rules=AWARD_RULES):
+    """[(rule, winners)] in rule order for every award someone won; winners is a slice of out_df in award order."""
+    mask = eligible(out_df, thresh_yellow, thresh_green, rules)
+    obtained = out_df['Obtained'].to_numpy(dtype=float)
+    winners = []
+    for rule, row in zip(rules, mask):
+        positions = np.flatnonzero(row)
+        if rule.get("top") is not None: positions = _top(positions, obtained, rule["top"], rule.get("ties", "include"))
+        if len(positions): winners.append((rule, out_df.iloc[positions]))
+    return winners
@@ -0,0 +1,83 @@
+"""Report card throughput: cards per second for the indexed PDF and the per-student ZIP.
+
+For every class size a synthetic month is generated (benchmarks/synthetic.py), aggregated, and
+its report cards rendered both ways; the ZIP once per --workers value, so the scaling across
+render_pool's processes shows up next to the single-process PDF. The pool is started and the
+images decoded by an untimed warm-up, so neither is charged to the first class.
+
+Usage:
+    python -m benchmarks.cards [--students 300,3000] [--tests 30] [--workers 1,4]
+                               [--profile print] [--offline] [--asset-dir DIR]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import assets
+import scoring
+import render_pool
+import report_cards
+from config import ASSET_IDS, OUTPUT_PROFILES, DEFAULT_PROFILE
+from benchmarks.run import THRESH_YELLOW, THRESH_GREEN, REPORT_TITLE, parse_grid
+from benchmarks.synthetic import generate_class
+
+
+class _Counter:
+    # Stands in for the output file: only the byte count matters here
+    def __init__(self): self.bytes = 0
+    def write(self, data): self.bytes += len(data); return len(data)
+    def flush(self): pass
+    def tell(self): return self.bytes
+
+def time_cards(out_df, per_file_data, profile, workers=None):
+    """(seconds, bytes) for one render; workers=None renders the single indexed PDF."""
+    sink = _Counter() if workers is None else tempfile.TemporaryFile()
+    t = time.perf_counter()
+    if workers is None:
+        report_cards.write_report_cards_pdf(out_df, per_file_data, THRESH_YELLOW, THRESH_GREEN, REPORT_TITLE, sink, profile)
+        size = sink.bytes
+    else:
+        with sink:   # zipfile needs a seekable file
+            report_cards.write_report_cards_zip(out_df, per_file_data, THRESH_YELLOW, THRESH_GREEN, REPORT_TITLE, sink, workers, profile)
+            size = sink.tell()
+    return time.perf_counter() - t, size
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time report card rendering (indexed PDF and per-student ZIP) over class sizes.")
+    parser.add_argument("--students", type=parse_grid, default=[300, 3000], help="comma separated, e.g. 300,3000")
+    parser.add_argument("--tests", type=int, default=30)
+    parser.add_argument("--workers", type=parse_grid, default=sorted({1, render_pool.RENDER_WORKERS}), help="ZIP render processes to try, comma separated")
+    parser.add_argument("--profile", choices=list(OUTPUT_PROFILES), default=DEFAULT_PROFILE)
+    parser.add_argument("--offline", action="store_true", default=assets.OFFLINE, help="never download images")
+    parser.add_argument("--asset-dir", default=None, help="local folder with the images")
+    args = parser.parse_args(argv)
+
+    assets.OFFLINE = args.offline
+    if args.asset_dir: assets.LOCAL_ASSET_DIR = args.asset_dir
+    assets.register_assets(ASSET_IDS)
+    missing = [name for name, data in assets.fetch_assets(ASSET_IDS).items() if not data]
+    if missing: print(f"Warning: images not available, cards are rendered without: {', '.join(missing)}", file=sys.stderr)
+
+    data_dir = tempfile.mkdtemp(prefix="scorecard-cards-")
+    try:
+        per_file_data, _ = scoring.load_score_files(generate_class(os.path.join(data_dir, "warmup"), 2 * report_cards.CHUNK_SIZE, 3))
+        out_df, _ = scoring.aggregate_scores(per_file_data)
+        for workers in args.workers: time_cards(out_df, per_file_data, args.profile, workers)
+        for students in args.students:
+            paths = generate_class(os.path.join(data_dir, f"s{students}"), students, args.tests, seed=students)
+            per_file_data, _ = scoring.load_score_files(paths)
+            out_df, _ = scoring.aggregate_scores(per_file_data)
+            for workers in [None] + args.workers:
+                seconds, size = time_cards(out_df, per_file_data, args.profile, workers)
+                what = "indexed pdf" if workers is None else f"zip, {workers} proc"
+                print(f"  {students:>6} x {args.tests:<4} {what:<14} {seconds:8.2f}s  {students / seconds:8.0f} cards/s  {size / 2**20:8.2f} MB", flush=True)
+    finally:
+        render_pool.shutdown()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""Load test for the result lookup service (lookup.py): latency percentiles under concurrency.
+
+Without --url a synthetic class of --students is published and served in this process; with
+--url an already running service is hammered, using names it returns from /search. Every
+--concurrency client thread keeps one HTTP/1.1 connection open and sends requests back to back,
+drawn from the mix: point lookups of real names, prefix searches (the first letters of a
+name) and fuzzy searches (a name with one letter dropped).
+
+Reported per request kind: p50 / p90 / p99 / p99.9 / max round-trip latency and throughput,
+plus the in-process time of a bare ResultIndex.get() (what a point lookup costs the server).
+
+Usage:
+    python -m benchmarks.lookup [--students 10000] [--concurrency 200] [--requests 20000]
+                                [--mix point=0.8,prefix=0.1,fuzzy=0.1] [--url http://127.0.0.1:8765] [--json out.json]
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit, quote
+
+import numpy as np
+
+import lookup
+from scoring import results_table
+from benchmarks.synthetic import make_students
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def synthetic_results(students, seed=0):
+    """A ranked out_df of `students` synthetic names, as aggregate_scores() would build it."""
+    rng = random.Random(seed)
+    names = [name.lower() for name, _, _ in make_students(students, rng)]
+    gen = np.random.default_rng(seed)
+    tests = 30
+    present = gen.integers(15, tests + 1, size=students)
+    obtained = np.round(gen.random(students) * present * 40, 1)
+    return results_table(np.array(names, dtype=object), present, obtained, tests, tests * 50)
+
+def make_requests(names, count, mix, seed=0):
+    """[(kind, path)] drawn from mix {kind: share}."""
+    rng = random.Random(seed)
+    kinds, weights = zip(*mix.items())
+    reqs = []
+    for kind in rng.choices(kinds, weights, k=count):
+        name = rng.choice(names)
+        if kind == "point":
+            reqs.append((kind, f"/student?name={quote(name)}"))
+        elif kind == "prefix":
+            reqs.append((kind, f"/search?q={quote(name[:rng.randint(2, 5)])}"))
+        else:
+            word = max(name.split(), key=len)
+            j = rng.randrange(len(word))
+            reqs.append((kind, f"/search?q={quote(name.replace(word, word[:j] + word[j+1:], 1))}"))
+    return reqs
+
+def run_load(host, port, reqs, concurrency):
+    """{kind: [seconds]} and the wall time, with `concurrency` keep-alive clients sharing reqs."""
+    latencies = {kind: [] for kind, _ in reqs}
+    errors = []
+    lock = threading.Lock()
+    cursor = iter(range(len(reqs)))
+    start = threading.Barrier(concurrency + 1)
+
+    def client():
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        mine = []
+        start.wait()
+        while True:
+            with lock: i = next(cursor, None)
+            if i is None: break
+            kind, path = reqs[i]
+            t = time.perf_counter()
+            try:
+                conn.request("GET", path)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status not in (200, 404): errors.append((path, resp.status))
+            except (OSError, http.client.HTTPException) as e:
+                errors.append((path, str(e)))
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=30)
+                continue
+            mine.append((kind, time.perf_counter() - t))
+        conn.close()
+        with lock:
+            for kind, seconds in mine: latencies[kind].append(seconds)
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for th in threads: th.start()
+    start.wait()
+    t = time.perf_counter()
+    for th in threads: th.join()
+    return latencies, time.perf_counter() - t, errors
+
+def summarize(latencies, wall):
+    rows = []
+    for kind, values in sorted(latencies.items()):
+        if not values: continue
+        ms = np.array(values) * 1000
+        row = {"kind": kind, "requests": len(ms), "per_s": round(len(ms) / wall, 1), "max_ms": round(float(ms.max()), 3)}
+        row.update({f"p{p:g}_ms": round(float(np.percentile(ms, p)), 3) for p in PERCENTILES})
+        rows.append(row)
+    return rows
+
+def bare_lookup_us(index, names, repeat=5):
+    """Mean microseconds per ResultIndex.get() over names (best of repeat)."""
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for name in names: index.get(name)
+        elapsed = (time.perf_counter() - t) / len(names) * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        kind, _, share = part.partition("=")
+        if kind.strip() not in ("point", "prefix", "fuzzy"): raise argparse.ArgumentTypeError(f"unknown request kind {kind!r}")
+        mix[kind.strip()] = float(share)
+    return mix
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latency percentiles of the lookup service under concurrent load.")
+    parser.add_argument("--students", type=int, default=10000, help="synthetic class size, at most 16000 (in-process server only)")
+    parser.add_argument("--concurrency", type=int, default=200, help="client connections open at once")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("point=0.8,prefix=0.1,fuzzy=0.1"))
+    parser.add_argument("--url", default=None, help="test this running service instead of an in-process one")
+    parser.add_argument("--json", default=None, help="write the results here")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        names = []
+        for letter in "abcdefghijklmnopqrstuvwxyz":
+            conn.request("GET", f"/search?q={letter}&limit={lookup.MAX_LIMIT}")
+            names += [m["result"]["Name"].lower() for m in json.loads(conn.getresponse().read())["matches"]]
+        conn.close()
+        if not names: parser.error(f"{args.url} is serving no students")
+        bare = None
+    else:
+        out_df = synthetic_results(args.students)
+        index = lookup.publish(out_df, f"synthetic {args.students}")
+        names = index_names = list(index.rows)
+        bare = bare_lookup_us(index, index_names)
+        print(f"Index over {index.students} students built in {index.build_ms} ms; bare lookup {bare:.2f} us")
+        server = lookup.serve(port=0)
+        host, port = server.server_address[:2]
+
+    reqs = make_requests(names, args.requests, args.mix)
+    try:
+        latencies, wall, errors = run_load(host, port, reqs, args.concurrency)
+    finally:
+        if server is not None: server.shutdown()
+    rows = summarize(latencies, wall)
+    print(f"{args.requests} requests, {args.concurrency} concurrent, {wall:.2f}s ({args.requests / wall:.0f}/s), {len(errors)} errors")
+    for r in rows:
+        print(f"  {r['kind']:<7} {r['requests']:>7}  " + "  ".join(f"p{p:g} {r[f'p{p:g}_ms']:7.3f}" for p in PERCENTILES) + f"  max {r['max_ms']:8.3f} ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"students": None if args.url else args.students, "concurrency": args.concurrency, "wall_s": round(wall, 3),
+                       "errors": len(errors), "bare_lookup_us": bare, "results": rows}, f, indent=2)
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""Peak memory of rendering the report and certificates PDFs for large classes.
+
+Every sample is a fresh interpreter that builds a synthetic ranked out_df of --students rows
+(names are numbered, so any class size works), then renders one document into one target:
+  spool   render_cache.spool(), what the app renders into (moves to disk past SPOOL_BYTES)
+  file    an open temporary file, what the pipeline writes to
+  bytes   the in-memory BytesIO of generate_report_pdf() / generate_certificates_pdf()
+Reported per sample: the process's peak RSS during the render and its growth over the RSS the
+render started from (the out_df and the decoded images are in the starting figure), the render
+time and the PDF size. On Linux the kernel's peak is reset just before the render, so building
+the out_df cannot hide it; elsewhere the peak is ru_maxrss, which only shows a render that peaks
+above everything before it. A fresh process per sample keeps one render's peak from the next.
+
+Usage:
+    python -m benchmarks.memory [--students 10000,50000] [--documents report,certificates]
+                                [--targets spool,bytes] [--profile print] [--json memory.json]
+                                [--offline] [--asset-dir DIR]
+"""
+import os
+import gc
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+from config import OUTPUT_PROFILES, DEFAULT_PROFILE
+from benchmarks.run import THRESH_YELLOW, THRESH_GREEN, REPORT_TITLE, SUMMARY_TITLE, CERT_DATE, parse_grid, _max_rss_mb
+
+DOCUMENTS = ("report", "certificates")
+TARGETS = ("spool", "file", "bytes")
+TESTS = 30
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the fresh interpreter; prints one JSON line
+_PROBE = r"""
+import json
+from benchmarks.memory import render_once
+print(json.dumps(render_once(%(document)r, %(students)d, %(target)r, %(profile)r)))
+"""
+
+
+def synthetic_results(students, seed=0):
+    """A ranked out_df of `students` numbered synthetic names and its total max marks."""
+    import numpy as np
+    from scoring import results_table
+    gen = np.random.default_rng(seed)
+    names = np.array([f"student {i:06d} {chr(97 + i % 26)}" for i in range(students)], dtype=object)
+    present = gen.integers(TESTS // 2, TESTS + 1, size=students)
+    obtained = np.round(gen.random(students) * present * 40, 1)
+    return results_table(names, present, obtained, TESTS, TESTS * 50), TESTS * 50
+
+def _status_mb(field):
+    # Linux: VmRSS (now) or VmHWM (peak since start or the last reset_peak()), in MB
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"): return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def reset_peak():
+    """Starts the kernel's peak RSS over from the current RSS; False where that is not possible."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f: f.write("5")
+    except OSError:
+        return False
+    return _status_mb("VmHWM") is not None
+
+def render_once(document, students, target, profile=DEFAULT_PROFILE):
+    """Render one document into one target in this process: {"rss_mb", "peak_mb", "seconds", ...}."""
+    import assets
+    import render_cache
+    import certificates
+    import report_pdf
+    from config import ASSET_IDS
+    assets.register_assets(ASSET_IDS)
+    out_df, total_max_marks = synthetic_results(students)
+    gc.collect()
+    if reset_peak():
+        before, peak = _status_mb("VmRSS"), lambda: _status_mb("VmHWM")
+    else:
+        before, peak = _max_rss_mb(), _max_rss_mb
+
+    def write(fileobj):
+        if document == "report":
+            report_pdf.write_report_pdf(out_df, total_max_marks, THRESH_YELLOW, THRESH_GREEN, REPORT_TITLE, SUMMARY_TITLE, fileobj, profile)
+        else:
+            certificates.write_certificates_pdf(out_df, THRESH_YELLOW, THRESH_GREEN, REPORT_TITLE, CERT_DATE, fileobj, profile)
+
+    t = time.perf_counter()
+    if target == "bytes":
+        if document == "report":
+            doc = report_pdf.generate_report_pdf(out_df, total_max_marks, THRESH_YELLOW, THRESH_GREEN, REPORT_TITLE, SUMMARY_TITLE, profile)
+        else:
+            doc = certificates.generate_certificates_pdf(out_df, THRESH_YELLOW, THRESH_GREEN, REPORT_TITLE, CERT_DATE, profile)
+        size = doc.getbuffer().nbytes
+    else:
+        with (render_cache.spool() if target == "spool" else tempfile.TemporaryFile()) as f:
+            write(f)
+            size = f.tell()
+    seconds = time.perf_counter() - t
+    after = peak()
+    return {"document": document, "students": students, "target": target, "seconds": round(seconds, 2), "size_mb": round(size / 2**20, 2),
+            "peak_mb": None if after is None else round(after, 1), "rss_mb": None if before is None else round(after - before, 1)}
+
+def sample(document, students, target, profile, env):
+    probe = _PROBE % {"document": document, "students": students, "target": target, "profile": profile}
+    out = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, env=env, cwd=ROOT, timeout=3600)
+    if out.returncode != 0: raise RuntimeError(f"render failed:\n{out.stderr[-2000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def parse_names(choices):
+    def parse(text):
+        names = [v.strip() for v in text.split(",") if v.strip()]
+        for name in names:
+            if name not in choices: raise argparse.ArgumentTypeError(f"{name!r} is not one of {', '.join(choices)}")
+        return names
+    return parse
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Peak memory of rendering the PDFs for large classes.")
+    parser.add_argument("--students", type=parse_grid, default=parse_grid("10000,50000"))
+    parser.add_argument("--documents", type=parse_names(DOCUMENTS), default=list(DOCUMENTS))
+    parser.add_argument("--targets", type=parse_names(TARGETS), default=["spool", "bytes"])
+    parser.add_argument("--profile", choices=list(OUTPUT_PROFILES), default=DEFAULT_PROFILE)
+    parser.add_argument("--json", default=None, help="write the results here")
+    parser.add_argument("--offline", action="store_true", help="never download images")
+    parser.add_argument("--asset-dir", default=None, help="local folder with the images")
+    args = parser.parse_args(argv)
+    if _max_rss_mb() is None and _status_mb("VmRSS") is None: parser.error("peak memory needs the resource module (not available on Windows)")
+
+    env = dict(os.environ, SCORECARD_RUN_LOG="")
+    if args.offline: env["SCORECARD_OFFLINE"] = "1"
+    if args.asset_dir: env["SCORECARD_ASSET_DIR"] = os.path.abspath(args.asset_dir)
+
+    results = []
+    for students in args.students:
+        for document in args.documents:
+            for target in args.targets:
+                r = sample(document, students, target, args.profile, env)
+                print(f"  {students:>7} {document:<13} {target:<6} peak RSS {r['peak_mb']:7.1f} MB (+{r['rss_mb']:6.1f}) {r['seconds']:7.2f}s  {r['size_mb']:6.2f} MB PDF", flush=True)
+                results.append(r)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"profile": args.profile, "results": results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
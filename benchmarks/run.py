@@ -0,0 +1,202 @@
+"""Stage-by-stage benchmark over a grid of class sizes.
+
+For every (students, tests) cell a synthetic month is generated (benchmarks/synthetic.py) and each
+stage is timed on its own, starting cold:
+  ingest      load_score_files()          CSV exports -> per-file scores
+  identity    identity.resolve()          per-file scores with spellings of one student merged
+  aggregate   aggregate_scores()          per-file scores -> ranked out_df
+  report      generate_report_pdf()       out_df + per-test analytics -> report PDF
+  certificates generate_certificates_pdf() out_df -> certificates PDF
+
+Wall time is the best of --repeat runs. Peak memory comes from one extra run under tracemalloc
+(Python and numpy allocations; it would slow the timed runs down, so it is measured separately).
+A small untimed class goes through every stage first, so the images every process decodes once
+are not charged to the first cell.
+
+Results are written as JSON; pass an earlier file as --baseline to get a per-stage comparison.
+The exit code is 1 when any stage is slower than baseline by more than --tolerance (and by more
+than MIN_DELTA seconds, so millisecond stages do not flag on noise). --typo-rate makes the
+synthetic exports spell some students differently, so identity has something to merge. --profile
+renders the PDFs in another output profile (config.OUTPUT_PROFILES); its PDF sizes are in the results.
+
+Usage:
+    python -m benchmarks.run [--students 100,1000,10000] [--tests 5,30,100] [--repeat 1]
+                             [--typo-rate 0.02] [--profile print] [--json bench.json] [--baseline old.json] [--tolerance 0.2]
+                             [--offline] [--asset-dir DIR] [--data-dir DIR]
+"""
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import platform
+import argparse
+import datetime
+import tempfile
+import subprocess
+import tracemalloc
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+import assets
+import scoring
+import identity
+from config import ASSET_IDS, OUTPUT_PROFILES, DEFAULT_PROFILE
+from report_pdf import generate_report_pdf
+from certificates import generate_certificates_pdf
+from benchmarks.synthetic import generate_class
+
+STAGES = ("ingest", "identity", "aggregate", "report", "certificates")
+REPORT_TITLE = "BENCHMARK MONTHLY RESULT REPORT"
+SUMMARY_TITLE = "SUMMARY & ANALYSIS OF THE BENCHMARK MONTH"
+THRESH_YELLOW, THRESH_GREEN = 40, 70
+CERT_DATE = "01-01-2026"
+MIN_DELTA = 0.05   # seconds; smaller slowdowns are noise, whatever the ratio
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def stage_runners(paths, profile=DEFAULT_PROFILE):
+    """{stage: fn()}; each fn runs one stage cold on the output of the previous ones and returns it."""
+    state = {}
+    def ingest():
+        scoring.clear_caches()
+        state['per_file_data'], errors = scoring.load_score_files(paths)
+        if errors: raise RuntimeError(f"synthetic files failed to parse: {errors[:3]}")
+        return state['per_file_data']
+    def resolve():
+        state['resolved'], merges = identity.resolve(state['per_file_data'])
+        return merges
+    def aggregate():
+        state['out_df'], state['total_max_marks'] = scoring.aggregate_scores(state['resolved'])
+        return state['out_df']
+    def report():
+        return generate_report_pdf(state['out_df'], state['total_max_marks'], THRESH_YELLOW, THRESH_GREEN, REPORT_TITLE, SUMMARY_TITLE, profile, per_file_data=state['resolved'])
+    def certificates():
+        return generate_certificates_pdf(state['out_df'], THRESH_YELLOW, THRESH_GREEN, REPORT_TITLE, CERT_DATE, profile)
+    return {"ingest": ingest, "identity": resolve, "aggregate": aggregate, "report": report, "certificates": certificates}
+
+def measure(fn, repeat):
+    """(best wall seconds, peak traced MB, result of the last run)."""
+    best = None
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        t = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / 2**20, result
+
+def warm_up(data_dir, profile=DEFAULT_PROFILE):
+    for run in stage_runners(generate_class(os.path.join(data_dir, "warmup"), 20, 3), profile).values(): run()
+
+def run_cell(students, tests, repeat, data_dir, typo_rate=0.0, profile=DEFAULT_PROFILE):
+    cell_dir = os.path.join(data_dir, f"s{students}_t{tests}")
+    paths = generate_class(cell_dir, students, tests, seed=students * 1000 + tests, typo_rate=typo_rate)
+    rows = []
+    runners = stage_runners(paths, profile)
+    for stage in STAGES:
+        seconds, peak_mb, result = measure(runners[stage], repeat)
+        row = {"students": students, "tests": tests, "stage": stage, "seconds": round(seconds, 4), "peak_mb": round(peak_mb, 2)}
+        if stage in ("report", "certificates"): row["bytes"] = result.getbuffer().nbytes
+        if stage == "aggregate": row["ranked"] = len(result)
+        if stage == "identity": row["merged"] = len(result)
+        rows.append(row)
+        print(f"  {students:>6} x {tests:<4} {stage:<13} {seconds:8.3f}s  {peak_mb:8.1f} MB" + (f"  {row['bytes'] / 2**20:7.2f} MB pdf" if "bytes" in row else "") + (f"  {row['merged']} merged" if "merged" in row else ""), flush=True)
+    return rows
+
+def compare(results, baseline, tolerance):
+    """Prints current vs baseline per cell and stage; returns the rows that regressed."""
+    old = {(r["students"], r["tests"], r["stage"]): r for r in baseline.get("results", [])}
+    regressions = []
+    print(f"\nAgainst baseline {baseline.get('meta', {}).get('commit') or '?'} ({baseline.get('meta', {}).get('created', '?')}):")
+    for r in results:
+        b = old.get((r["students"], r["tests"], r["stage"]))
+        if b is None or not b["seconds"]: continue
+        ratio = r["seconds"] / b["seconds"]
+        flag = ""
+        if ratio > 1 + tolerance and r["seconds"] - b["seconds"] > MIN_DELTA:
+            flag = "  REGRESSION"; regressions.append(r)
+        elif ratio < 1 - tolerance:
+            flag = "  faster"
+        mem = f"{r['peak_mb'] - b['peak_mb']:+8.1f} MB" if "peak_mb" in b else ""
+        print(f"  {r['students']:>6} x {r['tests']:<4} {r['stage']:<13} {b['seconds']:8.3f}s -> {r['seconds']:8.3f}s  x{ratio:5.2f}  {mem}{flag}")
+    return regressions
+
+def _max_rss_mb():
+    if resource is None: return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (2**20 if sys.platform == "darwin" else 2**10), 1)   # bytes on macOS, KB elsewhere
+
+def parse_grid(text):
+    return [int(v) for v in text.split(",") if v.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time ingest, identity, aggregate, report and certificates over a grid of class sizes.")
+    parser.add_argument("--students", type=parse_grid, default=[100, 1000, 10000], help="comma separated, e.g. 100,1000,10000")
+    parser.add_argument("--tests", type=parse_grid, default=[5, 30, 100], help="comma separated, e.g. 5,30,100")
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per stage; the best is kept")
+    parser.add_argument("--typo-rate", type=float, default=0.0, help="share of synthetic entries spelled differently")
+    parser.add_argument("--profile", choices=list(OUTPUT_PROFILES), default=DEFAULT_PROFILE, help="output profile the PDFs are rendered in")
+    parser.add_argument("--json", default=None, help="write results here (use it as a later --baseline)")
+    parser.add_argument("--baseline", default=None, help="earlier --json output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="slowdown ratio above 1 that counts as a regression")
+    parser.add_argument("--offline", action="store_true", default=assets.OFFLINE, help="never download images")
+    parser.add_argument("--asset-dir", default=None, help="local folder with the images")
+    parser.add_argument("--data-dir", default=None, help="keep the generated CSVs here instead of a temp folder")
+    args = parser.parse_args(argv)
+
+    assets.OFFLINE = args.offline
+    if args.asset_dir: assets.LOCAL_ASSET_DIR = args.asset_dir
+    assets.register_assets(ASSET_IDS)
+    missing = [name for name, data in assets.fetch_assets(ASSET_IDS).items() if not data]
+    if missing: print(f"Warning: images not available, PDFs are rendered without: {', '.join(missing)}", file=sys.stderr)
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="scorecard-bench-")
+    results = []
+    try:
+        warm_up(data_dir, args.profile)
+        for students in args.students:
+            for tests in args.tests:
+                results.extend(run_cell(students, tests, args.repeat, data_dir, args.typo_rate, args.profile))
+    finally:
+        if not args.data_dir: shutil.rmtree(data_dir, ignore_errors=True)
+
+    summary = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"), "commit": _git_commit(),
+            "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "csv_engine": scoring.CSV_ENGINE, "repeat": args.repeat, "typo_rate": args.typo_rate, "profile": args.profile, "images_missing": missing,
+            "max_rss_mb": _max_rss_mb(),
+        },
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f: json.dump(summary, f, indent=2)
+        print(f"Results written to {args.json}")
+    else:
+        print(json.dumps(summary))
+
+    if args.baseline:
+        with open(args.baseline) as f: baseline = json.load(f)
+        if compare(results, baseline, args.tolerance): return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
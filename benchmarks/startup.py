@@ -0,0 +1,89 @@
+"""Cold-start time to first paint of the Streamlit app.
+
+Every sample is a fresh interpreter that runs app.py once through Streamlit's AppTest, with no
+files uploaded - what a user sees when they open the page. Reported per sample:
+  first_paint   script start -> the page title is drawn
+  script        script start -> the whole first run is done
+  before_paint  heavy modules (pandas, numpy, PIL, reportlab, ...) already imported at first paint
+  loaded        the same at the end of the run
+
+The title is timed by wrapping st.title, so older versions of the app can be measured the same way
+(pass their app.py as --app). The medians are printed, and the samples are written as JSON with --json.
+
+Usage:
+    python -m benchmarks.startup [--samples 5] [--app app.py] [--json startup.json]
+                                 [--offline] [--asset-dir DIR]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+HEAVY_MODULES = ("pandas", "numpy", "PIL", "requests", "reportlab", "reportlab.pdfgen.canvas", "reportlab.platypus")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the fresh interpreter; prints one JSON line
+_PROBE = r"""
+import sys, json, time
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+heavy = %(heavy)r
+marks = {}
+title = st.title
+def timed_title(*args, **kwargs):
+    if "paint" not in marks:
+        marks["paint"] = time.perf_counter()
+        marks["before_paint"] = [m for m in heavy if m in sys.modules]
+    return title(*args, **kwargs)
+st.title = timed_title
+at = AppTest.from_file(%(app)r, default_timeout=600)
+started = time.perf_counter()
+at.run()
+done = time.perf_counter()
+print(json.dumps({
+    "first_paint": round(marks.get("paint", done) - started, 4), "script": round(done - started, 4),
+    "before_paint": marks.get("before_paint"), "loaded": [m for m in heavy if m in sys.modules],
+    "exceptions": [str(e.value) for e in at.exception],
+}))
+"""
+
+def sample(app, env):
+    probe = _PROBE % {"heavy": HEAVY_MODULES, "app": os.path.abspath(app)}
+    out = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, env=env,
+                         cwd=os.path.dirname(os.path.abspath(app)), timeout=600)
+    if out.returncode != 0: raise RuntimeError(f"app run failed:\n{out.stderr[-2000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start time to first paint of the Streamlit app.")
+    parser.add_argument("--samples", type=int, default=5, help="fresh interpreters to time; medians are reported")
+    parser.add_argument("--app", default=os.path.join(ROOT, "app.py"))
+    parser.add_argument("--json", default=None, help="write the samples here")
+    parser.add_argument("--offline", action="store_true", help="never download images")
+    parser.add_argument("--asset-dir", default=None, help="local folder with the images")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, SCORECARD_RUN_LOG="")
+    if args.offline: env["SCORECARD_OFFLINE"] = "1"
+    if args.asset_dir: env["SCORECARD_ASSET_DIR"] = os.path.abspath(args.asset_dir)
+
+    samples = []
+    for i in range(max(1, args.samples)):
+        s = sample(args.app, env)
+        if s["exceptions"]: print(f"Warning: the app raised {s['exceptions']}", file=sys.stderr)
+        print(f"  sample {i+1}: first paint {s['first_paint']:.3f}s  script {s['script']:.3f}s  before paint: {', '.join(s['before_paint'] or []) or '-'}", flush=True)
+        samples.append(s)
+
+    first_paint = statistics.median(s["first_paint"] for s in samples)
+    script = statistics.median(s["script"] for s in samples)
+    print(f"Median first paint {first_paint:.3f}s, first run {script:.3f}s")
+    print(f"Loaded by the end of the first run: {', '.join(samples[-1]['loaded']) or '-'}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"app": os.path.abspath(args.app), "first_paint": first_paint, "script": script, "samples": samples}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Synthetic class data: a month of test exports that look like the real ones.
+
+Files rotate through the three export layouts the app meets in practice:
+  - quiz platform: FirstName, LastName, Phone, EarnedPts, PossiblePts, Q1..Qn
+  - school sheet:  Student Name, Roll No, Obtained Marks, Max Marks
+  - bare sheet:    Name, Score            (no max column; the top score stands in for it)
+
+Every student has a steady ability and an attendance rate, so ranks, absentees and award
+candidates come out the way a real class does. Some rows spell the name in upper case or with
+stray spaces, which normalize_name() has to fold back together. With --typo-rate, some students
+are also typed surname first or with a letter dropped or doubled in a whole export, which only
+identity.resolve() can merge.
+
+Usage:
+    python -m benchmarks.synthetic OUT_DIR [--students 300] [--tests 12] [--seed 0]
+                                   [--variant-rate 0.1] [--typo-rate 0]
+"""
+import os
+import csv
+import random
+import argparse
+
+FIRST_NAMES = ["Aarav", "Aditi", "Amit", "Ananya", "Arjun", "Bhavya", "Chirag", "Darshan", "Dev", "Diya",
+               "Gaurav", "Hardik", "Harsh", "Heer", "Isha", "Jay", "Jinal", "Karan", "Kavya", "Khushi",
+               "Krish", "Mahek", "Manav", "Meet", "Mitali", "Neel", "Neha", "Nidhi", "Parth", "Pooja",
+               "Priya", "Raj", "Riya", "Rohan", "Sagar", "Sejal", "Tanvi", "Urvi", "Vivek", "Yash"]
+MIDDLE_NAMES = ["Ashokbhai", "Bharatbhai", "Chandrakant", "Dineshbhai", "Ghanshyam", "Hasmukh", "Jayesh",
+                "Kiritbhai", "Mahesh", "Mukesh", "Naresh", "Pankaj", "Rajesh", "Ramesh", "Sanjay", "Suresh",
+                "Umesh", "Vijay", "Vinod", "Yogesh"]
+LAST_NAMES = ["Bhatt", "Chauhan", "Desai", "Dave", "Gohil", "Jadeja", "Joshi", "Kotak", "Makwana", "Mehta",
+              "Modi", "Pandya", "Parmar", "Patel", "Raval", "Shah", "Solanki", "Thakkar", "Trivedi", "Vyas"]
+TEST_MAX_CHOICES = [25, 50, 100]
+QUESTION_COLUMNS = 8
+
+
+def make_students(n, rng):
+    """n distinct "First Middle Last" names with an ability (mean fraction scored) and attendance rate."""
+    pool = len(FIRST_NAMES) * len(MIDDLE_NAMES) * len(LAST_NAMES)
+    if n > pool: raise ValueError(f"at most {pool} distinct synthetic students")
+    picks = rng.sample(range(pool), n)
+    students = []
+    for p in picks:
+        p, last = divmod(p, len(LAST_NAMES))
+        first, middle = divmod(p, len(MIDDLE_NAMES))
+        name = f"{FIRST_NAMES[first]} {MIDDLE_NAMES[middle]} {LAST_NAMES[last]}"
+        students.append((name, rng.betavariate(5, 3), rng.choice([1.0, 0.97, 0.92, 0.85, 0.7])))
+    return students
+
+def spell(name, rng, variant_rate):
+    # How a name drifts between exports: typed in capitals, double spaces, trailing blanks
+    if rng.random() >= variant_rate: return name
+    style = rng.randrange(3)
+    if style == 0: return name.upper()
+    if style == 1: return name.replace(" ", "  ")
+    return f" {name.lower()}  "
+
+def misspell(name, rng):
+    # How a name is typed differently by whoever made one export: surname first, or a slipped key
+    tokens = name.split()
+    style = rng.randrange(3)
+    if style == 0: return " ".join(tokens[-1:] + tokens[:-1])
+    i = rng.randrange(len(tokens))
+    tok = tokens[i]
+    j = rng.randrange(1, len(tok))
+    tokens[i] = tok[:j] + tok[j+1:] if style == 1 else tok[:j] + tok[j] + tok[j:]
+    return " ".join(tokens)
+
+def score(ability, test_max, rng):
+    raw = rng.gauss(ability, 0.12) * test_max
+    return min(test_max, max(0.0, round(raw * 2) / 2))
+
+def write_test(path, layout, rows, test_max, rng):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        if layout == 0:
+            w.writerow(["FirstName", "LastName", "Phone", "EarnedPts", "PossiblePts"] + [f"Q{i+1}" for i in range(QUESTION_COLUMNS)])
+            for name, pts in rows:
+                first, _, rest = name.strip().partition(" ")
+                answers = [int(rng.random() < 0.6) for _ in range(QUESTION_COLUMNS)]
+                w.writerow([first, rest, f"9{rng.randrange(10**9):09d}", pts, test_max] + answers)
+        elif layout == 1:
+            w.writerow(["Student Name", "Roll No", "Obtained Marks", "Max Marks"])
+            for roll, (name, pts) in enumerate(rows, 1):
+                w.writerow([name, roll, pts, test_max])
+        else:
+            w.writerow(["Name", "Score"])
+            for name, pts in rows: w.writerow([name, pts])
+
+def generate_class(out_dir, students=300, tests=12, seed=0, variant_rate=0.1, typo_rate=0.0):
+    """Writes `tests` CSV exports for `students` students into out_dir; returns the file paths.
+
+    typo_rate is the share of (student, test) entries typed as a different spelling; at 0 the
+    random stream is the same as before it existed, so existing benchmark data does not change.
+    """
+    rng = random.Random(seed)
+    roster = make_students(students, rng)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for t in range(tests):
+        test_max = rng.choice(TEST_MAX_CHOICES)
+        rows = [(spell(misspell(name, rng) if typo_rate and rng.random() < typo_rate else name, rng, variant_rate), score(ability, test_max, rng))
+                for name, ability, attendance in roster if rng.random() < attendance]
+        rng.shuffle(rows)
+        path = os.path.join(out_dir, f"test_{t+1:03d}.csv")
+        write_test(path, t % 3, rows, test_max, rng)
+        paths.append(path)
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a month of synthetic test exports.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--students", type=int, default=300)
+    parser.add_argument("--tests", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--variant-rate", type=float, default=0.1, help="share of rows whose name is re-spelled")
+    parser.add_argument("--typo-rate", type=float, default=0.0, help="share of entries typed surname first or with a typo")
+    args = parser.parse_args(argv)
+    paths = generate_class(args.out_dir, args.students, args.tests, args.seed, args.variant_rate, args.typo_rate)
+    print(f"Wrote {len(paths)} files for {args.students} students to {args.out_dir}")
+
+if __name__ == "__main__":
+    main()
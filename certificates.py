@@ -0,0 +1,190 @@
+"""Award certificates: one landscape page per awardee, static artwork shared through PDF forms.
+
+generate_certificates_pdf() prints every award into one document (write_certificates_pdf() writes it
+page by page into a file). write_certificates_zip() gives each awardee their own PDF instead, rendered
+across render_pool's processes and written into the ZIP as they finish.
+Who wins what comes from award_rules.py, the same table the report's Hall of Fame is built from.
+"""
+import io
+import os
+import re
+import zipfile
+
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib import colors
+from reportlab.lib.units import mm
+from reportlab.platypus import Paragraph
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_CENTER
+
+import assets
+import jobs
+import instrument
+import award_rules
+import render_pool
+from streaming_pdf import StreamingCanvas
+from config import (
+    OUTPUT_PROFILES, DEFAULT_PROFILE, LOGO_ID, SIGNATURE_ID, CHAR_IDS,
+    CERT_LOGO_WIDTH, CERT_LOGO_HEIGHT, CERT_LOGO_X_POS, CERT_LOGO_Y_POS,
+    CERT_SIGN_WIDTH, CERT_SIGN_HEIGHT, CERT_SIGN_X_POS, CERT_SIGN_Y_POS,
+    CERT_CHAR_WIDTH, CERT_CHAR_HEIGHT, CERT_CHAR_OPACITY, CERT_CHAR_X_POS, CERT_CHAR_Y_POS,
+    COLOR_BLUE_HEADER, COLOR_AWARD_TITLE,
+)
+
+CHUNK_SIZE = 4   # awards per pool task; enough to amortise the pickling, small enough to stream
+
+
+def stamp_form(c, name, draw):
+    # Records draw(c) once per document as a form XObject; every later page just references it
+    if not c.hasForm(name):
+        c.beginForm(name); draw(c); c.endForm()
+    c.doForm(name)
+
+def draw_certificate_base(c, theme_color, report_title, logo_img):
+    # Static artwork that sits under the student's details: borders, logo, headings, name line
+    width, height = landscape(A4)
+    center_x = width / 2
+    c.setStrokeColor(theme_color)
+    c.setLineWidth(5); c.rect(15*mm, 15*mm, width-30*mm, height-30*mm)
+    c.setLineWidth(1); c.rect(18*mm, 18*mm, width-36*mm, height-36*mm)
+
+    if logo_img: c.drawImage(logo_img, CERT_LOGO_X_POS, CERT_LOGO_Y_POS, width=CERT_LOGO_WIDTH, height=CERT_LOGO_HEIGHT, mask='auto', preserveAspectRatio=True)
+
+    c.setFont("Helvetica-Bold", 32); c.setFillColor(COLOR_BLUE_HEADER)
+    c.drawCentredString(center_x, height - 52*mm, "MURLIDHAR ACADEMY")
+
+    c.setFont("Helvetica", 12); c.setFillColor(colors.black)
+    c.drawCentredString(center_x, height - 60*mm, "JUNAGADH")
+
+    c.setFont("Helvetica-Oblique", 18); c.setFillColor(colors.black)
+    c.drawCentredString(center_x, height - 72*mm, "Certificate of Achievement")
+
+    c.setFont("Helvetica-Bold", 14); c.setFillColor(colors.darkgrey)
+    c.drawCentredString(center_x, height - 82*mm, f"For: {report_title}")
+
+    c.setFont("Helvetica", 12); c.setFillColor(colors.gray)
+    c.drawCentredString(center_x, height - 92*mm, "This is proudly presented to")
+
+    c.setStrokeColor(colors.black); c.setLineWidth(0.5)
+    c.line(center_x - 60*mm, height - 109*mm, center_x + 60*mm, height - 109*mm)
+
+def draw_certificate_footer(c, cert_date, sign_img):
+    # Drawn over the student's details (the stats line can run under the signature)
+    c.setFont("Helvetica-Bold", 12); c.setFillColor(colors.black)
+    c.drawString(30*mm, 35*mm, f"Date: {cert_date}")
+
+    if sign_img:
+        img_x = CERT_SIGN_X_POS - (CERT_SIGN_WIDTH / 2)
+        c.drawImage(sign_img, img_x, CERT_SIGN_Y_POS, width=CERT_SIGN_WIDTH, height=CERT_SIGN_HEIGHT, mask='auto', preserveAspectRatio=True)
+
+    line_width = 50*mm; line_start_x = CERT_SIGN_X_POS - (line_width / 2); line_end_x = CERT_SIGN_X_POS + (line_width / 2); line_y = 35*mm
+    c.setLineWidth(1); c.setStrokeColor(colors.black); c.line(line_start_x, line_y, line_end_x, line_y)
+    c.drawCentredString(CERT_SIGN_X_POS, 29*mm, "Director Signature")
+
+def select_awards(out_df, thresh_yellow, thresh_green, winners=None):
+    """Awardees in page order: (student_name, title, desc, theme_color, char_key, stats_text) tuples.
+
+    winners: award_rules.select_winners() if the caller already has it (the report's Hall of Fame uses the same).
+    """
+    if winners is None: winners = award_rules.select_winners(out_df, thresh_yellow, thresh_green)
+
+    def make_stats(row):
+        return f"Rank: {row['Rank']}  |  Tests: {row['Present']}/{row['Total Tests']}  |  Score: {row['Obtained']}/{row['Total Marks']} ({row['Percentage']}%)"
+
+    return [(r['Name'], rule['title'], rule['certificate'], rule['color'], rule['key'], make_stats(r))
+            for rule, won in winners for r in won.to_dict('records')]
+
+def render_certificates(awards, report_title, cert_date, fileobj, profile=DEFAULT_PROFILE):
+    """Draws one page per award onto a single PDF written to fileobj page by page, in an OUTPUT_PROFILES profile."""
+    opts = OUTPUT_PROFILES[profile]
+    c = StreamingCanvas(fileobj, pagesize=landscape(A4), pageCompression=1)
+    width, height = landscape(A4)
+
+    with instrument.stage("certificates.images"):
+        image_opts = assets.reader_options(opts)
+        logo_img = assets.get_image_reader(LOGO_ID, size=(CERT_LOGO_WIDTH, CERT_LOGO_HEIGHT), **image_opts)
+        sign_img = assets.get_image_reader(SIGNATURE_ID, size=(CERT_SIGN_WIDTH, CERT_SIGN_HEIGHT), **image_opts)
+
+        char_readers = {}
+        for key, file_id in CHAR_IDS.items():
+            reader = assets.get_image_reader(file_id, opacity=CERT_CHAR_OPACITY, size=(CERT_CHAR_WIDTH, CERT_CHAR_HEIGHT), **image_opts)
+            if reader: char_readers[key] = reader
+
+    desc_style = ParagraphStyle('Desc', parent=getSampleStyleSheet()['Normal'], fontName='Helvetica', fontSize=13, leading=16, alignment=TA_CENTER, textColor=colors.darkgray)
+    center_x = width / 2
+
+    for i, (student_name, title, desc, theme_color, char_key, stats_text) in enumerate(awards, 1):
+        jobs.progress(i, len(awards), "certificate")
+        if char_key in char_readers:
+            char_img = char_readers[char_key]
+            stamp_form(c, f"CertChar{char_key}", lambda c: c.drawImage(char_img, CERT_CHAR_X_POS, CERT_CHAR_Y_POS, width=CERT_CHAR_WIDTH, height=CERT_CHAR_HEIGHT, mask='auto', preserveAspectRatio=True))
+
+        stamp_form(c, f"CertBase{theme_color.hexval()[2:]}", lambda c: draw_certificate_base(c, theme_color, report_title, logo_img))
+
+        c.setFont("Helvetica-Bold", 32); c.setFillColor(theme_color)
+        c.drawCentredString(center_x, height - 106*mm, student_name.upper()) 
+
+        c.setFont("Times-Bold", 30); c.setFillColor(COLOR_AWARD_TITLE)
+        c.drawCentredString(center_x, height - 125*mm, title) 
+
+        p = Paragraph(desc, desc_style); w, h = p.wrap(width - 60*mm, 50*mm)
+        p.drawOn(c, (width - w)/2, height - 148*mm) 
+
+        c.setFont("Helvetica-Bold", 14); c.setFillColor(colors.black)
+        c.drawCentredString(center_x, height - 163*mm, stats_text)
+
+        stamp_form(c, "CertFooter", lambda c: draw_certificate_footer(c, cert_date, sign_img))
+        c.showPage()
+    with instrument.stage("certificates.save", pages=len(awards)): c.save()
+
+def generate_certificates_pdf(out_df, thresh_yellow, thresh_green, report_title, cert_date, profile=DEFAULT_PROFILE, winners=None):
+    buffer = io.BytesIO()
+    write_certificates_pdf(out_df, thresh_yellow, thresh_green, report_title, cert_date, buffer, profile, winners)
+    buffer.seek(0)
+    return buffer
+
+def write_certificates_pdf(out_df, thresh_yellow, thresh_green, report_title, cert_date, fileobj, profile=DEFAULT_PROFILE, winners=None):
+    """Writes every certificate into one PDF on fileobj; returns the number of certificates."""
+    with instrument.stage("certificates", students=len(out_df)) as s:
+        awards = select_awards(out_df, thresh_yellow, thresh_green, winners)
+        render_certificates(awards, report_title, cert_date, fileobj, profile)
+        s.add(pages=len(awards))
+    return len(awards)
+
+# ---------------- ONE PDF PER AWARDEE ----------------
+def certificate_file_name(student_name, char_key):
+    stem = re.sub(r'\W+', '_', student_name.strip().upper()).strip('_') or "STUDENT"
+    return f"{stem}_{char_key}.pdf"
+
+def render_certificate_files(awards, report_title, cert_date, profile=DEFAULT_PROFILE):
+    """[(file name, PDF bytes)], each award rendered as its own one-page document."""
+    files = []
+    for award in awards:
+        buffer = io.BytesIO()
+        with jobs.quiet():   # progress is counted per file by write_certificates_zip
+            render_certificates([award], report_title, cert_date, buffer, profile)
+        files.append((certificate_file_name(award[0], award[4]), buffer.getvalue()))
+    return files
+
+def iter_certificate_files(awards, report_title, cert_date, workers=None, profile=DEFAULT_PROFILE):
+    """Yields (file name, PDF bytes) per award as soon as it is rendered (not in award order)."""
+    chunks = [awards[i:i + CHUNK_SIZE] for i in range(0, len(awards), CHUNK_SIZE)]
+    for files in render_pool.imap(render_certificate_files, chunks, (report_title, cert_date, profile), workers):
+        yield from files
+
+def write_certificates_zip(out_df, thresh_yellow, thresh_green, report_title, cert_date, fileobj, workers=None, profile=DEFAULT_PROFILE, winners=None):
+    """Writes one PDF per awardee into a ZIP on fileobj; returns the number of certificates."""
+    awards = select_awards(out_df, thresh_yellow, thresh_green, winners)
+    seen = {}
+    # PDFs are already compressed, so the ZIP only stores them
+    with instrument.stage("certificates.zip", files=len(awards)) as s, zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_STORED) as zf:
+        jobs.progress(0, len(awards), "certificate")
+        for done, (file_name, data) in enumerate(iter_certificate_files(awards, report_title, cert_date, workers, profile), 1):
+            jobs.progress(done, len(awards), "certificate")
+            seen[file_name] = seen.get(file_name, 0) + 1
+            if seen[file_name] > 1:
+                stem, ext = os.path.splitext(file_name)
+                file_name = f"{stem}_{seen[file_name]}{ext}"
+            zf.writestr(file_name, data)
+            s.add(bytes=len(data))
+    return len(awards)
@@ -0,0 +1,98 @@
+"""Shared settings: links, Drive asset IDs, certificate layout, report layout and colours."""
+from reportlab.lib import colors
+from reportlab.lib.units import mm
+
+# ---------------- CONFIG ----------------
+TG_LINK = "https://t.me/MurlidharAcademy"
+IG_LINK = "https://www.instagram.com/murlidhar_academy_official/"
+
+# ✅ Google Drive Image IDs (JPGs)
+DEFAULT_DRIVE_ID = "1a1ZK5uiLl0a63Pto1EQDUY0VaIlqp21u"
+SIGNATURE_ID = "1U0es4MVJgGniK27rcrA6hiLFFRazmwCs"
+LOGO_ID = "1BGvxglcgZ2G6FdVelLjXZVo-_v4e4a42"
+
+# ✅ CHARACTER IMAGE IDs
+CHAR_IDS = {
+    "VIKRAMADITYA": "19f511argqR5e1ajYIWT4a-PIHJV9pexw",
+    "CHANAKYA": "15SiSFtjjvV_G5zl5QBJJy1trb_1YZxie",
+    "ARJUNA": "10q8t65_zMvQ9p-4s9BRaZqzVJ1nsnJck",
+    "DHRUVA": "1jQ0hzX9Y0bKMGh7htP_mIXOKSmHAR6P_",
+    "KARNA": "1DvL4WqmJHlhMhs4TR9O47TyvdqYNpX6u",
+    "ANGAD": "1LMT1PfsAxzHrVtexQN2HGkz_d60zmaFd",
+    "BHAGIRATH": "1nUQh5P2eAEZE4m7mBJGUFFFzkv1P5BZX"
+}
+
+# Everything fetched at startup (name -> Drive ID); names also match files in SCORECARD_ASSET_DIR
+ASSET_IDS = {"background": DEFAULT_DRIVE_ID, "logo": LOGO_ID, "signature": SIGNATURE_ID, **CHAR_IDS}
+
+# ==========================================
+# 🎛️ CERTIFICATE LAYOUT CONFIGURATION
+# ==========================================
+
+# 1. LOGO SETTINGS (Left Side)
+CERT_LOGO_WIDTH = 42 * mm        
+CERT_LOGO_HEIGHT = 42 * mm       
+CERT_LOGO_X_POS = 36 * mm        
+CERT_LOGO_Y_POS = 143 * mm       
+
+# 2. SIGNATURE SETTINGS (Bottom Right)
+CERT_SIGN_WIDTH = 65 * mm        
+CERT_SIGN_HEIGHT = 22 * mm       
+CERT_SIGN_X_POS = 235 * mm       
+CERT_SIGN_Y_POS = 38 * mm        
+
+# 3. CHARACTER IMAGE SETTINGS (Right Side - Background)
+CERT_CHAR_WIDTH = 74 * mm       
+CERT_CHAR_HEIGHT = 74 * mm      
+CERT_CHAR_OPACITY = 1         
+
+# 👇👇👇 (અહીંથી પોઝિશન સેટ કરો) 👇👇👇
+CERT_CHAR_MARGIN_RIGHT = 16 * mm   
+CERT_CHAR_MARGIN_TOP = 24 * mm    
+
+PAGE_W_MM = 297 
+PAGE_H_MM = 210 
+CERT_CHAR_X_POS = (PAGE_W_MM * mm) - CERT_CHAR_WIDTH - CERT_CHAR_MARGIN_RIGHT
+CERT_CHAR_Y_POS = (PAGE_H_MM * mm) - CERT_CHAR_HEIGHT - CERT_CHAR_MARGIN_TOP
+
+# ==========================================
+
+LEFT_MARGIN_mm = 18
+RIGHT_MARGIN_mm = 18
+TITLE_Y_mm_from_top = 63.5
+TABLE_SPACE_AFTER_TITLE_mm = 16
+PAGE_NO_Y_mm = 8
+TABLE_BOTTOM_mm = 48   # lowest a report table may reach; the social links sit below it
+ROWS_PER_PAGE = 23
+DEFAULT_TEST_MAX_PER_FILE = 50.0
+
+# ✅ OUTPUT PROFILES (report + certificates)
+# print: images at full print resolution, photos passed through untouched.
+# mobile: for sharing on a phone - images downsampled to screen resolution and re-encoded as
+#         JPEG, cut-outs drawn with a 1-bit mask; a fraction of the print file size.
+# Page streams are compressed in both (it costs little time and the streams are mostly text).
+OUTPUT_PROFILES = {
+    "print": {"label": "Print", "dpi": 300, "jpeg_quality": None, "binary_alpha": False},
+    "mobile": {"label": "Mobile share", "dpi": 150, "jpeg_quality": 75, "binary_alpha": True},
+}
+DEFAULT_PROFILE = "print"
+
+# ✅ THEME COLORS
+COLOR_BLUE_HEADER = colors.HexColor("#0f5f9a")
+COLOR_GREEN = colors.HexColor("#C8E6C9")
+COLOR_YELLOW = colors.HexColor("#FFF9C4")
+COLOR_RED = colors.HexColor("#FFCDD2")
+COLOR_SAFFRON = colors.HexColor("#FF9933")
+COLOR_GOLD = colors.HexColor("#B8860B")
+COLOR_AWARD_TITLE = colors.HexColor("#8B0000") 
+
+# ✅ SUMMARY COLORS
+SUMMARY_COLORS = {
+    "METRIC_HEADER": colors.HexColor("#0070C0"), # Blue
+    "TOP_HEADER": colors.HexColor("#00B050"),    # Green
+    "BOTTOM_HEADER": colors.HexColor("#C00000"), # Red
+    "ROW_YELLOW": colors.HexColor("#FFF2CC"),
+    "ROW_GREEN": colors.HexColor("#E2EFDA"),
+    "ROW_RED": colors.HexColor("#FCE4D6"),
+    "ROW_WHITE": colors.white
+}
@@ -0,0 +1,210 @@
+"""Past months kept in a local SQLite file, so trends never need the old CSVs again.
+
+Saving a month stores every parsed test (normalized name -> score, with the test's max marks)
+and the final out_df. Everything is keyed by month ("YYYY-MM", so months sort as text), test
+number and normalized name:
+
+  months   month | saved_at | tests | students | total_max_marks
+  tests    month | test_no | digest | file_max
+  scores   month | test_no | name | score
+  results  month | name_key | Name | Total Tests | Present | Absent | Total Marks | Obtained | Percentage | Rank
+  aliases  alias | canonical | source (auto / manual) | method | similarity | updated
+
+The alias table is the memory of identity.resolve(): which spellings were merged into whom.
+
+Saving a month again replaces it. The database lives at SCORECARD_HISTORY_DB
+(default ~/.cache/murlidhar-scorecard/history.sqlite).
+"""
+import os
+import re
+import sqlite3
+import datetime
+import contextlib
+
+import pandas as pd
+
+import instrument
+from scoring import normalize_name, aggregate_scores
+
+HISTORY_DB = os.environ.get("SCORECARD_HISTORY_DB", os.path.join(os.path.expanduser("~"), ".cache", "murlidhar-scorecard", "history.sqlite"))
+MONTH_RE = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+RESULT_COLUMNS = ["Name", "Total Tests", "Present", "Absent", "Total Marks", "Obtained", "Percentage", "Rank"]
+_RESULT_SELECT = ", ".join(f'"{c}"' for c in RESULT_COLUMNS) + ', name_key AS "Key"'   # out_df's 'Key' is stored as name_key
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS months (
+    month TEXT PRIMARY KEY, saved_at TEXT NOT NULL, tests INTEGER NOT NULL,
+    students INTEGER NOT NULL, total_max_marks REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS tests (
+    month TEXT NOT NULL, test_no INTEGER NOT NULL, digest TEXT, file_max REAL NOT NULL,
+    PRIMARY KEY (month, test_no));
+CREATE TABLE IF NOT EXISTS scores (
+    month TEXT NOT NULL, test_no INTEGER NOT NULL, name TEXT NOT NULL, score REAL NOT NULL,
+    PRIMARY KEY (month, test_no, name)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS scores_by_name ON scores (name, month);
+CREATE TABLE IF NOT EXISTS results (
+    month TEXT NOT NULL, name_key TEXT NOT NULL, "Name" TEXT NOT NULL, "Total Tests" INTEGER, "Present" INTEGER,
+    "Absent" INTEGER, "Total Marks" INTEGER, "Obtained" REAL, "Percentage" REAL, "Rank" INTEGER,
+    PRIMARY KEY (month, name_key)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_by_name ON results (name_key, month);
+CREATE TABLE IF NOT EXISTS aliases (
+    alias TEXT PRIMARY KEY, canonical TEXT NOT NULL, source TEXT NOT NULL,
+    method TEXT, similarity REAL, updated TEXT NOT NULL);
+"""
+
+
+def current_month():
+    return datetime.date.today().strftime("%Y-%m")
+
+def check_month(month):
+    month = str(month).strip()
+    if not MONTH_RE.match(month): raise ValueError(f"month must look like YYYY-MM, got {month!r}")
+    return month
+
+@contextlib.contextmanager
+def connect(path=None):
+    """A connection with the schema in place; commits on success, rolls back on error."""
+    path = path or HISTORY_DB
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        with conn: yield conn
+    finally:
+        conn.close()
+
+# ---------------- SAVING ----------------
+def save_month(month, per_file_data, out_df, total_max_marks, path=None):
+    """Stores (or replaces) one month: its parsed tests and its result table."""
+    month = check_month(month)
+    keys = out_df['Key'].tolist()
+    results = out_df[RESULT_COLUMNS].astype(object).where(out_df[RESULT_COLUMNS].notna(), None)
+    with instrument.stage("history.save", tests=len(per_file_data), students=len(out_df)), connect(path) as conn:
+        for table in ("months", "tests", "scores", "results"):
+            conn.execute(f"DELETE FROM {table} WHERE month = ?", (month,))
+        conn.execute("INSERT INTO months VALUES (?, ?, ?, ?, ?)",
+                     (month, datetime.datetime.now().isoformat(timespec="seconds"), len(per_file_data), len(out_df), float(total_max_marks)))
+        conn.executemany("INSERT INTO tests VALUES (?, ?, ?, ?)",
+                         [(month, i, f.get('digest'), float(f['file_max'])) for i, f in enumerate(per_file_data)])
+        for i, f in enumerate(per_file_data):
+            conn.executemany("INSERT INTO scores VALUES (?, ?, ?, ?)",
+                             zip([month] * len(f['scores']), [i] * len(f['scores']), f['scores'].index.tolist(), f['scores'].astype(float).tolist()))
+        conn.executemany(f"INSERT INTO results VALUES (?, ?, {', '.join('?' * len(RESULT_COLUMNS))})",
+                         [(month, key, *row) for key, row in zip(keys, results.itertuples(index=False, name=None))])
+
+def delete_month(month, path=None):
+    month = check_month(month)
+    with connect(path) as conn:
+        for table in ("months", "tests", "scores", "results"):
+            conn.execute(f"DELETE FROM {table} WHERE month = ?", (month,))
+
+# ---------------- READING ----------------
+def list_months(path=None):
+    """Stored months, oldest first, with their test and student counts."""
+    with connect(path) as conn:
+        return pd.read_sql_query("SELECT month, saved_at, tests, students, total_max_marks FROM months ORDER BY month", conn)
+
+def previous_month(month, path=None):
+    """The latest stored month before `month`, or None."""
+    with connect(path) as conn:
+        row = conn.execute("SELECT max(month) FROM months WHERE month < ?", (check_month(month),)).fetchone()
+    return row[0] if row else None
+
+def load_results(month, path=None):
+    """The saved out_df of one month (same columns and order), or None if it is not stored."""
+    with connect(path) as conn:
+        df = pd.read_sql_query(f'SELECT {_RESULT_SELECT} FROM results WHERE month = ? ORDER BY "Rank", "Name"', conn, params=(check_month(month),))
+    return df if len(df) else None
+
+def load_per_file_data(months, path=None):
+    """per_file_data (as scoring builds it) for every stored test of the given months, in month/test order."""
+    months = [check_month(m) for m in months]
+    if not months: return []
+    marks = ", ".join("?" * len(months))
+    with connect(path) as conn:
+        tests = pd.read_sql_query(f"SELECT month, test_no, digest, file_max FROM tests WHERE month IN ({marks}) ORDER BY month, test_no", conn, params=months)
+        scores = pd.read_sql_query(f"SELECT month, test_no, name, score FROM scores WHERE month IN ({marks})", conn, params=months)
+    grouped = {key: g for key, g in scores.groupby(['month', 'test_no'], sort=False)}
+    per_file_data = []
+    for t in tests.itertuples(index=False):
+        g = grouped.get((t.month, t.test_no))
+        s = pd.Series(g['score'].to_numpy(dtype=float), index=g['name'].to_numpy()) if g is not None else pd.Series(dtype=float)
+        per_file_data.append({"file_max": float(t.file_max), "scores": s, "digest": t.digest or f"{t.month}/{t.test_no}"})
+    return per_file_data
+
+def cumulative_results(months, path=None):
+    """(out_df, total_max_marks) ranking every student over all tests of the given months together."""
+    with instrument.stage("history.cumulative", months=len(months)):
+        per_file_data = load_per_file_data(months, path)
+        if not per_file_data: return None, 0
+        return aggregate_scores(per_file_data)
+
+def student_trend(months=None, value="Rank", path=None):
+    """Name x month table of one result column (Rank, Percentage, Present, ...) across stored months."""
+    if value not in RESULT_COLUMNS[1:]: raise ValueError(f"unknown result column {value!r}")
+    query = f'SELECT month, name_key, "Name", "{value}" AS value FROM results'
+    params = []
+    if months:
+        params = [check_month(m) for m in months]
+        query += f" WHERE month IN ({', '.join('?' * len(params))})"
+    with connect(path) as conn:
+        df = pd.read_sql_query(query, conn, params=params)
+    if df.empty: return pd.DataFrame()
+    names = df.drop_duplicates('name_key', keep='last').set_index('name_key')['Name']
+    table = df.pivot(index='name_key', columns='month', values='value')
+    table.index = names.reindex(table.index).to_numpy()
+    table.index.name = "Name"
+    return table
+
+def attendance_trend(path=None):
+    """Per stored month: tests, students, average attendance % and average percentage."""
+    with connect(path) as conn:
+        return pd.read_sql_query(
+            'SELECT month, max("Total Tests") AS tests, count(*) AS students, '
+            'round(avg(100.0 * "Present" / "Total Tests"), 1) AS attendance_pct, round(avg("Percentage"), 1) AS avg_pct '
+            'FROM results GROUP BY month ORDER BY month', conn)
+
+# ---------------- ALIASES ----------------
+def load_aliases(path=None):
+    """{alias: (canonical, source)} for identity.resolve()."""
+    with connect(path) as conn:
+        return {alias: (canonical, source) for alias, canonical, source in conn.execute("SELECT alias, canonical, source FROM aliases")}
+
+def save_aliases(decisions, source="auto", path=None):
+    """Stores identity.resolve() decisions; automatic ones never overwrite a manual entry."""
+    if decisions is None or not len(decisions): return
+    decisions = decisions[decisions['method'] != "alias table"]   # already stored, keep their original method
+    now = datetime.datetime.now().isoformat(timespec="seconds")
+    rows = [(r.alias, r.canonical, source, r.method, float(r.similarity), now) for r in decisions.itertuples(index=False)]
+    with connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO aliases VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(alias) DO UPDATE SET "
+            "canonical = excluded.canonical, source = excluded.source, method = excluded.method, "
+            "similarity = excluded.similarity, updated = excluded.updated "
+            "WHERE aliases.source != 'manual' OR excluded.source = 'manual'", rows)
+
+def set_alias(alias, canonical, path=None):
+    """A manual decision: alias is always merged into canonical (canonical == alias keeps it apart)."""
+    alias, canonical = normalize_name(alias), normalize_name(canonical)
+    save_aliases(pd.DataFrame([(alias, canonical, "manual", 1.0)], columns=["alias", "canonical", "method", "similarity"]), source="manual", path=path)
+
+def list_aliases(path=None):
+    with connect(path) as conn:
+        return pd.read_sql_query("SELECT alias, canonical, source, method, similarity, updated FROM aliases ORDER BY canonical, alias", conn)
+
+# ---------------- RANK MOVEMENT ----------------
+def add_rank_change(out_df, month, path=None):
+    """out_df plus 'Prev Rank' and 'Rank Change' (positive = moved up) against the last stored month before `month`.
+
+    Returns (out_df, previous month); out_df comes back unchanged when there is nothing to compare with.
+    """
+    prev = previous_month(month, path)
+    if prev is None: return out_df, None
+    with instrument.stage("history.rank_change", students=len(out_df)), connect(path) as conn:
+        prev_ranks = pd.read_sql_query('SELECT name_key, "Rank" FROM results WHERE month = ?', conn, params=(prev,))
+    prev_rank = out_df['Key'].map(prev_ranks.set_index('name_key')['Rank'])
+    out_df = out_df.copy()
+    out_df['Prev Rank'] = prev_rank.astype('Int64').to_numpy()
+    out_df['Rank Change'] = (out_df['Prev Rank'] - out_df['Rank']).astype('Int64')
+    return out_df, prev
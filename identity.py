@@ -0,0 +1,214 @@
+"""One canonical student per person, however the name was typed in each export.
+
+normalize_name() only folds case and spaces, so "Patel Riya", "Riya Patel" and "Riya Patell"
+would be three students with a third of the scores each. resolve() merges such spellings
+before aggregation:
+
+  1. blocking - every name gets a few block keys: its tokens sorted, plus for each token the
+     other tokens with that token whole and with one character deleted (SymSpell style). Names
+     within one edit of each other, in any word order, share a key; nothing outside a block is
+     ever compared.
+  2. verification - pairs inside a block must be similar overall (difflib ratio), keep every
+     token that holds a digit exactly, and only edit tokens of MIN_FUZZY_TOKEN letters or more
+     ("Raj" and "Ram" are different people).
+  3. merging - two spellings that sit the same test are two students, so a merge is refused
+     when their tests overlap (a manual alias is applied anyway: the canonical spelling's score
+     is kept, and "overlaps" counts the tests where the alias's score was dropped). The most used spelling becomes the canonical name, and every
+     other spelling has to pass verification against it: pairs chain (A~B, B~C), and A and C
+     are only merged when each is close to the canonical name itself.
+
+Merging changes totals and ranks, so callers only resolve when asked to (pipeline.py and watch.py
+--merge-names, the app's checkbox) and show every decision for review.
+
+Decisions come back as an alias table (alias -> canonical) that history.py stores; known
+aliases are applied first next month, so a student keeps the same name across months.
+A manual entry whose canonical is the alias itself means "never merge this name".
+"""
+import re
+import difflib
+import hashlib
+import threading
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+import pandas as pd
+
+import instrument
+from scoring import build_score_matrix
+
+MIN_SIMILARITY = 0.85
+MIN_FUZZY_TOKEN = 4
+MAX_BLOCK = 50      # a key shared by more names than this says nothing about identity
+DECISION_COLUMNS = ["alias", "canonical", "method", "similarity", "tests", "overlaps"]
+RESOLVE_CACHE_SIZE = 16   # resolved months kept, keyed by file hashes and the alias table
+_DIGIT = re.compile(r"\d")
+_resolved = OrderedDict()
+_resolved_lock = threading.Lock()
+
+
+def sorted_key(name):
+    return " ".join(sorted(name.split()))
+
+def block_keys(name):
+    tokens = sorted(name.split())
+    keys = {" ".join(tokens)}
+    for i, tok in enumerate(tokens):
+        rest = " ".join(tokens[:i] + tokens[i+1:])
+        if len(tok) == 1 and len(tokens) > 2:
+            keys.add(rest)   # a dropped middle initial
+        if len(tok) >= MIN_FUZZY_TOKEN - 1 and not _DIGIT.search(tok):
+            # "rest | token" meets "rest | token with one letter deleted" of the longer spelling,
+            # and two deletions meet each other (one letter typed differently)
+            keys.add(f"{rest}|{tok}")
+            if len(tok) >= MIN_FUZZY_TOKEN:
+                keys.update(f"{rest}|{tok[:j]}{tok[j+1:]}" for j in range(len(tok)))
+    return keys
+
+def _digits(name):
+    return sorted(tok for tok in name.split() if _DIGIT.search(tok))
+
+def similarity(a, b):
+    """How alike two normalized names are, ignoring word order (0..1)."""
+    ka, kb = sorted_key(a), sorted_key(b)
+    if ka == kb: return 1.0
+    if _digits(a) != _digits(b): return 0.0
+    return difflib.SequenceMatcher(None, ka, kb, autojunk=False).ratio()
+
+def candidate_pairs(names):
+    """{(i, j): similarity} for names (a list) that share a block and pass verification."""
+    blocks = defaultdict(list)
+    for i, name in enumerate(names):
+        for key in block_keys(name): blocks[key].append(i)
+    pairs = {}
+    for members in blocks.values():
+        if len(members) < 2 or len(members) > MAX_BLOCK: continue
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                pair = (members[x], members[y])
+                if pair in pairs: continue
+                pairs[pair] = similarity(names[pair[0]], names[pair[1]])
+    return {pair: score for pair, score in pairs.items() if score >= MIN_SIMILARITY}
+
+class _Clusters:
+    # Union-find over name indices that also tracks which tests each cluster sat
+    def __init__(self, presence):
+        self.parent = list(range(len(presence)))
+        self.presence = {i: p for i, p in enumerate(presence)}
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j, force=False):
+        ri, rj = self.find(i), self.find(j)
+        if ri == rj: return True
+        if not force and (self.presence[ri] & self.presence[rj]).any(): return False
+        self.parent[rj] = ri
+        self.presence[ri] = self.presence[ri] | self.presence.pop(rj)
+        return True
+
+def no_decisions():
+    return pd.DataFrame(columns=DECISION_COLUMNS)
+
+def resolve(per_file_data, aliases=None):
+    """Merges spellings of the same student; returns (per_file_data, decisions DataFrame).
+
+    aliases: {alias: (canonical, source)} from history.load_aliases(); "manual" entries are
+    applied even when the tests overlap, "auto" ones only when they still make sense.
+    """
+    aliases = aliases or {}
+    if not per_file_data: return per_file_data, no_decisions()
+    with instrument.stage("identity", tests=len(per_file_data)) as s:
+        students, matrix = build_score_matrix(per_file_data)
+        names = [str(n) for n in students]
+        presence = list((~np.isnan(matrix)).T)
+        index = {name: i for i, name in enumerate(names)}
+        s.add(names=len(names))
+
+        # Canonical names from the alias table join as nodes even when absent this month
+        keep_apart = {a for a, (c, src) in aliases.items() if a == c}
+        for alias, (canonical, _) in aliases.items():
+            for n in (alias, canonical):
+                if n not in index:
+                    index[n] = len(names); names.append(n); presence.append(np.zeros(len(per_file_data), dtype=bool))
+        clusters = _Clusters(presence)
+        sat = [int(p.sum()) for p in presence]
+        method = {}
+
+        for alias, (canonical, source) in aliases.items():
+            if alias == canonical or sat[index[alias]] == 0: continue
+            if clusters.union(index[canonical], index[alias], force=(source == "manual")):
+                method[alias] = ("alias table", 1.0)
+
+        pairs = candidate_pairs(names)
+        s.add(pairs=len(pairs))
+        for (i, j), score in sorted(pairs.items(), key=lambda kv: -kv[1]):
+            if names[i] in keep_apart or names[j] in keep_apart: continue
+            if sat[i] == 0 and sat[j] == 0: continue
+            clusters.union(i, j)
+
+        groups = defaultdict(list)
+        for i in range(len(names)): groups[clusters.find(i)].append(i)
+        known_canonical = {c for a, (c, src) in aliases.items() if a != c}
+        mapping, rows = {}, []
+        for members in groups.values():
+            if len(members) < 2: continue
+            # A canonical name from earlier months wins, then the spelling used in most tests
+            canonical = max(members, key=lambda i: (names[i] in known_canonical, sat[i], -len(names[i]), names[i]))
+            for i in members:
+                if i == canonical or sat[i] == 0: continue
+                if names[i] in method:
+                    label, score = method[names[i]]
+                else:
+                    # Linked through other spellings only: it must be close to the canonical name too
+                    score = similarity(names[i], names[canonical])
+                    if score < MIN_SIMILARITY or not block_keys(names[i]) & block_keys(names[canonical]): continue
+                    label = "word order" if score == 1.0 else "fuzzy"
+                mapping[names[i]] = names[canonical]
+                rows.append((names[i], names[canonical], label, round(score, 3), sat[i]))
+        resolved, overlaps = apply_aliases(per_file_data, mapping)
+        s.add(merged=len(mapping), overlaps=sum(overlaps.values()))
+
+        rows = [row + (overlaps.get(row[0], 0),) for row in rows]
+        decisions = pd.DataFrame(rows, columns=DECISION_COLUMNS).sort_values(["canonical", "alias"]).reset_index(drop=True)
+        return resolved, decisions
+
+def resolve_cached(per_file_data, aliases=None):
+    """resolve() memoised on the content hashes of the files and the alias table (shared result, do not modify)."""
+    key = (tuple(f['digest'] for f in per_file_data), tuple(sorted((aliases or {}).items())))
+    with _resolved_lock:
+        if key in _resolved:
+            _resolved.move_to_end(key)
+            instrument.count("identity.cached", months=1)
+            return _resolved[key]
+    result = resolve(per_file_data, aliases)
+    with _resolved_lock:
+        _resolved[key] = result
+        while len(_resolved) > RESOLVE_CACHE_SIZE: _resolved.popitem(last=False)
+    return result
+
+def apply_aliases(per_file_data, mapping):
+    """(per_file_data with names renamed by mapping, {alias: tests where its score was dropped}).
+
+    Files that change get a new digest (so cached tables do not mix). When two spellings of one
+    student sat the same test, the canonical spelling's score is kept, else the first one listed.
+    """
+    overlaps = defaultdict(int)
+    if not mapping: return per_file_data, dict(overlaps)
+    tag = hashlib.sha256(repr(sorted(mapping.items())).encode()).hexdigest()[:16]
+    aliases = pd.Index(list(mapping))
+    resolved = []
+    for f in per_file_data:
+        scores = f['scores']
+        is_alias = scores.index.isin(aliases)
+        if not is_alias.any():
+            resolved.append(f); continue
+        targets = pd.Index([mapping.get(n, n) for n in scores.index])
+        order = np.argsort(is_alias, kind='stable')
+        dropped = np.zeros(len(scores), dtype=bool)
+        dropped[order] = targets[order].duplicated()
+        for alias in scores.index[dropped]: overlaps[alias] += 1
+        resolved.append({**f, "scores": scores.set_axis(targets)[~dropped], "digest": f"{f['digest']}~{tag}"})
+    return resolved, dict(overlaps)
@@ -0,0 +1,81 @@
+"""Decoded, print-sized ImageReaders for the asset images; loaded by assets.get_image_reader() on first use."""
+import io
+
+import numpy as np
+from PIL import Image, ImageOps
+from reportlab.lib.utils import ImageReader
+
+JPEG_QUALITY = 95
+
+
+class SharedImageReader(ImageReader):
+    """ImageReader that can be drawn from many threads and documents at once.
+
+    Pixel data is decoded once up front (reportlab would otherwise do it lazily, racing between
+    threads), and untouched JPEGs are handed to the PDF as-is from an immutable copy of the bytes
+    instead of being re-compressed on every render.
+    """
+    def __init__(self, img, jpeg_bytes=None, transparent=None):
+        super().__init__(img)
+        self._jpeg_bytes = jpeg_bytes
+        self._transparent = transparent
+        if jpeg_bytes: self.jpeg_fh = self._shared_jpeg_fh
+        self.getRGBData()
+
+    def _shared_jpeg_fh(self):
+        return io.BytesIO(self._jpeg_bytes)
+
+    def getTransparent(self):
+        # With mask='auto' reportlab turns this colour into a 1-bit colour-key /Mask
+        return self._transparent if self._transparent is not None else super().getTransparent()
+
+def _fit_to_print_size(img, size, dpi):
+    # preserveAspectRatio draws the image inside the box, so the tighter side decides the pixels needed
+    box_w, box_h = (size[0] / 72.0 * dpi, size[1] / 72.0 * dpi)
+    scale = min(box_w / img.width, box_h / img.height)
+    if scale >= 1: return img
+    return img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.LANCZOS)
+
+def _stencil_reader(img):
+    # A cut-out (alpha only ever fully in or out) needs no 8-bit soft mask: transparent pixels are
+    # painted in a colour no visible pixel uses, and the PDF keys that colour out with a 1-bit mask
+    inside = img.getchannel('A').point(lambda a: 255 if a >= 128 else 0)
+    rgb = img.convert('RGB')
+    px = np.asarray(rgb, dtype=np.int32).reshape(-1, 3)
+    used = np.unique((px[:, 0] << 16 | px[:, 1] << 8 | px[:, 2])[np.asarray(inside).reshape(-1) > 0])
+    free = int(np.setdiff1d(np.arange(len(used) + 1), used)[0])
+    key = (free >> 16, free >> 8 & 255, free & 255)
+    rgb.paste(key, (0, 0) + rgb.size, ImageOps.invert(inside))
+    return SharedImageReader(rgb, transparent=key)
+
+def build_reader(data, opacity, size, dpi, jpeg_quality=None, binary_alpha=False):
+    img = Image.open(io.BytesIO(data))
+    is_jpeg = img.format == 'JPEG' and img.mode in ('RGB', 'L')
+    has_alpha = img.mode in ('RGBA', 'LA') or 'transparency' in img.info
+    if opacity is not None and (opacity < 1 or has_alpha):
+        img = img.convert("RGBA")
+        lut = [int(p * opacity) for p in range(256)]
+        img.putalpha(img.getchannel('A').point(lut))
+        is_jpeg = False
+    elif img.mode not in ('RGB', 'L', 'CMYK', 'RGBA', 'LA'):
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+    stencil = False
+    if binary_alpha and img.mode in ('RGBA', 'LA'):
+        hist = img.getchannel('A').histogram()
+        if not any(hist[:255]): img = img.convert(img.mode[:-1])   # fully opaque: the alpha channel is dead weight
+        else: stencil = not any(hist[1:255])
+    scaled = _fit_to_print_size(img, size, dpi) if size else img
+    if stencil: return _stencil_reader(scaled)
+    # A downsampled photo stays JPEG so it still passes straight through to the PDF; with
+    # jpeg_quality every opaque image becomes a JPEG of that quality
+    if jpeg_quality and scaled.mode in ('RGB', 'L'): quality = jpeg_quality
+    elif is_jpeg and scaled is not img: quality = JPEG_QUALITY
+    else: quality = None
+    if quality:
+        buf = io.BytesIO()
+        scaled.save(buf, format='JPEG', quality=quality)
+        # An untouched JPEG is only swapped for a smaller one
+        if not (is_jpeg and scaled is img and buf.tell() >= len(data)):
+            data, is_jpeg = buf.getvalue(), True
+            scaled = Image.open(io.BytesIO(data))
+    return SharedImageReader(scaled, jpeg_bytes=data if is_jpeg else None)
@@ -0,0 +1,162 @@
+"""Per-stage timing (and optionally memory) for one app rerun, render job or batch.
+
+    run = instrument.start_run("batch")
+    with instrument.stage("report.tables") as s:
+        ...
+        s.add(pages=12)
+    record = instrument.finish_run(run)   # also appended to the JSON-lines log
+
+Stages with the same name add up (calls, seconds and counts), including ones that finish in
+worker threads started with instrument.propagate(). A stage outside a run - or any stage when
+SCORECARD_INSTRUMENT=0 - is a shared do-nothing object, so the calls can stay in production code.
+
+The app logs the reruns that did real work (ingest, aggregation, history) and its render jobs,
+but not reruns that only re-draw the page; batches and watch polls that did work log themselves. The log is rotated past RUN_LOG_MAX_BYTES: one previous file (".1")
+is kept.
+
+Memory peaks are process-wide: tracemalloc has a single peak for the whole process, so a stage's
+peak_mb is the most traced memory in use anywhere while it ran, other sessions and jobs included.
+The peak is only reset when no measured stage is open, so concurrent stages never cut each
+other's figure short; each is an upper bound on the stage's own use.
+
+Settings (environment):
+  SCORECARD_INSTRUMENT   0 turns everything off (default on)
+  SCORECARD_TRACEMALLOC  1 also records tracemalloc peaks per stage (slows Python-heavy stages)
+  SCORECARD_RUN_LOG      JSON-lines file runs are appended to; empty disables it
+"""
+import os
+import json
+import time
+import datetime
+import threading
+import contextvars
+import tracemalloc
+
+def _flag(name, default):
+    return os.environ.get(name, default).strip().lower() in ("1", "true", "yes")
+
+ENABLED = _flag("SCORECARD_INSTRUMENT", "1")
+TRACE_MEMORY = _flag("SCORECARD_TRACEMALLOC", "0")
+RUN_LOG = os.environ.get("SCORECARD_RUN_LOG", os.path.join(os.path.expanduser("~"), ".cache", "murlidhar-scorecard", "runs.jsonl"))
+RUN_LOG_MAX_BYTES = 8 * 2**20
+
+_current = contextvars.ContextVar("scorecard_run", default=None)
+_log_lock = threading.Lock()
+_traced = 0   # stages measuring memory right now, in any run and thread
+_traced_lock = threading.Lock()
+
+
+class _NoStage:
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+    def add(self, **counts): pass
+
+_NO_STAGE = _NoStage()
+
+def _trace_enter():
+    global _traced
+    with _traced_lock:
+        # Resetting the peak under a stage that is still open would cut its figure short
+        if _traced == 0: tracemalloc.reset_peak()
+        _traced += 1
+
+def _trace_exit():
+    global _traced
+    peak = tracemalloc.get_traced_memory()[1]
+    with _traced_lock: _traced -= 1
+    return peak
+
+class _Stage:
+    __slots__ = ("run", "name", "counts", "started")
+    def __init__(self, run, name, counts):
+        self.run, self.name, self.counts = run, name, counts
+
+    def __enter__(self):
+        if self.run.trace_memory: _trace_enter()
+        self.started = time.perf_counter()
+        return self
+
+    def add(self, **counts):
+        for k, v in counts.items(): self.counts[k] = self.counts.get(k, 0) + v
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        peak = _trace_exit() if self.run.trace_memory else None
+        self.run.record(self.name, elapsed, self.counts, peak)
+        return False
+
+class Run:
+    def __init__(self, kind, **meta):
+        self.kind, self.meta = kind, meta
+        self.stages = {}
+        self.started = time.perf_counter()
+        self.created = datetime.datetime.now().isoformat(timespec="seconds")
+        self.trace_memory = TRACE_MEMORY
+        self.peak = 0
+        self._lock = threading.Lock()
+        if self.trace_memory and not tracemalloc.is_tracing(): tracemalloc.start()
+
+    def record(self, name, seconds, counts, peak=None):
+        with self._lock:
+            entry = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+            for k, v in counts.items(): entry[k] = entry.get(k, 0) + v
+            if peak is not None:
+                entry["peak_mb"] = max(entry.get("peak_mb", 0.0), peak / 2**20)
+                self.peak = max(self.peak, peak)
+
+    def to_record(self):
+        with self._lock:
+            stages = {name: {k: round(v, 4) if isinstance(v, float) else v for k, v in entry.items()} for name, entry in self.stages.items()}
+        record = {"ts": self.created, "run": self.kind, **self.meta, "total_s": round(time.perf_counter() - self.started, 4), "stages": stages}
+        if self.trace_memory and self.peak: record["peak_mb"] = round(self.peak / 2**20, 2)
+        return record
+
+
+def start_run(kind, **meta):
+    """Starts collecting stages in this context; None (and nothing recorded) when instrumentation is off."""
+    if not ENABLED: return None
+    run = Run(kind, **meta)
+    _current.set(run)
+    return run
+
+def finish_run(run, log=True):
+    """The run's record (None for a disabled run); appended to RUN_LOG when any stage ran."""
+    if run is None: return None
+    if _current.get() is run: _current.set(None)
+    record = run.to_record()
+    if log and record["stages"]: append_log(record)
+    return record
+
+def current_run():
+    return _current.get()
+
+def stage(name, **counts):
+    run = _current.get()
+    if run is None: return _NO_STAGE
+    return _Stage(run, name, dict(counts))
+
+def count(name, **counts):
+    """Adds counts to a stage without timing anything (cache hits and the like)."""
+    run = _current.get()
+    if run is not None: run.record(name, 0.0, counts)
+
+def propagate(fn):
+    """fn bound to the caller's run, for handing to a thread pool (threads do not inherit it)."""
+    if _current.get() is None: return fn
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.copy().run(fn, *args, **kwargs)
+
+def append_log(record, path=None):
+    path = RUN_LOG if path is None else path
+    if not path: return
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        line = json.dumps(record, default=str)
+        with _log_lock:
+            if os.path.exists(path) and os.path.getsize(path) >= RUN_LOG_MAX_BYTES: os.replace(path, f"{path}.1")
+            with open(path, "a", encoding="utf-8") as f: f.write(line + "\n")
+    except OSError as e:
+        print(f"Could not write run log {path}: {e}")
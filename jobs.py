@@ -0,0 +1,157 @@
+"""Background render jobs: documents are generated off the Streamlit script thread, a few at a time.
+
+    job = jobs.submit(key, "Certificates", render)   # render() -> the document (bytes, or anything with a len())
+    job.progress                                     # (37, 120, "certificate") as last reported
+    job.cancel()
+
+Every job runs on one process-wide pool of SCORECARD_RENDER_JOBS threads (default 2), so however
+many staff click Generate at once, at most that many documents render together and the rest queue.
+Jobs belong to the server, not to a page: submitting the key of a job that is still queued or
+running returns that job, so a rerun or a refreshed page reconnects to it instead of starting over.
+
+Renderers call jobs.progress(done, total, unit) as they go. Outside a job it does nothing; inside a
+cancelled one it raises Cancelled, which stops the render at the next page. Each job records its
+own instrument run (kind "job"), kept on job.record.
+"""
+import os
+import time
+import uuid
+import threading
+import contextlib
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import instrument
+
+MAX_JOBS = int(os.environ.get("SCORECARD_RENDER_JOBS", "0") or 0) or 2
+KEEP_FINISHED = 32   # finished jobs remembered, so their outcome can still be shown
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+_current = contextvars.ContextVar("scorecard_job", default=None)
+_quiet = contextvars.ContextVar("scorecard_job_quiet", default=False)
+_jobs = OrderedDict()   # id -> Job, oldest first
+_by_key = {}            # key -> latest Job for that key
+_lock = threading.Lock()
+_pool = None
+
+
+class Cancelled(Exception):
+    """Raised inside a render whose job has been cancelled."""
+
+class Job:
+    def __init__(self, key, label):
+        self.id = uuid.uuid4().hex[:12]
+        self.key, self.label = key, label
+        self.state = QUEUED
+        self.progress = (0, 0, "")
+        self.error = None
+        self.size = None
+        self.record = None
+        self.submitted, self.started, self.finished = time.time(), None, None
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def active(self):
+        return self.state in (QUEUED, RUNNING)
+
+    @property
+    def seconds(self):
+        """Render time so far (queueing not included)."""
+        if self.started is None: return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def fraction(self):
+        done, total, _ = self.progress
+        return min(1.0, done / total) if total else 0.0
+
+    def describe(self):
+        if self.state == QUEUED: return f"{self.label}: waiting for a free slot ({queued_ahead(self)} ahead)"
+        done, total, unit = self.progress
+        if self.state == RUNNING: return f"{self.label}: {unit} {done}/{total}" if total else f"{self.label}: starting..."
+        return f"{self.label}: {self.state}"
+
+    def cancel(self):
+        """Stops the job: a queued one never starts, a running one stops at its next progress report."""
+        self._cancel.set()
+        if self._future is not None and self._future.cancel(): self._finish(CANCELLED)
+
+    def _finish(self, state):
+        self.finished = time.time()
+        self.state = state
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None: _pool = ThreadPoolExecutor(max_workers=MAX_JOBS, thread_name_prefix="render-job")
+        return _pool
+
+def _prune():
+    # Called with _lock held; forgets the oldest finished jobs beyond KEEP_FINISHED
+    finished = [job for job in _jobs.values() if not job.active]
+    for job in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+        del _jobs[job.id]
+        if _by_key.get(job.key) is job: del _by_key[job.key]
+
+def submit(key, label, render):
+    """Queues render() (which returns the document, sized by len()) as a job, or returns the active job for key."""
+    with _lock:
+        job = _by_key.get(key)
+        if job is not None and job.active: return job
+        job = Job(key, label)
+        _jobs[job.id] = job
+        _by_key[key] = job
+        _prune()
+    job._future = _get_pool().submit(_run, job, render)
+    return job
+
+def _run(job, render):
+    if job._cancel.is_set():
+        job._finish(CANCELLED); return
+    job.state, job.started = RUNNING, time.time()
+    token = _current.set(job)
+    run = instrument.start_run("job", job=job.label)
+    state = FAILED
+    try:
+        job.size = len(render())
+        state = DONE
+    except Cancelled:
+        state = CANCELLED
+    except Exception as e:
+        job.error = str(e) or type(e).__name__
+        print(f"{job.label} failed: {job.error}")
+    finally:
+        job.record = instrument.finish_run(run)
+        _current.reset(token)
+        job._finish(state)
+
+def get(job_id):
+    with _lock: return _jobs.get(job_id)
+
+def find(key):
+    """The latest job for key (running or finished), or None."""
+    with _lock: return _by_key.get(key)
+
+def queued_ahead(job):
+    with _lock:
+        return sum(1 for other in _jobs.values() if other.state == QUEUED and other.submitted < job.submitted)
+
+# ---------------- CALLED FROM RENDERERS ----------------
+def progress(done, total, unit):
+    """Reports how far the current job is; raises Cancelled if it has been cancelled. No-op outside a job."""
+    job = _current.get()
+    if job is None: return
+    if job._cancel.is_set(): raise Cancelled(f"{job.label} cancelled")
+    if not _quiet.get(): job.progress = (done, total, unit)
+
+@contextlib.contextmanager
+def quiet():
+    """Progress reported inside is not shown (cancellation still applies): for one step of a bigger render."""
+    token = _quiet.set(True)
+    try:
+        yield
+    finally:
+        _quiet.reset(token)
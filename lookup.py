@@ -0,0 +1,347 @@
+"""Student result lookup: a small local HTTP/JSON service over the latest out_df.
+
+    python lookup.py [--port 8765] [--host 127.0.0.1] [--source history|WATCH_DIR] [--interval 5]
+
+  GET /student?name=Riya Patel    one student's row (404 with "suggestions" when nobody matches)
+  GET /search?q=riy pat&limit=10  name prefix matches (any word of the name), topped up with
+                                  fuzzy matches for typos; best rank first
+  GET /health                     which table is being served, how many students, when it was built
+
+Everything is answered from a ResultIndex held in memory: rows keyed by normalize_name() with
+their JSON already encoded, a sorted list of name suffixes (one per word) for prefix search and
+SymSpell-style one-deletion keys per word (as identity.py blocks names) for fuzzy search. An
+index is never changed once built; publish() builds the next one aside and swaps it in with one
+assignment, so a request sees either the old table or the new one, never a mix.
+
+Connections stay open between lookups (HTTP/1.1 keep-alive), but one idle for IDLE_TIMEOUT or
+slow to send its request (READ_TIMEOUT) is dropped, and over-long header lines, too many headers,
+large bodies or more than MAX_CONNECTIONS clients at once are refused rather than waited on.
+
+The source is polled for a newer aggregation: "history" serves the latest saved month of the
+history store (saved from the app, pipeline --month, or a month closed by watch.py); a folder
+serves the newest month of the ledgers watch.py keeps for it (in its private state folder). watch.py --serve runs this service
+inside the daemon instead and publishes every snapshot as soon as it is built.
+"""
+import sys
+import json
+import time
+import bisect
+import asyncio
+import difflib
+import sqlite3
+import argparse
+import datetime
+import threading
+from collections import defaultdict
+from urllib.parse import urlsplit, parse_qs
+from http import HTTPStatus
+
+import numpy as np
+import pandas as pd
+
+import history
+import instrument
+from identity import MIN_FUZZY_TOKEN
+from scoring import normalize_name
+
+DEFAULT_PORT = 8765
+SEARCH_LIMIT = 10          # matches returned by /search unless ?limit= asks for fewer (MAX_LIMIT at most)
+MAX_LIMIT = 50
+SUGGESTIONS = 5            # fuzzy suggestions in a /student 404
+MIN_FUZZY_SCORE = 0.75     # average best word similarity a fuzzy match needs
+MAX_FUZZY_CANDIDATES = 500 # names scored per fuzzy query; common words are narrowed by the others first
+SERVER_NAME = "ScorecardLookup/1"
+IDLE_TIMEOUT = 30          # seconds a keep-alive connection may wait for its next request
+READ_TIMEOUT = 10          # seconds a started request (its headers and any body) has to arrive
+MAX_CONNECTIONS = 1024     # open at once; more are answered 503 and closed
+MAX_HEADER_LINE = 8192     # bytes in the request line or one header line
+MAX_HEADERS = 64           # header lines per request
+MAX_BODY = 65536           # a request body this small is read past; a bigger one closes the connection
+ROW_COLUMNS = ["Name", "Rank", "Obtained", "Total Marks", "Percentage", "Present", "Absent", "Total Tests", "Prev Rank", "Rank Change"]
+
+
+def _word_keys(word):
+    # The word and, for words long enough to be typo'd, every one-letter deletion of it: two
+    # spellings within one edit share a key (identity.block_keys does the same per name)
+    keys = {word}
+    if len(word) >= MIN_FUZZY_TOKEN: keys.update(word[:j] + word[j+1:] for j in range(len(word)))
+    return keys
+
+def _word_similarity(query_words, name_words):
+    # Mean over the query's words of the best match among the name's words (word order is free)
+    return sum(max(difflib.SequenceMatcher(None, q, w, autojunk=False).ratio() for w in name_words) for q in query_words) / len(query_words)
+
+
+class ResultIndex:
+    """An immutable lookup index over one out_df."""
+
+    def __init__(self, out_df, label=None):
+        started = time.perf_counter()
+        with instrument.stage("lookup.build", students=len(out_df)):
+            keys = out_df['Key'].tolist()
+            columns = [c for c in ROW_COLUMNS if c in out_df.columns]
+            # Column-wise to Python values (NA -> None), then one JSON document per student
+            values = [[None if pd.isna(v) else v for v in out_df[c].astype(object).tolist()] for c in columns]
+            self.label = label
+            self.students = len(out_df)
+            self.rows = {}
+            self.ranks = {}
+            for key, row in zip(keys, zip(*values)):
+                if key in self.rows: continue   # keep the better-ranked one
+                record = dict(zip(columns, row))
+                self.rows[key] = json.dumps(record, default=_json_default).encode()
+                self.ranks[key] = record.get("Rank") or 0
+            # "riya k patel" is found by "riya", "k p" and "patel"
+            self.suffixes = sorted({(" ".join(words[i:]), key) for key in self.rows for words in [key.split()] for i in range(len(words))})
+            self.suffix_keys = [s for s, _ in self.suffixes]
+            self.fuzzy = defaultdict(set)
+            for key in self.rows:
+                for word in key.split():
+                    for k in _word_keys(word): self.fuzzy[k].add(key)
+        self.built_at = datetime.datetime.now().isoformat(timespec="seconds")
+        self.build_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    def get(self, name):
+        """The student's row as encoded JSON, or None."""
+        return self.rows.get(normalize_name(name))
+
+    def prefix(self, query, limit):
+        """Normalized names with a word starting the query, best rank first."""
+        query = normalize_name(query)
+        if not query: return []
+        found = []
+        i = bisect.bisect_left(self.suffix_keys, query)
+        # Scan the sorted suffixes that start with the query; stop once enough names are in hand
+        while i < len(self.suffixes) and self.suffix_keys[i].startswith(query) and len(found) < 4 * limit:
+            key = self.suffixes[i][1]
+            if key not in found: found.append(key)
+            i += 1
+        return sorted(found, key=lambda k: (self.ranks[k], k))[:limit]
+
+    def fuzzy_matches(self, query, limit, exclude=()):
+        """[(normalized name, score)] within about one typo per word, best first."""
+        words = normalize_name(query).split()
+        if not words: return []
+        per_word = []
+        for word in words:
+            hits = set()
+            for k in _word_keys(word): hits |= self.fuzzy.get(k, set())
+            per_word.append(hits)
+        # Names matching every word of the query first; any word only if none match them all
+        candidates = set.intersection(*per_word) or set.union(*per_word)
+        candidates = sorted(candidates - set(exclude), key=lambda k: (self.ranks[k], k))[:MAX_FUZZY_CANDIDATES]
+        scored = [(k, _word_similarity(words, k.split())) for k in candidates]
+        scored = [(k, s) for k, s in scored if s >= MIN_FUZZY_SCORE]
+        return sorted(scored, key=lambda ks: (-ks[1], self.ranks[ks[0]]))[:limit]
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """[(normalized name, "prefix" | "fuzzy")]: prefix matches, then fuzzy ones to fill up to limit."""
+        matches = [(k, "prefix") for k in self.prefix(query, limit)]
+        if len(matches) < limit:
+            matches += [(k, "fuzzy") for k, _ in self.fuzzy_matches(query, limit - len(matches), exclude=[k for k, _ in matches])]
+        return matches
+
+    def health(self):
+        return {"source": self.label, "students": self.students, "built_at": self.built_at, "build_ms": self.build_ms}
+
+def _json_default(value):
+    if isinstance(value, np.integer): return int(value)
+    if isinstance(value, np.floating): return float(value)
+    raise TypeError(f"cannot encode {type(value).__name__}")
+
+# ---------------- THE SERVED INDEX ----------------
+_index = ResultIndex(pd.DataFrame(columns=ROW_COLUMNS[:8] + ["Key"]), label=None)
+_publish_lock = threading.Lock()
+
+def publish(out_df, label=None):
+    """Builds an index over out_df and makes it the one every request from now on is answered from."""
+    global _index
+    index = ResultIndex(out_df, label)
+    with _publish_lock: _index = index
+    return index
+
+def current():
+    return _index
+
+# ---------------- HTTP ----------------
+def respond(target):
+    """(status, JSON body) for one GET request target ("/student?name=..."), from the current index."""
+    url = urlsplit(target)
+    params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+    index = _index   # one read: the whole request is answered from the same table
+    meta = json.dumps({"source": index.label, "students": index.students})[:-1].encode()
+    if url.path == "/student":
+        row = index.get(params.get("name", ""))
+        if row is not None:
+            return 200, meta + b', "result": ' + row + b"}"
+        suggestions = [k for k, _ in index.fuzzy_matches(params.get("name", ""), SUGGESTIONS)]
+        return 404, meta + b', "result": null, "suggestions": [' + b", ".join(index.rows[k] for k in suggestions) + b"]}"
+    if url.path == "/search":
+        try:
+            limit = max(1, min(MAX_LIMIT, int(params.get("limit", SEARCH_LIMIT))))
+        except ValueError:
+            return 400, b'{"error": "limit must be a number"}'
+        matches = index.search(params.get("q", ""), limit)
+        body = b", ".join(b'{"match": "' + how.encode() + b'", "result": ' + index.rows[k] + b"}" for k, how in matches)
+        return 200, meta + b', "matches": [' + body + b"]}"
+    if url.path == "/health":
+        return 200, json.dumps(index.health()).encode()
+    return 404, b'{"error": "unknown path; use /student?name=, /search?q= or /health"}'
+
+async def _read_headers(reader):
+    # {lowercased name: value} of one request's header lines (the request line already read)
+    headers = {}
+    while (header := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        if len(headers) >= MAX_HEADERS: raise ValueError("too many header lines")
+        name, _, value = header.partition(b":")
+        headers[name.strip().lower()] = value.strip()
+    return headers
+
+async def _skip_body(reader, headers):
+    """Reads past the request's body (lookups never use one); False when the connection has to close instead."""
+    if b"transfer-encoding" in headers: return False   # chunked: not worth parsing, hang up after answering
+    length = int(headers.get(b"content-length", b"0"))   # ValueError on garbage: the connection is dropped
+    if length > MAX_BODY or length < 0: return False
+    if length: await reader.readexactly(length)
+    return True
+
+def _response(status, body, keep_alive):
+    return (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            f"Server: {SERVER_NAME}\r\nContent-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode() + body
+
+class LookupServer:
+    """The service's event loop, running on a background thread."""
+
+    def __init__(self, host, port):
+        self.writers = {}   # open connection -> loop time by which it has to have sent its next piece
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="lookup-http", daemon=True)
+        self.thread.start()
+        # backlog: hundreds of clients connecting at once must not be refused; limit: longest line read
+        start = asyncio.start_server(self._connection, host, port, backlog=1024, limit=MAX_HEADER_LINE)
+        self.server = asyncio.run_coroutine_threadsafe(start, self.loop).result()
+        self.server_address = self.server.sockets[0].getsockname()
+        self.sweeper = asyncio.run_coroutine_threadsafe(self._sweep(), self.loop)
+
+    async def _sweep(self):
+        # One timer for every connection: asyncio.wait_for() around each read costs a task per
+        # request, a third of the throughput under load
+        while True:
+            await asyncio.sleep(1)
+            now = self.loop.time()
+            for writer, deadline in list(self.writers.items()):
+                if deadline < now: writer.transport.abort()   # its pending read ends as a closed connection
+
+    async def _connection(self, reader, writer):
+        # HTTP/1.1 keep-alive: a client can send many lookups over one connection. Every lookup is
+        # a few microseconds of Python, so one event loop answers them in arrival order; a thread
+        # per connection would leave some clients waiting seconds for the GIL under load
+        if len(self.writers) >= MAX_CONNECTIONS:
+            writer.write(_response(503, b'{"error": "too many connections"}', False))
+            writer.close()
+            return
+        try:
+            while True:
+                # Idle keep-alive clients are dropped after IDLE_TIMEOUT, slow senders after READ_TIMEOUT
+                self.writers[writer] = self.loop.time() + IDLE_TIMEOUT
+                line = await reader.readline()
+                if not line: break
+                self.writers[writer] = self.loop.time() + READ_TIMEOUT
+                headers = await _read_headers(reader)
+                connection = headers.get(b"connection", b"").lower()
+                keep_alive = connection != b"close" if line.rstrip().endswith(b"HTTP/1.1") else connection == b"keep-alive"
+                # The next request on this connection starts after this one's body, so read past it
+                if not await _skip_body(reader, headers): keep_alive = False
+                parts = line.split()
+                if len(parts) != 3:
+                    status, body, keep_alive = 400, b'{"error": "bad request"}', False
+                elif parts[0] != b"GET":
+                    status, body = 405, b'{"error": "only GET is supported"}'
+                else:
+                    status, body = respond(parts[1].decode("latin-1"))
+                writer.write(_response(status, body, keep_alive))
+                await writer.drain()
+                if not keep_alive: break
+        except (ConnectionError, asyncio.LimitOverrunError, asyncio.IncompleteReadError, ValueError):
+            pass   # the client went away, stalled, or broke a limit: hang up
+        finally:
+            self.writers.pop(writer, None)
+            writer.close()
+
+    def shutdown(self):
+        async def stop():
+            # Stop listening and hang up on the keep-alive connections still open
+            self.server.close()
+            self.sweeper.cancel()
+            for writer in list(self.writers): writer.close()
+            while self.writers: await asyncio.sleep(0.01)
+        asyncio.run_coroutine_threadsafe(stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT):
+    """Starts the service on a background thread; returns the server (server.shutdown() stops it)."""
+    return LookupServer(host, port)
+
+# ---------------- SOURCES ----------------
+def history_version(path=None):
+    """(month, saved_at) of the latest saved month, or None."""
+    with history.connect(path) as conn:
+        return conn.execute("SELECT month, saved_at FROM months ORDER BY month DESC LIMIT 1").fetchone()
+
+def load_history(version, path=None):
+    month = version[0]
+    return history.load_results(month, path), f"history {month} (saved {version[1]})"
+
+def ledger_version(watch_dir):
+    """(month, mtime) of the newest watch.py ledger kept for watch_dir, or None."""
+    import watch
+    ledgers = watch.ledger_files(watch_dir)
+    return max(ledgers) if ledgers else None
+
+def load_ledger(version, watch_dir):
+    # Names as typed, like the daemon's own status and --serve: spellings are merged when a month closes
+    import watch
+    ledger = watch.MonthLedger.load(watch.ledger_path(watch_dir, version[0]))
+    out_df = ledger.snapshot()[0]
+    return out_df, f"ledger {ledger.month} ({len(ledger.per_file_data)} tests{', closed' if ledger.closed else ''})"
+
+def follow(source, interval):
+    """Publishes the source's newest table now and whenever it changes; never returns."""
+    if source == "history":
+        version_of, load = history_version, load_history
+    else:
+        version_of, load = (lambda: ledger_version(source)), (lambda v: load_ledger(v, source))
+    served = None
+    while True:
+        try:
+            version = version_of()
+            if version is not None and version != served:
+                out_df, label = load(version)
+                if out_df is not None:
+                    index = publish(out_df, label)
+                    print(f"Serving {label}: {index.students} students (index built in {index.build_ms} ms)", flush=True)
+                served = version
+        except (sqlite3.Error, OSError, ValueError) as e:
+            print(f"Could not refresh from {source}: {e}", file=sys.stderr)
+        time.sleep(interval)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the latest results as a local JSON lookup (by name, prefix and fuzzy).")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (0.0.0.0 for the whole network)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--source", default="history", help='"history" (latest saved month) or a watch.py folder (its newest ledger)')
+    parser.add_argument("--interval", type=float, default=5, help="seconds between checks for a newer table")
+    args = parser.parse_args(argv)
+    server = serve(args.host, args.port)
+    print(f"Lookup service on http://{args.host}:{server.server_address[1]}/  (source: {args.source})", flush=True)
+    try:
+        follow(args.source, args.interval)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""Headless report pipeline: a folder of test exports in, report + certificates PDFs out.
+
+The Streamlit app calls the same functions, so both paths produce the same documents; the
+watch-folder daemon (watch.py) renders each closed month through render_outputs() too.
+
+Usage:
+    python pipeline.py BATCH_DIR [BATCH_DIR ...] --title "MB MONTHLY RESULT REPORT - {batch}"
+                       [--summary-title ...] [--output-name ...] [--green 70] [--yellow 40]
+                       [--date DD-MM-YYYY] [--out OUT_DIR] [--jobs N] [--offline] [--asset-dir DIR]
+                       [--per-student] [--month YYYY-MM] [--merge-names] [--profile print|mobile]
+                       [--report-cards zip|pdf]
+
+"{batch}" in any title or name is replaced by the batch folder name. Batches run in parallel
+across a process pool; per-batch stage timings are printed as each one finishes. --per-student
+also writes a ZIP with one certificate PDF per awardee next to the combined certificates PDF.
+A detailed record of every batch is appended to the run log (see instrument.py). --month (one
+batch only) saves the batch to the history store and adds rank change vs the previous month.
+--merge-names merges spellings of the same student before ranking (identity.py); it changes totals
+and ranks, so it is off unless asked for, and every merge is printed for review.
+--profile mobile writes small files for sharing on a phone instead of print quality (config.OUTPUT_PROFILES).
+--report-cards also writes every student's report card (report_cards.py): one PDF each in a
+ZIP, or the whole class in one PDF with a bookmark index.
+"""
+import os
+import sys
+import glob
+import time
+import sqlite3
+import argparse
+import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import assets
+import history
+import award_rules
+import identity
+import instrument
+from config import ASSET_IDS, OUTPUT_PROFILES, DEFAULT_PROFILE
+from scoring import load_score_files, aggregate_scores_cached
+
+assets.register_assets(ASSET_IDS)
+
+DEFAULT_REPORT_TITLE = "MB MONTHLY RESULT REPORT - {batch}"
+DEFAULT_SUMMARY_TITLE = "SUMMARY & ANALYSIS OF {batch}"
+DEFAULT_OUTPUT_NAME = "{batch} MONTHLY REPORT & AWARDS"
+
+
+def report_file_name(output_name):
+    final_pdf = output_name.strip()
+    if not final_pdf.endswith('.pdf'): final_pdf += ".pdf"
+    return final_pdf
+
+def certificates_file_name(output_name):
+    return f"Certificates_{output_name.strip()}.pdf"
+
+def certificates_zip_name(output_name):
+    return f"Certificates_{output_name.strip()}.zip"
+
+def report_cards_file_name(output_name, as_zip=False):
+    return f"ReportCards_{output_name.strip()}.{'zip' if as_zip else 'pdf'}"
+
+def build_results(files, resolve_names=False, aliases=None):
+    """Test exports -> (out_df, total_max_marks, per_file_data, errors, merges); out_df is None if nothing parsed.
+
+    With resolve_names, spellings of one student are merged first (see identity.py); merges is
+    the table of those decisions, aliases the known ones from history.load_aliases().
+    """
+    per_file_data, errors = load_score_files(files)
+    merges = identity.no_decisions()
+    if not per_file_data: return None, 0, per_file_data, errors, merges
+    if resolve_names: per_file_data, merges = identity.resolve_cached(per_file_data, aliases)
+    out_df, total_max_marks = aggregate_scores_cached(per_file_data)
+    return out_df, total_max_marks, per_file_data, errors, merges
+
+def merge_lines(merges):
+    """One line per merged spelling (records of identity's decisions table), for review."""
+    return [f'    merged "{m["alias"]}" into "{m["canonical"]}" ({m["method"]}, similarity {m["similarity"]:.2f}, {m["tests"]} tests)'
+            + (f'; {m["overlaps"]} of them also had another spelling, whose score was kept' if m["overlaps"] else "") for m in merges]
+
+def load_aliases():
+    """Known aliases from the history store; an unreadable store just means starting fresh."""
+    try:
+        return history.load_aliases()
+    except (sqlite3.Error, OSError) as e:
+        print(f"Could not read the alias table: {e}", file=sys.stderr)
+        return {}
+
+def list_batch_files(batch_dir):
+    return sorted(glob.glob(os.path.join(batch_dir, '*.csv')) + glob.glob(os.path.join(batch_dir, '*.CSV')))
+
+def run_batch(batch_dir, out_dir, report_title, summary_title, output_name, thresh_yellow, thresh_green, cert_date, per_student=False, cert_workers=1, month=None, resolve_names=False, profile=DEFAULT_PROFILE, report_cards=None):
+    """Renders one batch folder; returns a summary dict with the written paths and stage timings."""
+    batch = os.path.basename(os.path.normpath(batch_dir))
+    run = instrument.start_run("batch", batch=batch, profile=profile)
+    try:
+        return _run_batch(batch, batch_dir, out_dir, report_title, summary_title, output_name, thresh_yellow, thresh_green, cert_date, per_student, cert_workers, month, resolve_names, profile, report_cards)
+    finally:
+        instrument.finish_run(run)
+
+def _run_batch(batch, batch_dir, out_dir, report_title, summary_title, output_name, thresh_yellow, thresh_green, cert_date, per_student, cert_workers, month, resolve_names, profile, report_cards):
+    t = time.perf_counter()
+    files = list_batch_files(batch_dir)
+    out_df, total_max_marks, per_file_data, errors, merges = build_results(files, resolve_names, load_aliases() if resolve_names else None)
+    ingest_s = time.perf_counter() - t
+    result = {"batch": batch, "files": len(files), "errors": [(name, str(e)) for name, e in errors], "timings": {'ingest+aggregate': ingest_s}, "outputs": []}
+    if out_df is None: return result
+    result.update(render_outputs(batch, out_df, total_max_marks, per_file_data, merges, out_dir, report_title, summary_title, output_name,
+                                 thresh_yellow, thresh_green, cert_date, per_student, cert_workers, month, profile, report_cards))
+    result["timings"] = {'ingest+aggregate': ingest_s, **result["timings"]}
+    return result
+
+def render_outputs(batch, out_df, total_max_marks, per_file_data, merges, out_dir, report_title, summary_title, output_name, thresh_yellow, thresh_green, cert_date,
+                   per_student=False, cert_workers=1, month=None, profile=DEFAULT_PROFILE, report_cards=None):
+    """Writes one batch's documents from its aggregated results (saving it to history first with month).
+
+    Returns {"students", "merged", "merges", "outputs", "timings"}, plus "previous_month" with month.
+    """
+    # The renderers (reportlab's pdfgen and platypus) load here, so the app can import this module cheaply
+    import certificates
+    import render_pool
+    import report_cards as cards
+    from report_pdf import write_report_pdf
+    fill = lambda text: text.replace("{batch}", batch)
+    timings = {}
+    result = {"students": len(out_df), "merged": len(merges), "merges": merges.to_dict('records'), "timings": timings}
+
+    report_df = out_df
+    if month:
+        t = time.perf_counter()
+        report_df, result["previous_month"] = history.add_rank_change(out_df, month)
+        history.save_month(month, per_file_data, out_df, total_max_marks)
+        history.save_aliases(merges)
+        timings['history'] = time.perf_counter() - t
+
+    # One award selection for the Hall of Fame, the certificates and the per-student ZIP
+    winners = award_rules.select_winners(out_df, thresh_yellow, thresh_green)
+    os.makedirs(out_dir, exist_ok=True)
+    t = time.perf_counter()
+    report_path = os.path.join(out_dir, report_file_name(fill(output_name)))
+    with open(report_path, 'wb') as f:
+        write_report_pdf(report_df, total_max_marks, thresh_yellow, thresh_green, fill(report_title), fill(summary_title), f, profile, winners, per_file_data)
+    timings['report'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    certs_path = os.path.join(out_dir, certificates_file_name(fill(output_name)))
+    with open(certs_path, 'wb') as f:
+        certificates.write_certificates_pdf(out_df, thresh_yellow, thresh_green, fill(report_title), cert_date, f, profile, winners)
+    timings['certificates'] = time.perf_counter() - t
+
+    result["outputs"] = [report_path, certs_path]
+
+    try:
+        if per_student:
+            t = time.perf_counter()
+            zip_path = os.path.join(out_dir, certificates_zip_name(fill(output_name)))
+            with open(zip_path, 'wb') as f:
+                certificates.write_certificates_zip(out_df, thresh_yellow, thresh_green, fill(report_title), cert_date, f, workers=cert_workers, profile=profile, winners=winners)
+            timings['per-student'] = time.perf_counter() - t
+            result["outputs"].append(zip_path)
+
+        if report_cards:
+            t = time.perf_counter()
+            cards_path = os.path.join(out_dir, report_cards_file_name(fill(output_name), report_cards == "zip"))
+            with open(cards_path, 'wb') as f:
+                if report_cards == "zip":
+                    cards.write_report_cards_zip(out_df, per_file_data, thresh_yellow, thresh_green, fill(report_title), f, workers=cert_workers, profile=profile)
+                else:
+                    cards.write_report_cards_pdf(out_df, per_file_data, thresh_yellow, thresh_green, fill(report_title), f, profile=profile)
+            timings['report-cards'] = time.perf_counter() - t
+            result["outputs"].append(cards_path)
+    finally:
+        # The render pool lives in this batch worker; stop it before the batch pool reaps us
+        render_pool.shutdown()
+    return result
+
+def _init_worker(offline, asset_dir):
+    assets.OFFLINE = offline
+    if asset_dir: assets.LOCAL_ASSET_DIR = asset_dir
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render monthly report and certificate PDFs for one or more batch folders of CSV exports.")
+    parser.add_argument("batch_dirs", nargs="+", help="folders holding one month of test CSVs each")
+    parser.add_argument("--title", default=DEFAULT_REPORT_TITLE, help="main report header (also printed on certificates)")
+    parser.add_argument("--summary-title", default=DEFAULT_SUMMARY_TITLE)
+    parser.add_argument("--output-name", default=DEFAULT_OUTPUT_NAME, help="report file name without .pdf")
+    parser.add_argument("--green", type=float, default=70, help="green zone, >= %%")
+    parser.add_argument("--yellow", type=float, default=40, help="yellow zone, >= %%")
+    parser.add_argument("--date", default=datetime.date.today().strftime('%d-%m-%Y'), help="certificate date")
+    parser.add_argument("--out", default="reports", help="output folder; each batch gets a sub-folder")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="batches rendered in parallel")
+    parser.add_argument("--offline", action="store_true", default=assets.OFFLINE, help="never download images")
+    parser.add_argument("--asset-dir", default=None, help="local folder with the images (<name>.jpg or <drive id>.jpg)")
+    parser.add_argument("--per-student", action="store_true", help="also write a ZIP with one certificate PDF per awardee")
+    parser.add_argument("--report-cards", choices=("zip", "pdf"), default=None, help="also write every student's report card: one PDF each in a ZIP, or one indexed PDF")
+    parser.add_argument("--merge-names", action="store_true", help="merge spellings of the same student (changes totals and ranks; merges are printed)")
+    parser.add_argument("--profile", choices=list(OUTPUT_PROFILES), default=DEFAULT_PROFILE, help="print quality, or small files for sharing on a phone")
+    parser.add_argument("--month", default=None, help="YYYY-MM; save the batch to the history store and show rank change (one batch only)")
+    args = parser.parse_args(argv)
+    if args.month:
+        if len(args.batch_dirs) != 1: parser.error("--month needs exactly one batch folder")
+        try:
+            history.check_month(args.month)
+        except ValueError as e:
+            parser.error(str(e))
+
+    _init_worker(args.offline, args.asset_dir)
+    # Fill the shared disk cache once up front so the workers never race each other to Drive
+    fetched = assets.fetch_assets(ASSET_IDS)
+    missing = [name for name, data in fetched.items() if not data]
+    if missing: print(f"Warning: images not available: {', '.join(missing)}", file=sys.stderr)
+
+    started = time.perf_counter()
+    failed = 0
+    # CPUs left over once every batch has a worker go to the per-student render pool
+    cert_workers = max(1, args.jobs // len(args.batch_dirs))
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs), initializer=_init_worker, initargs=(args.offline, args.asset_dir)) as pool:
+        futures = {}
+        for batch_dir in args.batch_dirs:
+            out_dir = os.path.join(args.out, os.path.basename(os.path.normpath(batch_dir)))
+            futures[pool.submit(run_batch, batch_dir, out_dir, args.title, args.summary_title, args.output_name, args.yellow, args.green, args.date, args.per_student, cert_workers, args.month, args.merge_names, args.profile, args.report_cards)] = batch_dir
+        for fut in as_completed(futures):
+            try:
+                res = fut.result()
+            except Exception as e:
+                failed += 1
+                print(f"[{futures[fut]}] FAILED: {e}", file=sys.stderr)
+                continue
+            for name, err in res["errors"]: print(f"[{res['batch']}] Error processing {name}: {err}", file=sys.stderr)
+            if not res["outputs"]:
+                failed += 1
+                print(f"[{res['batch']}] no readable CSV files", file=sys.stderr)
+                continue
+            stages = "  ".join(f"{k} {v:.2f}s" for k, v in res["timings"].items())
+            print(f"[{res['batch']}] {res['files']} files, {res['students']} students, {res['merged']} spellings merged  |  {stages}  |  total {sum(res['timings'].values()):.2f}s")
+            for line in merge_lines(res["merges"]): print(line)
+    print(f"Done: {len(args.batch_dirs) - failed}/{len(args.batch_dirs)} batches in {time.perf_counter() - started:.2f}s")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Rendered PDFs kept by a fingerprint of everything that goes into them.
+
+Identical requests (the same person clicking again, or two staff members on the same month)
+are served from a bounded in-memory LRU. Entries pushed out of memory can optionally spill
+to SCORECARD_RENDER_CACHE on disk. Concurrent requests for the same document wait for the
+first render instead of starting their own.
+
+Renders write into a spool() file. A document of up to SPOOL_BYTES is then kept as bytes; a
+bigger one stays on disk as a FileDocument (in SCORECARD_RENDER_CACHE, or a private folder
+removed at exit), so a large class's report never sits in memory whole.
+"""
+import os
+import atexit
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+import instrument
+
+MAX_ENTRIES = 32
+MAX_BYTES = 256 * 1024 * 1024
+SPILL_DIR = os.environ.get("SCORECARD_RENDER_CACHE", "")
+SPOOL_BYTES = 8 * 1024 * 1024   # a render's file moves from memory to disk past this, and is then served from disk
+
+# Layout changes must invalidate spilled PDFs, so the renderer sources are part of every key
+_RENDERER_FILES = ("config.py", "assets.py", "image_readers.py", "streaming_pdf.py", "report_pdf.py", "analytics.py", "certificates.py", "report_cards.py")
+
+_entries = OrderedDict()
+_total_bytes = 0
+_lock = threading.Lock()
+_inflight = {}
+_doc_dir = None
+
+
+def _code_version():
+    h = hashlib.sha256()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in _RENDERER_FILES:
+        try:
+            with open(os.path.join(here, name), 'rb') as f: h.update(f.read())
+        except OSError:
+            h.update(name.encode())
+    return h.hexdigest()
+
+CODE_VERSION = _code_version()
+
+def fingerprint(kind, out_df, *params):
+    """Stable key for one document: its kind, the result table and every other render input."""
+    h = hashlib.sha256()
+    h.update(f"{kind}|{CODE_VERSION}|".encode())
+    h.update(repr([(str(c), str(t)) for c, t in out_df.dtypes.items()]).encode())
+    h.update(pd.util.hash_pandas_object(out_df, index=True).to_numpy().tobytes())
+    h.update(repr(params).encode())
+    return h.hexdigest()
+
+class FileDocument:
+    """A rendered document kept on disk: len() is its size, read() its bytes."""
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+
+    def __len__(self):
+        return self.size
+
+    def read(self):
+        with open(self.path, 'rb') as f: return f.read()
+
+def spool():
+    """A file to render into: in memory until it grows past SPOOL_BYTES, then on disk."""
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+
+def _spill_path(key):
+    return os.path.join(SPILL_DIR, f"{key}.pdf")
+
+def _file_path(key):
+    # Large documents go where spilled ones would, so they are found again after eviction or a restart
+    global _doc_dir
+    if SPILL_DIR:
+        os.makedirs(SPILL_DIR, exist_ok=True)
+        return _spill_path(key)
+    with _lock:
+        if _doc_dir is None:
+            _doc_dir = tempfile.mkdtemp(prefix="scorecard-docs-")
+            atexit.register(shutil.rmtree, _doc_dir, ignore_errors=True)
+    return os.path.join(_doc_dir, f"{key}.pdf")
+
+def _store(key, doc):
+    # bytes stay as they are; a spool() is read into memory when small, moved into a file otherwise
+    if isinstance(doc, bytes): return doc
+    with doc:
+        size = doc.seek(0, os.SEEK_END)
+        doc.seek(0)
+        if size <= SPOOL_BYTES: return doc.read()
+        path = _file_path(key)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        with os.fdopen(fd, 'wb') as f: shutil.copyfileobj(doc, f)
+        os.replace(tmp, path)
+    return FileDocument(path)
+
+def _spill(key, data):
+    if not SPILL_DIR or os.path.exists(_spill_path(key)): return
+    try:
+        os.makedirs(SPILL_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=SPILL_DIR, prefix=".tmp-")
+        with os.fdopen(fd, 'wb') as f: f.write(data)
+        os.replace(tmp, _spill_path(key))
+    except OSError as e:
+        print(f"Could not spill rendered PDF to disk: {e}")
+
+def _held(data):
+    # Bytes held in memory for an entry; a FileDocument holds none
+    return len(data) if isinstance(data, bytes) else 0
+
+def _remember(key, data):
+    global _total_bytes
+    evicted = []
+    with _lock:
+        if key in _entries: return
+        _entries[key] = data
+        _total_bytes += _held(data)
+        while len(_entries) > 1 and (len(_entries) > MAX_ENTRIES or _total_bytes > MAX_BYTES):
+            old_key, old_data = _entries.popitem(last=False)
+            _total_bytes -= _held(old_data)
+            evicted.append((old_key, old_data))
+    for old_key, old_data in evicted:
+        if isinstance(old_data, bytes): _spill(old_key, old_data)
+        elif not SPILL_DIR:
+            try:
+                os.remove(old_data.path)   # nowhere to find it again
+            except OSError:
+                pass
+
+def get(key):
+    """The document for key (bytes, or a FileDocument when large), or None if it has not been rendered (or has been evicted everywhere)."""
+    with _lock:
+        if key in _entries:
+            _entries.move_to_end(key)
+            return _entries[key]
+    if SPILL_DIR:
+        try:
+            if os.path.getsize(_spill_path(key)) > SPOOL_BYTES:
+                data = FileDocument(_spill_path(key))
+            else:
+                with open(_spill_path(key), 'rb') as f: data = f.read()
+        except OSError:
+            return None
+        _remember(key, data)
+        return data
+    return None
+
+def get_or_render(key, render):
+    """The cached document for key, or what render() makes of it.
+
+    render() returns the document (PDF or ZIP) as bytes, or as the spool() it was written into.
+    """
+    data = get(key)
+    if data is not None:
+        instrument.count("render_cache.hit", documents=1)
+        return data
+    with _lock:
+        gate = _inflight.get(key)
+        owner = gate is None
+        if owner: gate = _inflight[key] = threading.Event()
+    if not owner:
+        gate.wait()
+        data = get(key)
+        if data is not None: return data
+        return get_or_render(key, render)   # the other render failed; try ourselves
+    try:
+        data = _store(key, render())
+        _remember(key, data)
+        return data
+    finally:
+        with _lock: _inflight.pop(key, None)
+        gate.set()
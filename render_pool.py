@@ -0,0 +1,113 @@
+"""Process pool shared by the bulk renderers (per-student certificates, report cards).
+
+imap() hands chunks of work to the pool and yields each chunk's result as soon as it is done, with at
+most `workers` chunks in flight, so one call never uses more processes than it asked for and memory
+stays flat however long the list is. One chunk, or workers <= 1, runs right here instead. By default
+a call gets RENDER_WORKERS // jobs.MAX_JOBS workers, so the most render jobs the app runs at once
+share the CPUs instead of each asking for all of them.
+
+The pool is started on first use and kept for the life of the process. It never holds more than
+RENDER_WORKERS processes and only starts one when every existing one is busy, so its size follows
+the workers its callers ask for. Workers read the images from the folder / disk cache the parent
+has already filled.
+
+Workers are spawned (the Streamlit server is multi-threaded, so no fork). A spawned child normally
+runs the parent's __main__ first, which under Streamlit is the whole app script; render workers are
+started without it and only import the modules the work they are sent needs.
+"""
+import os
+import itertools
+import threading
+import multiprocessing
+from multiprocessing import spawn
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import jobs
+import assets
+from config import ASSET_IDS
+
+RENDER_WORKERS = int(os.environ.get("SCORECARD_RENDER_WORKERS", "0") or 0) or os.cpu_count() or 1
+
+WORKER_NAME = "scorecard-render"   # process name prefix of the render workers
+_SPAWN = multiprocessing.get_context("spawn")
+
+_pool = None
+_pool_lock = threading.Lock()
+_END = object()   # end of a call's chunks (a chunk itself may be anything, empty or falsy included)
+
+
+def _init_render_worker(offline, local_dir, cache_dir):
+    assets.OFFLINE = offline
+    assets.LOCAL_ASSET_DIR = local_dir
+    assets.ASSET_CACHE_DIR = cache_dir
+    assets.register_assets(ASSET_IDS)
+
+_preparation_data = spawn.get_preparation_data
+
+def _worker_preparation_data(name):
+    # What a spawned child sets itself up from; a render worker's leaves the parent's __main__ out.
+    # Decided by the process's own name, so no other process (or thread) sees a difference.
+    data = _preparation_data(name)
+    if name.startswith(WORKER_NAME):
+        data.pop("init_main_from_path", None)
+        data.pop("init_main_from_name", None)
+    return data
+
+if spawn.get_preparation_data is _preparation_data: spawn.get_preparation_data = _worker_preparation_data
+
+class _WorkerProcess(_SPAWN.Process):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.name = f"{WORKER_NAME}-{self.name}"
+
+class _WorkerContext(type(_SPAWN)):
+    Process = _WorkerProcess
+
+def default_workers():
+    """A render job's share of the pool: MAX_JOBS jobs can render at once."""
+    return max(1, RENDER_WORKERS // jobs.MAX_JOBS)
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=_WorkerContext(),
+                                        initializer=_init_render_worker, initargs=(assets.OFFLINE, assets.LOCAL_ASSET_DIR, assets.ASSET_CACHE_DIR))
+        return _pool
+
+def shutdown(wait=True):
+    """Stops the render workers; the next request starts a fresh pool."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None: pool.shutdown(wait=wait, cancel_futures=True)
+
+def imap(fn, chunks, args=(), workers=None):
+    """Yields fn(chunk, *args) for every chunk, in the order they finish (fn must be picklable).
+
+    workers: processes this call may keep busy (default_workers() when None, never more than RENDER_WORKERS).
+    """
+    workers = min(RENDER_WORKERS, default_workers() if workers is None else workers)
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks: yield fn(chunk, *args)
+        return
+
+    pool = _get_pool()
+    queue = iter(chunks)
+    pending = set()
+    def submit(chunk):
+        pending.add(pool.submit(fn, chunk, *args))
+    try:
+        for chunk in itertools.islice(queue, workers): submit(chunk)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield fut.result()
+                chunk = next(queue, _END)
+                if chunk is not _END: submit(chunk)
+    except BrokenProcessPool:
+        shutdown(wait=False)   # a worker died; the next request starts a fresh pool
+        raise
+    finally:
+        for fut in pending: fut.cancel()
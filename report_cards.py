@@ -0,0 +1,254 @@
+"""Personal report cards: one page per student with every test score, for the whole class.
+
+Built for class scale:
+  - card_data() takes every card's numbers from the student x test score matrix in one pass
+  - what every card of a month shares (frame, logo, headings, test labels, maxima, class
+    averages, table grid) is one form XObject per document; a card only draws its own values
+  - cards are drawn straight onto the canvas, with no table layout per page
+  - write_report_cards_zip() renders chunks of cards across render_pool's processes and streams
+    each one-page PDF into the ZIP as it finishes; write_report_cards_pdf() puts the whole class
+    into one document, indexed by a bookmark per student under their initial
+
+On one CPU (1000 students, 30 tests) the indexed PDF runs at about 500 cards/s, but the ZIP only
+at about 110-130 cards/s per process, since every file carries its own copy of the shared artwork.
+The ZIP reaches hundreds of cards a second only with several render processes.
+"""
+import io
+import os
+import math
+import zipfile
+
+import numpy as np
+import pandas as pd
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+from reportlab.lib.units import mm
+
+import assets
+import jobs
+import instrument
+import render_pool
+from streaming_pdf import StreamingCanvas
+from certificates import stamp_form
+from report_pdf import get_smart_row_color
+from scoring import build_score_matrix
+from config import OUTPUT_PROFILES, DEFAULT_PROFILE, LOGO_ID, COLOR_BLUE_HEADER
+
+CHUNK_SIZE = 64          # cards per pool task: each card is only a few KB of PDF
+MAX_COLUMN_GROUPS = 4    # the test table wraps into up to this many side-by-side groups
+ROWS_PER_GROUP = 25      # tests per group before the rows start to shrink
+
+PAGE_W, PAGE_H = A4
+CARD_LOGO_SIZE = 22 * mm
+TABLE_TOP = PAGE_H - 122 * mm
+TABLE_BOTTOM = 22 * mm
+TABLE_LEFT = 15 * mm
+TABLE_WIDTH = PAGE_W - 30 * mm
+SUMMARY_Y = PAGE_H - 96 * mm
+SUMMARY_LABELS = ("RANK", "ATTENDANCE", "SCORE", "PERCENTAGE")
+
+
+def card_data(out_df, per_file_data):
+    """(info, cards) for every student of out_df, in out_df order.
+
+    info: what the cards share - "maxes" and "class_avg" (% of the max, over those present) per
+    test, "class_pct" and "students". cards: (name, rank, present, total tests, obtained,
+    total marks, percentage, scores) tuples, scores being the mark per test (NaN when absent).
+    """
+    with instrument.stage("report_cards.data", students=len(out_df), tests=len(per_file_data)):
+        students, matrix = build_score_matrix(per_file_data)
+        maxes = np.array([f['file_max'] for f in per_file_data], dtype=float)
+        counts = (~np.isnan(matrix)).sum(axis=1)
+        class_avg = np.full(len(maxes), np.nan)
+        ok = (counts > 0) & (maxes > 0)
+        class_avg[ok] = np.nansum(matrix[ok], axis=1) / counts[ok] / maxes[ok] * 100
+
+        # out_df's keys are the matrix columns; one it does not know points at an all-absent extra column
+        col = pd.Index(students).get_indexer(out_df['Key'])
+        matrix = np.hstack([matrix, np.full((len(per_file_data), 1), np.nan)])
+        scores = matrix[:, np.where(col < 0, matrix.shape[1] - 1, col)].T
+
+        info = {"maxes": maxes.tolist(), "class_avg": class_avg.tolist(), "class_pct": float(out_df['Percentage'].mean()), "students": len(out_df)}
+        cards = list(zip(out_df['Name'].tolist(), out_df['Rank'].tolist(), out_df['Present'].tolist(), out_df['Total Tests'].tolist(),
+                         out_df['Obtained'].tolist(), out_df['Total Marks'].tolist(), out_df['Percentage'].tolist(), scores.tolist()))
+    return info, cards
+
+def card_file_name(name, rank):
+    stem = "_".join("".join(ch if ch.isalnum() else " " for ch in name.upper()).split()) or "STUDENT"
+    return f"{rank:04d}_{stem}.pdf"
+
+def fmt_mark(v):
+    return f"{v:g}"
+
+# ---------------- LAYOUT ----------------
+def table_layout(tests):
+    """(groups, rows per group, row height, font size) for a test table of `tests` rows plus a header."""
+    groups = max(1, min(MAX_COLUMN_GROUPS, math.ceil(tests / ROWS_PER_GROUP)))
+    rows = max(1, math.ceil(tests / groups))
+    row_h = min(7 * mm, (TABLE_TOP - TABLE_BOTTOM) / (rows + 1))
+    return groups, rows, row_h, max(4.5, min(9, row_h * 0.62))
+
+def _cell(i, layout):
+    # Top-left corner and size of test i's row: columns are Test | Score | % | Class %
+    groups, rows, row_h, _ = layout
+    group_w = TABLE_WIDTH / groups
+    g, r = divmod(i, rows)
+    return TABLE_LEFT + g * group_w, TABLE_TOP - (r + 1) * row_h, group_w, row_h
+
+_COLS = ((0.0, 0.22, "TEST"), (0.22, 0.56, "SCORE"), (0.56, 0.78, "%"), (0.78, 1.0, "CLASS %"))
+
+def draw_card_base(c, info, report_title, logo_img, layout):
+    # Everything that is the same on every card of the month
+    groups, rows, row_h, font = layout
+    c.setStrokeColor(COLOR_BLUE_HEADER); c.setLineWidth(3)
+    c.rect(8*mm, 8*mm, PAGE_W - 16*mm, PAGE_H - 16*mm)
+    if logo_img: c.drawImage(logo_img, 14*mm, PAGE_H - 14*mm - CARD_LOGO_SIZE, width=CARD_LOGO_SIZE, height=CARD_LOGO_SIZE, mask='auto', preserveAspectRatio=True)
+
+    c.setFillColor(COLOR_BLUE_HEADER); c.setFont("Helvetica-Bold", 22)
+    c.drawCentredString(PAGE_W/2, PAGE_H - 24*mm, "MURLIDHAR ACADEMY")
+    c.setFillColor(colors.black); c.setFont("Helvetica", 10)
+    c.drawCentredString(PAGE_W/2, PAGE_H - 30*mm, "JUNAGADH")
+    c.setFont("Helvetica-Bold", 13)
+    c.drawCentredString(PAGE_W/2, PAGE_H - 42*mm, "STUDENT REPORT CARD")
+    c.setFillColor(colors.darkgrey); c.setFont("Helvetica-Bold", 10)
+    c.drawCentredString(PAGE_W/2, PAGE_H - 49*mm, report_title)
+
+    box_w = TABLE_WIDTH / len(SUMMARY_LABELS)
+    c.setStrokeColor(colors.HexColor("#666666")); c.setLineWidth(0.5); c.setFillColor(colors.gray); c.setFont("Helvetica", 8)
+    for i, label in enumerate(SUMMARY_LABELS):
+        x = TABLE_LEFT + i * box_w
+        c.rect(x + 2, SUMMARY_Y, box_w - 4, 20*mm)
+        c.drawCentredString(x + box_w/2, SUMMARY_Y + 15*mm, label)
+    c.setFillColor(colors.black); c.setFont("Helvetica", 9)
+    c.drawCentredString(PAGE_W/2, SUMMARY_Y - 7*mm, f"Class average {info['class_pct']:.1f}%  ·  {info['students']} students  ·  {len(info['maxes'])} tests")
+
+    # Test table: header band, test numbers, maxima and class averages; each card fills in its own marks
+    group_w = TABLE_WIDTH / groups
+    pad = font * 0.35
+    for g in range(groups):
+        x = TABLE_LEFT + g * group_w
+        c.setFillColor(COLOR_BLUE_HEADER); c.rect(x, TABLE_TOP, group_w, row_h, stroke=0, fill=1)
+        c.setFillColor(colors.white); c.setFont("Helvetica-Bold", font)
+        for lo, hi, label in _COLS: c.drawCentredString(x + (lo + hi) / 2 * group_w, TABLE_TOP + pad * 1.2, label)
+    c.setFont("Helvetica", font)
+    for i, (mx, avg) in enumerate(zip(info['maxes'], info['class_avg'])):
+        x, y, w, h = _cell(i, layout)
+        c.setFillColor(colors.black)
+        c.drawCentredString(x + 0.11 * w, y + pad * 1.2, str(i + 1))
+        c.drawString(x + 0.45 * w, y + pad * 1.2, f"/ {fmt_mark(mx)}")
+        c.setFillColor(colors.gray)
+        c.drawCentredString(x + 0.89 * w, y + pad * 1.2, "-" if math.isnan(avg) else f"{avg:.1f}")
+    c.setStrokeColor(colors.HexColor("#666666")); c.setLineWidth(0.25)
+    for g in range(groups):
+        n = min(rows, len(info['maxes']) - g * rows)
+        if n <= 0: break
+        x = TABLE_LEFT + g * group_w
+        c.grid([x + lo * group_w for lo, _, _ in _COLS] + [x + group_w], [TABLE_TOP + row_h - k * row_h for k in range(n + 2)])
+
+def draw_card(c, card, info, layout, thresh_yellow, thresh_green, base):
+    name, rank, present, total_tests, obtained, total_marks, pct, scores = card
+    _, _, row_h, font = layout
+    pad = font * 0.35
+    box_w = TABLE_WIDTH / len(SUMMARY_LABELS)
+    # Band tints go first, under the shared grid and labels
+    for i, (score, mx) in enumerate(zip(scores, info['maxes'])):
+        x, y, w, h = _cell(i, layout)
+        if math.isnan(score): c.setFillColor(colors.HexColor("#EEEEEE"))
+        else: c.setFillColor(get_smart_row_color(score / mx * 100 if mx else 0, i % 2 == 0, thresh_green, thresh_yellow))
+        c.rect(x + 0.22 * w, y, 0.56 * w, h, stroke=0, fill=1)
+    c.setFillColor(get_smart_row_color(pct, False, thresh_green, thresh_yellow))
+    c.rect(TABLE_LEFT + 3 * box_w + 2, SUMMARY_Y, box_w - 4, 20*mm, stroke=0, fill=1)
+
+    stamp_form(c, "CardBase", base)
+
+    c.setFillColor(COLOR_BLUE_HEADER); c.setFont("Helvetica-Bold", 20)
+    c.drawCentredString(PAGE_W/2, PAGE_H - 66*mm, name.upper())
+    c.setFillColor(colors.black); c.setFont("Helvetica-Bold", 15)
+    values = (f"{rank} / {info['students']}", f"{present} / {total_tests}", f"{fmt_mark(obtained)} / {total_marks}", f"{pct}%")
+    for i, value in enumerate(values):
+        c.drawCentredString(TABLE_LEFT + (i + 0.5) * box_w, SUMMARY_Y + 5*mm, value)
+    c.setFont("Helvetica", font)
+    for i, (score, mx) in enumerate(zip(scores, info['maxes'])):
+        x, y, w, h = _cell(i, layout)
+        if math.isnan(score):
+            c.setFillColor(colors.gray); c.drawRightString(x + 0.43 * w, y + pad * 1.2, "AB")
+            continue
+        c.setFillColor(colors.black)
+        c.drawRightString(x + 0.43 * w, y + pad * 1.2, fmt_mark(score))
+        c.drawCentredString(x + 0.67 * w, y + pad * 1.2, f"{score / mx * 100:.0f}" if mx else "-")
+
+def index_entries(cards):
+    """[(initial, [card positions alphabetically])] for the bookmark index."""
+    groups = {}
+    for i in sorted(range(len(cards)), key=lambda i: cards[i][0].lower()):
+        groups.setdefault(cards[i][0][:1].upper() or "#", []).append(i)
+    return list(groups.items())
+
+def add_index(c, cards, entries):
+    # One closed entry per initial, the students under it alphabetically, each opening their card
+    for initial, positions in entries:
+        c.addOutlineEntry(initial, f"initial-{initial}", level=0, closed=True)
+        for i in positions: c.addOutlineEntry(f"{cards[i][0]} (Rank {cards[i][1]})", f"card{i}", level=1)
+    c.showOutline()
+
+# ---------------- RENDERING ----------------
+def render_cards(cards, info, report_title, thresh_yellow, thresh_green, fileobj, profile=DEFAULT_PROFILE, index=False):
+    """Draws one page per card onto a single PDF written to fileobj page by page; index adds the bookmark index."""
+    opts = OUTPUT_PROFILES[profile]
+    c = StreamingCanvas(fileobj, pagesize=A4, pageCompression=1)
+    logo_img = assets.get_image_reader(LOGO_ID, size=(CARD_LOGO_SIZE, CARD_LOGO_SIZE), **assets.reader_options(opts))
+    layout = table_layout(len(info['maxes']))
+    base = lambda c: draw_card_base(c, info, report_title, logo_img, layout)
+    entries = index_entries(cards) if index else []
+    # An initial's index entry opens the card of the first student under it
+    initials = {positions[0]: initial for initial, positions in entries}
+    for i, card in enumerate(cards):
+        jobs.progress(i + 1, len(cards), "card")
+        if index:
+            c.bookmarkPage(f"card{i}")
+            if i in initials: c.bookmarkPage(f"initial-{initials[i]}")
+        draw_card(c, card, info, layout, thresh_yellow, thresh_green, base)
+        c.showPage()
+    if index: add_index(c, cards, entries)
+    c.save()
+
+def render_card_files(cards, info, report_title, thresh_yellow, thresh_green, profile=DEFAULT_PROFILE):
+    """[(file name, PDF bytes)], each card as its own one-page document."""
+    files = []
+    for card in cards:
+        buffer = io.BytesIO()
+        with jobs.quiet():   # progress is counted per file by write_report_cards_zip
+            render_cards([card], info, report_title, thresh_yellow, thresh_green, buffer, profile)
+        files.append((card_file_name(card[0], card[1]), buffer.getvalue()))
+    return files
+
+def write_report_cards_zip(out_df, per_file_data, thresh_yellow, thresh_green, report_title, fileobj, workers=None, profile=DEFAULT_PROFILE):
+    """Writes one report card PDF per student into a ZIP on fileobj; returns the number of cards.
+
+    Chunks render across the process pool and are written as they finish, so only a few chunks'
+    PDFs are ever held in memory.
+    """
+    info, cards = card_data(out_df, per_file_data)
+    chunks = [cards[i:i + CHUNK_SIZE] for i in range(0, len(cards), CHUNK_SIZE)]
+    seen = {}
+    done = 0
+    jobs.progress(0, len(cards), "card")
+    with instrument.stage("report_cards.zip", files=len(cards)) as s, zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for files in render_pool.imap(render_card_files, chunks, (info, report_title, thresh_yellow, thresh_green, profile), workers):
+            for file_name, data in files:
+                seen[file_name] = seen.get(file_name, 0) + 1
+                if seen[file_name] > 1:
+                    stem, ext = os.path.splitext(file_name)
+                    file_name = f"{stem}_{seen[file_name]}{ext}"
+                zf.writestr(file_name, data)
+                s.add(bytes=len(data))
+            done += len(files)
+            jobs.progress(done, len(cards), "card")
+    return len(cards)
+
+def write_report_cards_pdf(out_df, per_file_data, thresh_yellow, thresh_green, report_title, fileobj, profile=DEFAULT_PROFILE):
+    """Writes every student's card into one PDF on fileobj, with a bookmark index; returns the number of cards."""
+    info, cards = card_data(out_df, per_file_data)
+    with instrument.stage("report_cards.pdf", pages=len(cards)):
+        render_cards(cards, info, report_title, thresh_yellow, thresh_green, fileobj, profile, index=True)
+    return len(cards)
@@ -0,0 +1,315 @@
+"""Monthly result report: full result table, summary & analysis page, test-wise analysis and the Hall of Fame."""
+import io
+import math
+import itertools
+
+import numpy as np
+import pandas as pd
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+from reportlab.lib.units import mm
+from reportlab.platypus import Table, TableStyle, Paragraph
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+import assets
+import jobs
+import instrument
+import award_rules
+import analytics
+from streaming_pdf import StreamingCanvas
+from config import (
+    TG_LINK, IG_LINK, DEFAULT_DRIVE_ID, OUTPUT_PROFILES, DEFAULT_PROFILE,
+    LEFT_MARGIN_mm, RIGHT_MARGIN_mm, TITLE_Y_mm_from_top, TABLE_SPACE_AFTER_TITLE_mm, TABLE_BOTTOM_mm, PAGE_NO_Y_mm, ROWS_PER_PAGE,
+    COLOR_BLUE_HEADER, SUMMARY_COLORS,
+)
+
+ROW_BLOCK_PAGES = 40   # result table pages whose rows are built together (per page, pandas call overhead dominates)
+
+# Row shades per band (green, yellow, red): (even row, odd row)
+ROW_COLORS = (
+    (colors.HexColor("#E8F5E9"), colors.HexColor("#C8E6C9")),
+    (colors.HexColor("#FFFDE7"), colors.HexColor("#FFF9C4")),
+    (colors.HexColor("#FFEBEE"), colors.HexColor("#FFCDD2")),
+)
+
+def get_smart_row_color(pct, is_even_row, t_green, t_yellow):
+    band = 0 if pct >= t_green else (1 if pct >= t_yellow else 2)
+    return ROW_COLORS[band][0 if is_even_row else 1]
+
+def row_bands(percentage, t_green, t_yellow):
+    """Colour band per row (0 green, 1 yellow, 2 red) straight from the numeric Percentage column."""
+    pct = pd.to_numeric(percentage, errors='coerce').to_numpy(dtype=float)
+    return np.select([pct >= t_green, pct >= t_yellow], [0, 1], 2)
+
+def band_runs(bands):
+    """(first, last, band) for every run of equal bands; rank order keeps these to a handful."""
+    if len(bands) == 0: return []
+    edges = np.flatnonzero(np.diff(bands)) + 1
+    starts = np.concatenate(([0], edges))
+    ends = np.concatenate((edges, [len(bands)])) - 1
+    return list(zip(starts.tolist(), ends.tolist(), bands[starts].tolist()))
+
+def format_rank_change(change):
+    if pd.isna(change): return "NEW"   # not in the previous month
+    change = int(change)
+    return f"+{change}" if change > 0 else ("=" if change == 0 else str(change))
+
+def result_rows(out_df, show_change):
+    """The full result table's body as rows of strings, built column by column."""
+    columns = [(out_df.index + 1).astype(str)]
+    columns += [out_df[col].astype(str) for col in ('Rank', 'Name', 'Total Tests', 'Present', 'Absent', 'Total Marks', 'Obtained')]
+    columns.append(out_df['Percentage'].astype(str) + "%")
+    if show_change: columns.insert(2, out_df['Rank Change'].map(format_rank_change))
+    return [list(row) for row in zip(*(col.tolist() for col in columns))]
+
+def iter_result_rows(out_df, show_change, block=ROWS_PER_PAGE * ROW_BLOCK_PAGES):
+    """result_rows() one row at a time, built `block` rows at a time: only a block's strings are ever alive."""
+    for start in range(0, len(out_df), block):
+        with instrument.stage("report.rows", rows=min(block, len(out_df) - start)):
+            rows = result_rows(out_df.iloc[start:start + block], show_change)
+        yield from rows
+
+def format_pct(values):
+    return ["-" if math.isnan(v) else f"{v:.1f}" for v in np.asarray(values, dtype=float).tolist()]
+
+def test_rows(stats, thresh_green, thresh_yellow):
+    """The per-test table's body as rows of strings, built column by column like result_rows()."""
+    levels = np.array(["Easy", "Moderate", "Hard"])[analytics.difficulty_bands(stats['mean'], thresh_green, thresh_yellow)]
+    columns = [[str(t + 1) for t in range(stats['tests'])], [f"{v:g}" for v in stats['max'].tolist()], [str(v) for v in stats['present'].tolist()]]
+    columns += [format_pct(stats[name]) for name in ('attendance', 'mean', 'pass')]
+    columns += [format_pct(row) for row in stats['percentiles']]
+    columns.append(levels.tolist())
+    return [list(row) for row in zip(*columns)]
+
+def split_to_pages(flowable, width, height):
+    """flowable cut into pieces that each fit width x height; Table.split repeats the header rows."""
+    pages = []
+    while True:
+        _, h = flowable.wrap(width, height)
+        parts = flowable.split(width, height) if h > height else []
+        if len(parts) < 2:
+            pages.append(flowable)   # fits, or cannot be cut: drawn as it is
+            return pages
+        pages.append(parts[0])
+        flowable = parts[1]
+
+def generate_report_pdf(out_df, total_max_marks, thresh_yellow, thresh_green, report_title, summary_title, profile=DEFAULT_PROFILE, winners=None, per_file_data=None):
+    """The report as a BytesIO; profile is a key of config.OUTPUT_PROFILES (print or mobile share).
+
+    winners: award_rules.select_winners() for the Hall of Fame, if the caller already has it for the certificates.
+    per_file_data: the month's tests, for the test-wise analysis pages (left out without it).
+    """
+    buffer = io.BytesIO()
+    write_report_pdf(out_df, total_max_marks, thresh_yellow, thresh_green, report_title, summary_title, buffer, profile, winners, per_file_data)
+    buffer.seek(0)
+    return buffer
+
+def write_report_pdf(out_df, total_max_marks, thresh_yellow, thresh_green, report_title, summary_title, fileobj, profile=DEFAULT_PROFILE, winners=None, per_file_data=None):
+    """Writes the report onto fileobj page by page (see generate_report_pdf); returns the number of pages.
+
+    Memory stays flat however many students there are, so a big class belongs in a file, not a BytesIO.
+    """
+    with instrument.stage("report", students=len(out_df)):
+        if winners is None: winners = award_rules.select_winners(out_df, thresh_yellow, thresh_green)
+        stats = analytics.per_test_stats(per_file_data, thresh_yellow) if per_file_data else None
+        return _render_report(out_df, total_max_marks, thresh_yellow, thresh_green, report_title, summary_title, OUTPUT_PROFILES[profile], winners, stats, fileobj)
+
+def _render_report(out_df, total_max_marks, thresh_yellow, thresh_green, report_title, summary_title, profile, winners, stats, fileobj):
+    """Lays out every section first, so the page count is known, then draws the pages in one pass.
+
+    The result table goes ROWS_PER_PAGE rows to a page; each page's rows are built from out_df as
+    it is drawn and the page goes to fileobj straight after. The summary, the test-wise analysis
+    and the Hall of Fame are split over as many pages as they need.
+    """
+    c = StreamingCanvas(fileobj, pagesize=A4, pageCompression=1)
+    PAGE_W, PAGE_H = A4
+    TEMPLATE_IMG = assets.get_image_reader(DEFAULT_DRIVE_ID, size=(PAGE_W, PAGE_H), **assets.reader_options(profile))
+    if TEMPLATE_IMG:
+        # One form XObject holding the background; every page references it instead of redrawing the image
+        c.beginForm("background"); c.drawImage(TEMPLATE_IMG, 0, 0, width=PAGE_W, height=PAGE_H); c.endForm()
+    
+    def draw_bg_and_header(c, title_text):
+        if TEMPLATE_IMG: c.doForm("background")
+        TITLE_Y = PAGE_H - (TITLE_Y_mm_from_top * mm)
+        c.setFont("Helvetica-Bold", 15)
+        c.setFillColor(colors.white if TEMPLATE_IMG else COLOR_BLUE_HEADER)
+        c.drawCentredString(PAGE_W/2, TITLE_Y, title_text)
+    
+    def add_social_links(c):
+        if TEMPLATE_IMG:
+            c.linkURL(TG_LINK, (20*mm, 24*mm, 106*mm, 45*mm))
+            c.linkURL(IG_LINK, (110*mm, 24*mm, 190*mm, 45*mm))
+    
+    # --- PAGE 1: FULL RESULT TABLE ---
+    table_header = ["No", "Rank", "Name", "Tests", "Pres", "Abs", "Max", "Obt", "%"]
+    TABLE_WIDTH = PAGE_W - (LEFT_MARGIN_mm * mm) - (RIGHT_MARGIN_mm * mm)
+    col_widths = [0.06*TABLE_WIDTH, 0.07*TABLE_WIDTH, 0.35*TABLE_WIDTH, 0.08*TABLE_WIDTH, 0.07*TABLE_WIDTH, 0.07*TABLE_WIDTH, 0.10*TABLE_WIDTH, 0.10*TABLE_WIDTH, 0.10*TABLE_WIDTH]
+    show_change = 'Rank Change' in out_df.columns
+    if show_change:
+        # Movement against the previous stored month goes next to the rank; the name column gives up the room
+        table_header.insert(2, "+/-")
+        col_widths[2:3] = [0.07*TABLE_WIDTH, 0.28*TABLE_WIDTH]
+    
+    bands = row_bands(out_df['Percentage'], thresh_green, thresh_yellow)
+    rows = iter_result_rows(out_df, show_change)   # pages are drawn in order, each taking the next ROWS_PER_PAGE
+    
+    name_col = table_header.index("Name")
+    TABLE_TOP_Y = PAGE_H - (TITLE_Y_mm_from_top * mm) - (TABLE_SPACE_AFTER_TITLE_mm * mm)
+    TABLE_HEIGHT = TABLE_TOP_Y - (TABLE_BOTTOM_mm * mm)
+    result_pages = math.ceil(len(out_df) / ROWS_PER_PAGE)
+    base_style = [
+        ('GRID', (0,0), (-1,-1), 0.25, colors.HexColor("#666666")), ('BACKGROUND', (0,0), (-1,0), COLOR_BLUE_HEADER),
+        ('TEXTCOLOR', (0,0), (-1,0), colors.white), ('FONT', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'), ('ALIGN', (name_col,1), (name_col,-1), 'LEFT'),
+        ('LEFTPADDING', (name_col,1), (name_col,-1), 6), ('VALIGN', (0,0), (-1,-1), 'MIDDLE'), ('FONTSIZE', (0,0), (-1,-1), 9),
+        ('TEXTCOLOR', (0,1), (-1,-1), colors.black),
+    ]
+    
+    def result_page(p):
+        start = p * ROWS_PER_PAGE
+        end = min(start + ROWS_PER_PAGE, len(out_df))
+        data_rows = list(itertools.islice(rows, end - start))
+        style = list(base_style)
+        # One ROWBACKGROUNDS per band run; table row i (1-based on the page) takes the even shade when i is even
+        for first, last, band in band_runs(bands[start:end]):
+            i = first + 1
+            shades = ROW_COLORS[band] if i % 2 == 0 else ROW_COLORS[band][::-1]
+            style.append(('ROWBACKGROUNDS', (0,i), (-1,last+1), list(shades)))
+        t = Table([table_header] + data_rows, colWidths=col_widths, repeatRows=1)
+        t.setStyle(TableStyle(style))
+        return t
+    
+    # --- PAGE 2: SUMMARY (UPDATED) ---
+    # Calculations for Summary
+    avg_obt = out_df['Obtained'].mean()
+    median_obt = out_df['Obtained'].median()
+    highest_score = out_df['Obtained'].max()
+    lowest_score = out_df['Obtained'].min()
+    pass_count = len(out_df[out_df['Percentage'] >= thresh_yellow])
+    fail_count = len(out_df) - pass_count
+    overall_result = (pass_count / len(out_df) * 100) if len(out_df) > 0 else 0.0
+    
+    # Data Structure for new Table
+    summary_data = [
+        ["METRICS", "DETAILS", "REMARKS"], # Header
+        ["Total Candidates", str(len(out_df)), "Total Appearing"],
+        ["Batch Average", f"{avg_obt:.2f} / {total_max_marks}", "Overall Class Performance"],
+        ["Median Score", f"{median_obt:.2f} / {total_max_marks}", "Middle Score of Batch"],
+        ["Highest Score", f"{highest_score} / {total_max_marks}", "Top Rank Score"],
+        ["Lowest Score", f"{lowest_score} / {total_max_marks}", "Lowest Score"],
+        ["Qualified (>=40%)", str(pass_count), "Candidates Passed"],
+        ["Disqualified (<40%)", str(fail_count), "Candidates Failed"],
+        ["Overall Result", f"{overall_result:.1f}%", "Pass Percentage"],
+    ]
+    
+    # Top 5
+    summary_data.append(["TOP 5 RANKERS", "", ""])
+    for i, r in out_df.head(5).iterrows():
+        summary_data.append([f"#{r['Rank']} {r['Name']}", f"{r['Obtained']}/{total_max_marks} ({r['Percentage']}%)", "Outstanding" if i==0 else "Excellent"])
+    
+    # Bottom 5 
+    summary_data.append(["BOTTOM 5 PERFORMERS", "", ""])
+    for i, r in out_df.tail(5).sort_values(by='Obtained').iterrows():
+        summary_data.append([f"#{r['Rank']} {r['Name']}", f"{r['Obtained']}/{total_max_marks} ({r['Percentage']}%)", "Needs Hard Work"])
+    
+    st_table = Table(summary_data, colWidths=[0.35*TABLE_WIDTH, 0.25*TABLE_WIDTH, 0.40*TABLE_WIDTH])
+    
+    # Dynamic Styling
+    sum_style = TableStyle([
+        ('GRID', (0,0), (-1,-1), 0.25, colors.HexColor("#666666")),
+        ('TEXTCOLOR', (0,0), (-1,0), colors.white), ('FONT', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('ALIGN', (0,0), (-1,-1), 'LEFT'), ('LEFTPADDING', (0,0), (-1,-1), 6), ('VALIGN', (0,0), (-1,-1), 'MIDDLE')
+    ])
+    
+    # Apply Row Colors based on content
+    for i, row in enumerate(summary_data):
+        section_header = row[0]
+    
+        if i == 0: # Main Table Header
+             sum_style.add('BACKGROUND', (0,i), (-1,i), SUMMARY_COLORS["METRIC_HEADER"])
+    
+        elif section_header == "TOP 5 RANKERS":
+            sum_style.add('BACKGROUND', (0,i), (-1,i), SUMMARY_COLORS["TOP_HEADER"])
+            sum_style.add('TEXTCOLOR', (0,i), (-1,i), colors.white)
+            sum_style.add('FONT', (0,i), (-1,i), 'Helvetica-Bold')
+            sum_style.add('SPAN', (0,i), (-1,i))
+    
+        elif section_header == "BOTTOM 5 PERFORMERS":
+            sum_style.add('BACKGROUND', (0,i), (-1,i), SUMMARY_COLORS["BOTTOM_HEADER"])
+            sum_style.add('TEXTCOLOR', (0,i), (-1,i), colors.white)
+            sum_style.add('FONT', (0,i), (-1,i), 'Helvetica-Bold')
+            sum_style.add('SPAN', (0,i), (-1,i))
+    
+        else:
+            # Data Rows Coloring
+            bg_color = colors.white
+    
+            # Metrics Section coloring
+            if "Batch Average" in section_header: bg_color = SUMMARY_COLORS["ROW_YELLOW"]
+            elif "Highest Score" in section_header: bg_color = SUMMARY_COLORS["ROW_GREEN"]
+            elif "Lowest Score" in section_header: bg_color = SUMMARY_COLORS["ROW_RED"]
+    
+            # Top Rankers Coloring
+            elif "Outstanding" in row[2] or "Excellent" in row[2]:
+                bg_color = SUMMARY_COLORS["ROW_GREEN"]
+    
+            # Bottom Performers Coloring
+            elif "Needs Hard Work" in row[2]:
+                bg_color = SUMMARY_COLORS["ROW_YELLOW"] # Light yellow for bottom list
+    
+            sum_style.add('BACKGROUND', (0,i), (-1,i), bg_color)
+            sum_style.add('TEXTCOLOR', (0,i), (-1,i), colors.black)
+    
+    st_table.setStyle(sum_style)
+    
+    # --- TEST-WISE ANALYSIS: charts, then one row per test ---
+    analysis_pages = []
+    if stats is not None and stats['tests']:
+        analysis_pages.append(analytics.ChartPage(stats, thresh_yellow, thresh_green, TABLE_WIDTH, TABLE_HEIGHT, profile["dpi"]))
+        test_header = ["Test", "Max", "Present", "Att %", "Mean %", "Pass %"] + [f"P{q}" for q in analytics.PERCENTILES] + ["Level"]
+        test_style = [
+            ('GRID', (0,0), (-1,-1), 0.25, colors.HexColor("#666666")), ('BACKGROUND', (0,0), (-1,0), COLOR_BLUE_HEADER),
+            ('TEXTCOLOR', (0,0), (-1,0), colors.white), ('FONT', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'), ('VALIGN', (0,0), (-1,-1), 'MIDDLE'), ('FONTSIZE', (0,0), (-1,-1), 8),
+        ]
+        # Rows tinted by how hard the test was (mean % against the zones), one command per run of equal levels
+        for first, last, band in band_runs(analytics.difficulty_bands(stats['mean'], thresh_green, thresh_yellow)):
+            test_style.append(('BACKGROUND', (0,first+1), (-1,last+1), ROW_COLORS[band][0]))
+        test_table = Table([test_header] + test_rows(stats, thresh_green, thresh_yellow), colWidths=[TABLE_WIDTH / len(test_header)] * len(test_header), repeatRows=1)
+        test_table.setStyle(TableStyle(test_style))
+        analysis_pages += split_to_pages(test_table, TABLE_WIDTH, TABLE_HEIGHT)
+    
+    # --- PAGE 3: HALL OF FAME ---
+    styles = getSampleStyleSheet()
+    style_an = ParagraphStyle('AN', parent=styles['Normal'], fontName='Helvetica-Bold', fontSize=10, textColor=colors.black, alignment=1)
+    style_ad = ParagraphStyle('AD', parent=styles['Normal'], fontName='Helvetica', fontSize=9, textColor=colors.black, alignment=1)
+    style_aw = ParagraphStyle('AW', parent=styles['Normal'], fontName='Helvetica-Bold', fontSize=10, textColor=COLOR_BLUE_HEADER, alignment=1, leading=12)
+    
+    awards_list = []
+    def mk_para(text, style): return Paragraph(text, style)
+    
+    for rule, won in winners:
+        awards_list.append([mk_para(rule['name'], style_an), mk_para(rule['hall_of_fame'], style_ad), mk_para("<br/>".join(won['Name'].tolist()), style_aw)])
+    
+    aw_table = Table([["AWARD CATEGORY", "DESCRIPTION", "WINNER(S)"]] + awards_list, colWidths=[0.35*TABLE_WIDTH, 0.35*TABLE_WIDTH, 0.30*TABLE_WIDTH], repeatRows=1)
+    aw_style = TableStyle([('GRID', (0,0), (-1,-1), 0.25, colors.HexColor("#666666")), ('BACKGROUND', (0,0), (-1,0), COLOR_BLUE_HEADER), ('TEXTCOLOR', (0,0), (-1,0), colors.white), ('FONT', (0,0), (-1,0), 'Helvetica-Bold'), ('ALIGN', (0,0), (-1,-1), 'CENTER'), ('VALIGN', (0,0), (-1,-1), 'MIDDLE'), ('LEFTPADDING', (0,0), (-1,-1), 6), ('RIGHTPADDING', (0,0), (-1,-1), 6), ('TOPPADDING', (0,0), (-1,-1), 8), ('BOTTOMPADDING', (0,0), (-1,-1), 8)])
+    for i in range(1, len(awards_list)+1): aw_style.add('BACKGROUND', (0,i), (-1,i), colors.Color(0.96,0.97,1.0) if i%2==0 else colors.white)
+    aw_table.setStyle(aw_style)
+    
+    # --- ALL PAGES, numbered against the exact total ---
+    pages = [(summary_title, t) for t in split_to_pages(st_table, TABLE_WIDTH, TABLE_HEIGHT)]
+    pages += [("TEST-WISE ANALYSIS", t) for t in analysis_pages]
+    pages += [("HALL OF FAME", t) for t in split_to_pages(aw_table, TABLE_WIDTH, TABLE_HEIGHT)]
+    total_pages = result_pages + len(pages)
+    for n in range(1, total_pages + 1):
+        jobs.progress(n, total_pages, "page")
+        title, table = (report_title, result_page(n - 1)) if n <= result_pages else pages[n - 1 - result_pages]
+        draw_bg_and_header(c, title)
+        with instrument.stage("report.tables", pages=1):
+            w, h = table.wrapOn(c, TABLE_WIDTH, PAGE_H)
+            table.drawOn(c, (PAGE_W - TABLE_WIDTH)/2, TABLE_TOP_Y - h)
+        c.setFont("Helvetica-Bold", 8); c.setFillColor(colors.white)
+        c.drawRightString(PAGE_W - (RIGHT_MARGIN_mm*mm), PAGE_NO_Y_mm*mm, f"Page {n}/{total_pages}")
+        add_social_links(c); c.showPage()
+    with instrument.stage("report.save"): c.save()
+    return total_pages
@@ -0,0 +1,299 @@
+"""Reading test exports and turning them into the ranked monthly result table (out_df).
+
+out_df has the original app's columns - Name, Total Tests, Present, Absent, Total Marks, Obtained,
+Percentage, Rank - with the same values and row order as its per-student loop, plus one column
+added since: Key, each student's normalized name (see results_table()).
+"""
+import io
+import re
+import hashlib
+import threading
+import importlib.util
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import instrument
+from config import DEFAULT_TEST_MAX_PER_FILE
+
+# pyarrow's CSV parser is multithreaded (it ships with streamlit); read_csv imports it itself
+CSV_ENGINE = 'pyarrow' if importlib.util.find_spec("pyarrow") else 'c'
+
+READ_WORKERS = 8
+MAX_SCHEMA_PLANS = 256
+PARSE_CACHE_SIZE = 512      # parsed files kept, keyed by content hash
+AGGREGATE_CACHE_SIZE = 16   # out_df tables kept, keyed by the hashes of the files behind them
+_plans = {}
+_plans_lock = threading.Lock()
+_parsed = OrderedDict()
+_aggregated = OrderedDict()
+_memo_lock = threading.Lock()
+
+# ---------------- NAMES & COLUMNS ----------------
+def normalize_name(s):
+    if pd.isna(s): return ""
+    s = str(s).strip()
+    s = re.sub(r'\s+', ' ', s)
+    return s.lower()
+
+def normalize_names(names):
+    # Vectorised normalize_name() for a whole column of names
+    names = pd.Series(names)
+    norm = names.astype(str).str.strip().str.replace(r'\s+', ' ', regex=True).str.lower()
+    norm[names.isna()] = ""
+    return norm
+
+def build_file_scores(names, obtained):
+    # normalized name -> score for one file (last row wins, blank names dropped)
+    scores = pd.Series(pd.to_numeric(obtained).to_numpy(dtype=float), index=normalize_names(names).to_numpy())
+    scores = scores[scores.index != ""]
+    return scores[~scores.index.duplicated(keep='last')]
+
+NAME_KEYWORDS = ['name','student name','student','full name','studentname', 'candidate']
+MAX_EXACT_NAMES = ('possiblepts','possible_pts','possible points','possible', 'max marks')
+MAX_KEYWORDS = ['possible','max','maximum','totalmarks']
+
+# Header-only halves of the heuristics below; they decide *which* columns matter so a file
+# can be read with just those columns.
+def name_columns(cols):
+    """[firstname, lastname], [name column] or [] when names have to be made up."""
+    cols = list(cols)
+    lc = [c.lower() for c in cols]
+    if 'firstname' in lc and 'lastname' in lc:
+        return [cols[lc.index('firstname')], cols[lc.index('lastname')]]
+    for key in NAME_KEYWORDS:
+        for c in cols:
+            if key == c.lower().strip():
+                return [c]
+    for c in cols:
+        if 'name' in c.lower() or 'student' in c.lower():
+            return [c]
+    return []
+
+def max_columns(cols):
+    """(exact matches, keyword matches) that find_possible_pts tries, in order."""
+    exact = [c for c in cols if c.strip().lower() in MAX_EXACT_NAMES]
+    keyword = [c for c in cols if any(k in c.lower() for k in MAX_KEYWORDS)]
+    return exact, keyword
+
+def obtained_column(cols):
+    """The named score column, or None when the highest-mean numeric column has to be used."""
+    for c in cols:
+        clean = c.lower().replace(" ", "")
+        if 'earnedpts' in clean or 'obtainedmarks' in clean or 'score' == clean:
+            return c
+    return None
+
+def numeric_candidate_columns(cols):
+    return [c for c in cols if not ('phone' in c.lower() or 'id' in c.lower() or 'roll' in c.lower())]
+
+def find_name_series(df):
+    picked = name_columns(df.columns)
+    if len(picked) == 2:
+        fn = df[picked[0]].astype(str).fillna("")
+        ln = df[picked[1]].astype(str).fillna("")
+        return (fn.str.strip() + " " + ln.str.strip()).astype(str)
+    if picked:
+        return df[picked[0]].astype(str).fillna("").str.strip()
+    return pd.Series([f"Student {i+1}" for i in range(len(df))])
+
+def find_possible_pts(df):
+    exact, keyword = max_columns(df.columns)
+    for c in exact:
+        vals = pd.to_numeric(df[c], errors='coerce').dropna()
+        if len(vals) > 0: return float(vals.iloc[0])
+    for c in keyword:
+        vals = pd.to_numeric(df[c], errors='coerce').dropna()
+        if len(vals) > 0: return float(vals.max())
+    return None
+
+def extract_obtained_series(df):
+    c = obtained_column(df.columns)
+    if c is not None:
+        return pd.to_numeric(df[c], errors='coerce').fillna(0).astype(float)
+    numeric_candidates = []
+    for c in numeric_candidate_columns(df.columns):
+        s = pd.to_numeric(df[c], errors='coerce')
+        if s.notna().sum() > 0:
+            numeric_candidates.append((c, s.mean()))
+    if numeric_candidates:
+        numeric_candidates.sort(key=lambda x: x[1], reverse=True)
+        return pd.to_numeric(df[numeric_candidates[0][0]], errors='coerce').fillna(0).astype(float)
+    return pd.Series(0.0, index=df.index)
+
+# ---------------- INGESTION ----------------
+def get_schema_plan(columns):
+    """Columns to read for a given header, cached by the header so files from one platform share it.
+
+    None means "read everything" (nothing recognisable).
+    """
+    key = tuple(columns)
+    with _plans_lock:
+        if key in _plans: return _plans[key]
+
+    cols = list(columns)
+    needed = set(name_columns(cols))
+    exact, keyword = max_columns(cols)
+    needed.update(exact + keyword)
+    score_col = obtained_column(cols)
+    needed.update([score_col] if score_col is not None else numeric_candidate_columns(cols))
+    usecols = [c for c in cols if c in needed]
+    plan = usecols or None
+
+    with _plans_lock:
+        if len(_plans) >= MAX_SCHEMA_PLANS: _plans.clear()
+        _plans[key] = plan
+    return plan
+
+def read_score_frame(file):
+    """Reads only the columns the heuristics will look at, with the fastest available parser."""
+    header = pd.read_csv(file, nrows=0).columns
+    file.seek(0)
+    raw = pd.read_csv(file, header=None, nrows=1, dtype=str).iloc[0].dropna()
+    file.seek(0)
+    # pandas has renamed repeated headers in `header` ("Q1", "Q1.1"); usecols cannot match those
+    # reliably and pyarrow would keep the repeats, so such files get the old full read
+    if raw.duplicated().any(): return pd.read_csv(file)
+    usecols = get_schema_plan(header)
+    try:
+        return pd.read_csv(file, usecols=usecols, engine=CSV_ENGINE)
+    except Exception:
+        # Anything the fast path cannot handle (odd quoting, ragged rows) gets the old full read
+        file.seek(0)
+        return pd.read_csv(file)
+
+def _memo_get(memo, key):
+    with _memo_lock:
+        if key in memo:
+            memo.move_to_end(key)
+            return memo[key]
+    return None
+
+def _memo_put(memo, key, value, limit):
+    with _memo_lock:
+        memo[key] = value
+        memo.move_to_end(key)
+        while len(memo) > limit: memo.popitem(last=False)
+    return value
+
+def clear_caches():
+    """Forgets every parsed file, aggregated table and schema plan (benchmarks start cold with this)."""
+    with _memo_lock:
+        _parsed.clear(); _aggregated.clear()
+    with _plans_lock: _plans.clear()
+
+def read_file_bytes(file):
+    if hasattr(file, 'getvalue'): return file.getvalue()
+    if hasattr(file, 'read'):
+        file.seek(0)
+        return file.read()
+    with open(file, 'rb') as f: return f.read()
+
+def parse_score_file(file):
+    """One test export (path or file object) -> {"file_max", "scores": name -> score Series, "digest"}.
+
+    Results are memoised by content hash, so a file that is still uploaded on the next
+    Streamlit rerun (or turns up again in another batch) is never parsed twice.
+    """
+    data = read_file_bytes(file)
+    digest = hashlib.sha256(data).hexdigest()
+    cached = _memo_get(_parsed, digest)
+    if cached is not None:
+        instrument.count("ingest.cached", files=1)
+        return cached
+
+    with instrument.stage("ingest.read_csv", files=1, bytes=len(data)) as s:
+        df = read_score_frame(io.BytesIO(data))
+        s.add(rows=len(df))
+    with instrument.stage("ingest.columns"):
+        file_max = find_possible_pts(df)
+        names = find_name_series(df)
+        obtained = extract_obtained_series(df)
+        if file_max is None:
+            file_max = obtained.max() if not obtained.empty else DEFAULT_TEST_MAX_PER_FILE
+            if file_max == 0: file_max = DEFAULT_TEST_MAX_PER_FILE
+        parsed = {"file_max": float(file_max), "scores": build_file_scores(names, obtained), "digest": digest}
+    return _memo_put(_parsed, digest, parsed, PARSE_CACHE_SIZE)
+
+def _parse_or_error(file):
+    try:
+        return parse_score_file(file), None
+    except Exception as e:
+        return None, (getattr(file, 'name', str(file)), e)
+
+def load_score_files(files):
+    """Parses every file (several at once); returns (per_file_data, errors) where errors is a list of (file name, exception)."""
+    files = list(files)
+    if not files: return [], []
+    with instrument.stage("ingest", files=len(files)) as s:
+        with ThreadPoolExecutor(max_workers=min(READ_WORKERS, len(files))) as pool:
+            results = list(pool.map(instrument.propagate(_parse_or_error), files))
+        per_file_data = [data for data, err in results if err is None]
+        errors = [err for data, err in results if err is not None]
+        s.add(errors=len(errors))
+    return per_file_data, errors
+
+# ---------------- AGGREGATION ----------------
+def exact_round(values, ndigits):
+    # builtin round() is exact on the binary value; np.round scales first and can tip x.xx5 the other way
+    return np.array([round(v, ndigits) for v in values.tolist()], dtype=float)
+
+def build_score_matrix(per_file_data):
+    """Returns (students, matrix): matrix is tests x students, NaN where absent."""
+    sizes = [len(f['scores']) for f in per_file_data]
+    names = np.concatenate([f['scores'].index.to_numpy(dtype=object) for f in per_file_data]) if per_file_data else np.array([], dtype=object)
+    codes, students = pd.factorize(names)
+    matrix = np.full((len(per_file_data), len(students)), np.nan)
+    if len(codes):
+        matrix[np.repeat(np.arange(len(per_file_data)), sizes), codes] = np.concatenate([f['scores'].to_numpy(dtype=float) for f in per_file_data])
+    return np.asarray(students, dtype=object), matrix
+
+def aggregate_scores(per_file_data):
+    with instrument.stage("aggregate", tests=len(per_file_data)) as s:
+        out_df, total_max_marks = _aggregate_scores(per_file_data)
+        s.add(students=len(out_df))
+    return out_df, total_max_marks
+
+def _aggregate_scores(per_file_data):
+    total_max_marks = sum(f['file_max'] for f in per_file_data)
+    students, matrix = build_score_matrix(per_file_data)
+
+    present = (~np.isnan(matrix)).sum(axis=0).astype(int)
+    # Summing down axis 0 adds one test at a time, same float order as the old per-student loop
+    total_obtained = np.nan_to_num(matrix, nan=0.0).sum(axis=0)
+    return results_table(students, present, total_obtained, len(per_file_data), total_max_marks), total_max_marks
+
+def results_table(students, present, total_obtained, total_tests_count, total_max_marks):
+    """The ranked out_df from per-student totals (students as normalized names, in first-seen order).
+
+    'Key' carries each student's normalized name: Name is its title case for display and does not
+    always normalize back to it, so anything matching students up goes by Key.
+    """
+    if total_max_marks > 0:
+        pct = exact_round(total_obtained / total_max_marks * 100, 1)
+    else:
+        pct = np.zeros(len(students), dtype=int)
+
+    out_df = pd.DataFrame({
+        "Name": pd.Series(students).str.title(), "Total Tests": total_tests_count, "Present": present,
+        "Absent": total_tests_count - present, "Total Marks": int(total_max_marks),
+        "Obtained": exact_round(total_obtained, 2), "Percentage": pct
+    })
+    out_df['Rank'] = out_df['Obtained'].rank(method='dense', ascending=False).astype(int)
+    out_df['Key'] = np.asarray(students, dtype=object)
+    return out_df.sort_values(by=['Rank', 'Name']).reset_index(drop=True)
+
+def aggregate_scores_cached(per_file_data):
+    """aggregate_scores() memoised on the content hashes of the files, in order.
+
+    Editing a title, the date or the thresholds reuses the same table; the result is shared, so
+    callers must not modify it in place.
+    """
+    key = tuple(f['digest'] for f in per_file_data)
+    cached = _memo_get(_aggregated, key)
+    if cached is not None:
+        instrument.count("aggregate.cached", tables=1)
+        return cached
+    return _memo_put(_aggregated, key, aggregate_scores(per_file_data), AGGREGATE_CACHE_SIZE)
@@ -0,0 +1,120 @@
+"""A reportlab canvas that writes every page to its file as soon as the page is finished.
+
+reportlab's Canvas keeps each page (its uncompressed drawing operators and PDF objects) until
+save(), then joins the whole file into one bytes string before writing it: a 2,000 page report
+held ~50 KB per page plus the file twice over. StreamingCanvas formats a finished page, its
+content stream and its link annotations straight into fileobj and forgets them, so memory no
+longer grows with the page count. What pages share (fonts, forms, images, the page tree,
+bookmarks) is small and written by save(), followed by the cross-reference table.
+
+PDF lets objects sit anywhere in the file as long as the cross-reference table points at them,
+so the output is the same document reportlab would write, in a different object order.
+
+This reaches into reportlab's PDFDocument (its object tables, page list and format()), so the
+reportlab version is pinned in requirements.txt and tests/test_streaming_pdf.py reads every kind
+of document back with a strict parser.
+
+    c = StreamingCanvas(fileobj, pagesize=A4)   # fileobj: any binary file, written front to back
+    ...draw, c.showPage(), ...
+    c.save()
+
+Its streams (pages, forms, images) are also written as raw binary Flate data by default: the
+ASCII85 wrapping reportlab adds is pure Python (most of the render time once every awardee gets
+their own document) and 25% larger. reportlab only reads that choice from its global rl_config,
+so the canvas sets it just while it creates or formats its own objects, under a lock, and puts it
+back; other canvases in the process keep reportlab's setting.
+"""
+import threading
+import contextlib
+
+from reportlab import rl_config
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase import pdfdoc
+
+_rl_config_lock = threading.RLock()
+
+
+class _FileOutput(pdfdoc.PDFFile):
+    # reportlab's output collector, handing every piece to the file instead of keeping it
+    def __init__(self, fileobj, pdf_version):
+        super().__init__(pdf_version)   # collects the header
+        for s in self.strings: fileobj.write(s)
+        self.strings = None
+        self.write = fileobj.write
+
+    def format(self, document):
+        return b""   # everything is in the file already
+
+
+class StreamingCanvas(canvas.Canvas):
+    """canvas.Canvas writing to fileobj page by page; encryption is not supported.
+
+    a85: wrap streams in ASCII85 as reportlab does by default (False writes them as raw binary).
+    """
+
+    def __init__(self, fileobj, a85=False, **kwargs):
+        self._a85 = int(a85)
+        super().__init__(fileobj, **kwargs)
+        self._out = _FileOutput(fileobj, self._doc._pdfVersion)
+        self._written = set()
+        # PDFDocument.GetPDFData() (called by save) finishes with self.format(): write the rest instead
+        self._doc.format = self._write_rest
+
+    @contextlib.contextmanager
+    def _stream_options(self):
+        with _rl_config_lock:
+            saved, rl_config.useA85 = rl_config.useA85, self._a85
+            try:
+                yield
+            finally:
+                rl_config.useA85 = saved
+
+    # Everything that builds or formats a stream object reads rl_config.useA85 there and then
+    def drawImage(self, *args, **kwargs):
+        with self._stream_options(): return super().drawImage(*args, **kwargs)
+
+    def drawInlineImage(self, *args, **kwargs):
+        with self._stream_options(): return super().drawInlineImage(*args, **kwargs)
+
+    def save(self):
+        with self._stream_options(): super().save()
+
+    def showPage(self):
+        with self._stream_options(): self._show_page()
+
+    def _show_page(self):
+        super().showPage()
+        doc = self._doc
+        page = doc.Pages.pages[-1]
+        name = page.__InternalName__
+        try:
+            # Formatting the page registers its content stream, which is written with it
+            parts = [(name, pdfdoc.PDFIndirectObject(name, page).format(doc))]
+            owned = [page.Contents] + [doc.idToObject[ref.name] for ref in (page.Annots.sequence if page.Annots else ())]
+            parts += [(obj.__InternalName__, pdfdoc.PDFIndirectObject(obj.__InternalName__, obj).format(doc)) for obj in owned]
+        except (KeyError, ValueError):
+            return   # refers to something not defined yet (a bookmark further on): written by save()
+        for oid, data in parts:
+            doc.idToOffset[oid] = self._out.add(data)
+            doc.idToObject[oid] = None
+            self._written.add(oid)
+        doc.Pages.pages[-1] = pdfdoc.PDFObjectReference(name)
+
+    def _write_rest(self):
+        # PDFDocument.format() for the objects not written yet: objects can still be registered
+        # while others are formatted, so walk the object numbers until they run out
+        doc, out = self._doc, self._out
+        doc.Reference(doc.Catalog)
+        doc.Reference(doc.info)
+        ids = []
+        while len(ids) + 1 in doc.numberToId:
+            oid = doc.numberToId[len(ids) + 1]
+            if oid not in self._written:
+                doc.idToOffset[oid] = out.add(pdfdoc.PDFIndirectObject(oid, doc.idToObject[oid]).format(doc))
+            ids.append(oid)
+        xref = pdfdoc.PDFCrossReferenceTable()
+        xref.addsection(0, ids)
+        start = out.add(xref.format(doc))
+        trailer = pdfdoc.PDFTrailer(startxref=start, Size=len(ids) + 1, Root=doc.Reference(doc.Catalog), Info=doc.Reference(doc.info), ID=doc.ID())
+        out.add(trailer.format(doc))
+        return out.format(doc)
@@ -0,0 +1,19 @@
+"""Shared test setup: the repo root importable, and no network, asset cache, history or run log
+outside a scratch folder. The settings are read at import time, so they are set before any module
+under test is imported."""
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_scratch = tempfile.mkdtemp(prefix="scorecard-tests-")
+atexit.register(shutil.rmtree, _scratch, True)
+
+os.environ.update(
+    SCORECARD_OFFLINE="1", SCORECARD_ASSET_DIR="", SCORECARD_ASSET_CACHE=os.path.join(_scratch, "assets"),
+    SCORECARD_RUN_LOG="", SCORECARD_HISTORY_DB=os.path.join(_scratch, "history.sqlite"),
+    SCORECARD_STATE_DIR=os.path.join(_scratch, "state"),
+)
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
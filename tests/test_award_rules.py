@@ -0,0 +1,68 @@
+"""AWARD_RULES: who wins what, and how ties at a top-N cut are settled."""
+import numpy as np
+import pytest
+
+import award_rules
+import certificates
+import scoring
+from benchmarks.synthetic import generate_class
+
+YELLOW, GREEN = 40, 70
+
+
+def class_of(obtained, present=None, tests=10, max_marks=1000):
+    """A ranked out_df with one student per Obtained value ("s00", "s01", ... in that order)."""
+    present = np.full(len(obtained), tests) if present is None else np.asarray(present)
+    names = np.array([f"s{i:02d}" for i in range(len(obtained))], dtype=object)
+    return scoring.results_table(names, present, np.asarray(obtained, dtype=float), tests, max_marks)
+
+def winners(out_df, rules=award_rules.AWARD_RULES):
+    return {rule['key']: won['Name'].tolist() for rule, won in award_rules.select_winners(out_df, YELLOW, GREEN, rules)}
+
+def reference_winners(out_df, thresh_yellow, thresh_green):
+    # The app's original certificate selection, award by award
+    rank_awards = {"VIKRAMADITYA": [1], "CHANAKYA": [2], "ARJUNA": [3], "DHRUVA": [4, 5], "KARNA": [6, 7, 8, 9, 10]}
+    found = {key: out_df[out_df['Rank'].isin(ranks)]['Name'].tolist() for key, ranks in rank_awards.items()}
+    angad = out_df[(out_df['Absent'] == 0) & (out_df['Percentage'] >= thresh_yellow) & (out_df['Rank'] > 10)].sort_values(by='Obtained', ascending=False)
+    bhagirath = out_df[(out_df['Percentage'] >= thresh_yellow) & (out_df['Percentage'] < thresh_green) & (out_df['Present'] / out_df['Total Tests'] >= 0.8)
+                       & (out_df['Rank'] > 10) & (out_df['Absent'] > 0)].sort_values(by='Obtained', ascending=False)
+    for key, candidates in (("ANGAD", angad), ("BHAGIRATH", bhagirath)):
+        if len(candidates) > 5: candidates = candidates[candidates['Obtained'] >= candidates.iloc[4]['Obtained']]
+        found[key] = candidates['Name'].tolist()
+    return {key: names for key, names in found.items() if names}
+
+def test_level_scores_share_a_rank_award():
+    out_df = class_of([900, 900, 800, 700])
+    assert winners(out_df) == {"VIKRAMADITYA": ["S00", "S01"], "CHANAKYA": ["S02"], "ARJUNA": ["S03"]}
+
+def test_top_n_includes_everyone_level_with_the_nth():
+    # Ranks 1-10 take the rank awards; below them seven full attenders, the 5th to 7th on one score
+    out_df = class_of([990 - 10 * i for i in range(10)] + [600, 590, 580, 570, 560, 560, 560])
+    assert winners(out_df)["ANGAD"] == ["S10", "S11", "S12", "S13", "S14", "S15", "S16"]
+
+def test_top_n_drop_cuts_at_exactly_n_in_rank_order():
+    out_df = class_of([990 - 10 * i for i in range(10)] + [600, 590, 580, 570, 560, 560, 560])
+    rules = [dict(rule, ties="drop") if rule['key'] == "ANGAD" else rule for rule in award_rules.AWARD_RULES]
+    assert winners(out_df, rules)["ANGAD"] == ["S10", "S11", "S12", "S13", "S14"]
+
+def test_attendance_and_percentage_bounds():
+    # Below rank 10: 8/10 present in the yellow zone wins Bhagirath, 7/10 does not, full attendance
+    # goes to Angad instead, and the green zone (70% and up) is out of Bhagirath's range
+    out_df = class_of([990 - 10 * i for i in range(10)] + [700, 500, 500, 500, 399], present=[10] * 10 + [8, 8, 7, 10, 8])
+    found = winners(out_df)
+    assert found["BHAGIRATH"] == ["S11"] and found["ANGAD"] == ["S13"]
+
+@pytest.mark.parametrize("seed", [0, 1, 2, 3])
+def test_same_winners_as_the_original_certificates(tmp_path, seed):
+    per_file_data, _ = scoring.load_score_files(generate_class(str(tmp_path), students=150, tests=10, seed=seed))
+    out_df, _ = scoring.aggregate_scores(per_file_data)
+    found, expected = winners(out_df), reference_winners(out_df, YELLOW, GREEN)
+    assert found.keys() == expected.keys()
+    for key in found:
+        # The original sorted ties on Obtained in no particular order
+        assert found[key] == expected[key] if key not in ("ANGAD", "BHAGIRATH") else sorted(found[key]) == sorted(expected[key])
+
+def test_certificates_go_to_the_hall_of_fame_winners():
+    out_df = class_of([990 - 10 * i for i in range(10)] + [600, 590, 580, 570, 560, 560, 560])
+    awards = certificates.select_awards(out_df, YELLOW, GREEN)
+    assert [(name, key) for name, _, _, _, key, _ in awards] == [(name, key) for key, names in winners(out_df).items() for name in names]
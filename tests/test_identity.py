@@ -0,0 +1,51 @@
+"""identity.resolve(): which spellings are merged into one student, and which never are."""
+import pandas as pd
+
+import identity
+import pipeline
+import scoring
+
+
+def month(*tests):
+    """per_file_data with one file per {name: score} dict, as scoring.parse_score_file() builds it."""
+    return [{"file_max": 10.0, "scores": pd.Series(scores, dtype=float), "digest": f"test{i}"} for i, scores in enumerate(tests)]
+
+def merged(per_file_data, aliases=None):
+    _, decisions = identity.resolve(per_file_data, aliases)
+    return {row.alias: (row.canonical, row.method) for row in decisions.itertuples()}
+
+def test_word_order_and_typos_merge_into_the_most_used_spelling():
+    files = month({"riya patel": 8, "amit shah": 5}, {"riya patel": 7, "amit shah": 6}, {"patel riya": 9, "amit shahh": 4})
+    assert merged(files) == {"patel riya": ("riya patel", "word order"), "amit shahh": ("amit shah", "fuzzy")}
+
+def test_merged_totals_add_up():
+    files = month({"riya patel": 8}, {"patel riya": 9}, {"riya patel": 7})
+    resolved, _ = identity.resolve(files)
+    out_df, total_max_marks = scoring.aggregate_scores(resolved)
+    assert out_df.to_dict('records') == [{"Name": "Riya Patel", "Total Tests": 3, "Present": 3, "Absent": 0, "Total Marks": 30,
+                                          "Obtained": 24.0, "Percentage": 80.0, "Rank": 1, "Key": "riya patel"}]
+
+def test_spellings_in_the_same_test_are_two_students():
+    assert merged(month({"riya patel": 8, "patel riya": 3}, {"riya patel": 7})) == {}
+
+def test_short_words_digits_and_unrelated_names_stay_apart():
+    files = month({"raj shah": 5, "student 1": 5, "neha joshi": 5}, {"ram shah": 6, "student 2": 6, "neha mehta": 6})
+    assert merged(files) == {}
+
+def test_a_chain_of_spellings_does_not_merge_its_ends():
+    # mehta ~ mehra ~ nehra pairwise, but nehra is two edits from the canonical mehta
+    files = month({"rohan mehta": 5}, {"rohan mehta": 6}, {"rohan mehta": 7}, {"rohan mehra": 4}, {"rohan nehra": 3})
+    assert merged(files) == {"rohan mehra": ("rohan mehta", "fuzzy")}
+
+def test_alias_table():
+    files = month({"riya patel": 8}, {"patel riya": 9})
+    # A manual merge applies even across an overlap; an alias that is its own canonical is never merged
+    assert merged(month({"r patel": 8, "riya patel": 2}), {"r patel": ("riya patel", "manual")}) == {"r patel": ("riya patel", "alias table")}
+    assert merged(files, {"patel riya": ("patel riya", "manual")}) == {}
+
+def test_a_manual_merge_over_a_shared_test_reports_the_dropped_score():
+    files = month({"r patel": 8, "riya patel": 2}, {"r patel": 6}, {"riya patel": 7})
+    resolved, decisions = identity.resolve(files, {"r patel": ("riya patel", "manual")})
+    assert decisions[["alias", "tests", "overlaps"]].to_dict('records') == [{"alias": "r patel", "tests": 2, "overlaps": 1}]
+    assert [f['scores'].to_dict() for f in resolved] == [{"riya patel": 2.0}, {"riya patel": 6.0}, {"riya patel": 7.0}]
+    assert "1 of them also had another spelling" in pipeline.merge_lines(decisions.to_dict('records'))[0]
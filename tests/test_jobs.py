@@ -0,0 +1,75 @@
+"""jobs: progress as reported by the render, cancelling queued and running jobs, and a failing render."""
+import threading
+import uuid
+
+import jobs
+
+
+def key():
+    return uuid.uuid4().hex
+
+def wait(job):
+    job._future.result(timeout=10)
+    return job
+
+def test_progress_is_reported_until_the_job_is_done():
+    reported, release = threading.Event(), threading.Event()
+    def render():
+        jobs.progress(1, 4, "card")
+        with jobs.quiet(): jobs.progress(99, 100, "page")   # one step of a bigger render: not shown
+        reported.set()
+        release.wait(10)
+        return b"12345"
+    job = jobs.submit(key(), "Cards", render)
+    assert reported.wait(10)
+    assert (job.state, job.progress, job.fraction()) == (jobs.RUNNING, (1, 4, "card"), 0.25)
+    assert job.describe() == "Cards: card 1/4"
+    release.set()
+    assert (wait(job).state, job.size, job.error) == (jobs.DONE, 5, None)
+    assert job.record is not None and job.describe() == "Cards: done"
+    jobs.progress(1, 1, "card")   # outside a job: nothing to report to
+
+def test_submitting_an_active_key_returns_its_job():
+    release = threading.Event()
+    k = key()
+    job = jobs.submit(k, "Report", lambda: release.wait(10) and b"")
+    assert jobs.submit(k, "Report", lambda: b"again") is job
+    release.set()
+    wait(job)
+    assert jobs.submit(k, "Report", lambda: b"again") is not job
+
+def test_a_render_that_raises_is_a_failed_job():
+    def render():
+        raise OSError("disk full")
+    job = wait(jobs.submit(key(), "Certificates", render))
+    assert (job.state, job.error, job.size) == (jobs.FAILED, "disk full", None)
+    assert not job.active and jobs.find(job.key) is job
+
+def test_cancel_stops_a_running_job_at_its_next_progress_report():
+    started = threading.Event()
+    def render():
+        for page in range(10_000):
+            jobs.progress(page, 10_000, "page")
+            started.set()
+            threading.Event().wait(0.001)
+        return b"finished anyway"
+    job = jobs.submit(key(), "Report", render)
+    assert started.wait(10)
+    job.cancel()
+    assert (wait(job).state, job.size) == (jobs.CANCELLED, None)
+
+def test_a_cancelled_queued_job_never_starts():
+    release, running = threading.Event(), threading.Semaphore(0)
+    def block():
+        running.release()
+        return release.wait(10) and b""
+    busy = [jobs.submit(key(), "Busy", block) for _ in range(jobs.MAX_JOBS)]
+    for _ in busy: assert running.acquire(timeout=10)
+    ran = []
+    job = jobs.submit(key(), "Queued", lambda: ran.append(1) or b"")
+    assert job.state == jobs.QUEUED and job.describe() == "Queued: waiting for a free slot (0 ahead)"
+    job.cancel()
+    assert job.state == jobs.CANCELLED
+    release.set()
+    for b in busy: wait(b)
+    assert ran == []
@@ -0,0 +1,104 @@
+"""lookup.py's HTTP handling, driven over a real socket: keep-alive, bodies, and requests that break a limit."""
+import socket
+
+import numpy as np
+import pytest
+
+import lookup
+from scoring import results_table
+
+
+@pytest.fixture(scope="module")
+def server():
+    previous = lookup.current()
+    lookup.publish(results_table(np.array(["riya patel", "amit shah"], dtype=object), np.array([3, 2]), np.array([27.0, 15.0]), 3, 30), "test")
+    srv = lookup.serve(port=0)
+    yield srv
+    srv.shutdown()
+    lookup._index = previous
+
+def connect(server):
+    sock = socket.create_connection(server.server_address[:2], timeout=5)
+    return sock, sock.makefile("rb")
+
+def read_response(stream):
+    """(status, {header: value}, body) of the next response, or None once the server has hung up."""
+    try:
+        line = stream.readline()
+    except ConnectionResetError:   # hung up with our request still unread
+        return None
+    if not line: return None
+    headers = {}
+    while (header := stream.readline()) not in (b"\r\n", b""):
+        name, _, value = header.decode().partition(":")
+        headers[name.lower()] = value.strip()
+    return int(line.split()[1]), headers, stream.read(int(headers["content-length"]))
+
+def get(path, *headers):
+    return "\r\n".join([f"GET {path} HTTP/1.1", "Host: test", *headers, "", ""]).encode()
+
+def test_keep_alive_answers_several_requests_on_one_connection(server):
+    sock, stream = connect(server)
+    with sock:
+        sock.sendall(get("/student?name=Riya%20Patel") + get("/health"))
+        status, headers, body = read_response(stream)
+        assert (status, headers["connection"]) == (200, "keep-alive") and b'"Riya Patel"' in body
+        status, headers, body = read_response(stream)
+        assert status == 200 and b'"students": 2' in body
+        sock.sendall(get("/search?q=amit", "Connection: close"))
+        status, headers, body = read_response(stream)
+        assert (status, headers["connection"]) == (200, "close") and b'"Amit Shah"' in body
+        assert read_response(stream) is None
+
+def test_http_1_0_closes_unless_asked_to_keep_alive(server):
+    sock, stream = connect(server)
+    with sock:
+        sock.sendall(b"GET /health HTTP/1.0\r\nConnection: keep-alive\r\n\r\nGET /health HTTP/1.0\r\n\r\n")
+        assert read_response(stream)[1]["connection"] == "keep-alive"
+        assert read_response(stream)[1]["connection"] == "close"
+        assert read_response(stream) is None
+
+def test_a_malformed_request_line_is_a_400_and_closes(server):
+    sock, stream = connect(server)
+    with sock:
+        sock.sendall(b"GET /health\r\n\r\n" + get("/health"))
+        status, headers, _ = read_response(stream)
+        assert (status, headers["connection"]) == (400, "close")
+        assert read_response(stream) is None
+
+def test_a_body_is_read_past_so_the_next_request_still_parses(server):
+    sock, stream = connect(server)
+    with sock:
+        body = get("/student?name=amit%20shah")   # must not be answered as a request of its own
+        sock.sendall(f"POST /student HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body + b"DELETE / HTTP/1.1\r\n\r\n" + get("/health"))
+        assert read_response(stream)[0] == 405
+        status, headers, _ = read_response(stream)   # no Content-Length: no body
+        assert (status, headers["connection"]) == (405, "keep-alive")
+        status, _, body = read_response(stream)
+        assert status == 200 and b'"source": "test"' in body
+
+def test_an_oversized_or_chunked_body_is_answered_then_closed(server):
+    for framing in (f"Content-Length: {lookup.MAX_BODY + 1}", "Transfer-Encoding: chunked"):
+        sock, stream = connect(server)
+        with sock:
+            sock.sendall(f"POST / HTTP/1.1\r\n{framing}\r\n\r\n".encode())
+            status, headers, _ = read_response(stream)
+            assert (status, headers["connection"]) == (405, "close")
+            assert read_response(stream) is None
+
+@pytest.mark.parametrize("request_bytes", [
+    b"POST / HTTP/1.1\r\nContent-Length: twelve\r\n\r\n",
+    get("/health", "X-Long: " + "a" * lookup.MAX_HEADER_LINE),
+    get("/health", *[f"X-{i}: y" for i in range(lookup.MAX_HEADERS)]),   # one over, with Host
+], ids=["garbage length", "long header line", "too many headers"])
+def test_a_request_breaking_a_limit_is_dropped_unanswered(server, request_bytes):
+    sock, stream = connect(server)
+    with sock:
+        sock.sendall(request_bytes)
+        assert read_response(stream) is None
+
+def test_headers_up_to_the_limits_are_accepted(server):
+    sock, stream = connect(server)
+    with sock:
+        sock.sendall(get("/health", "X-Long: " + "a" * (lookup.MAX_HEADER_LINE - 100), *[f"X-{i}: y" for i in range(lookup.MAX_HEADERS - 2)]))
+        assert read_response(stream)[0] == 200
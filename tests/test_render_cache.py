@@ -0,0 +1,69 @@
+"""render_cache: the byte-bounded LRU, spilling to SCORECARD_RENDER_CACHE, and large renders kept on disk."""
+import os
+import tempfile
+
+import pytest
+
+import render_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch, tmp_path):
+    """A fresh cache of at most 100 bytes in memory; renders past 64 bytes go to disk."""
+    monkeypatch.setattr(render_cache, "_entries", type(render_cache._entries)())
+    monkeypatch.setattr(render_cache, "_total_bytes", 0)
+    monkeypatch.setattr(render_cache, "_doc_dir", None)
+    monkeypatch.setattr(render_cache, "MAX_BYTES", 100)
+    monkeypatch.setattr(render_cache, "SPOOL_BYTES", 64)
+    monkeypatch.setattr(render_cache, "SPILL_DIR", "")
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    exits = []
+    monkeypatch.setattr(render_cache.atexit, "register", lambda f, *args, **kwargs: exits.append((f, args, kwargs)))
+    return exits
+
+def rendered(data):
+    """A render callback that writes data into a spool(), as the renderers do."""
+    def render():
+        f = render_cache.spool()
+        f.write(data)
+        return f
+    return render
+
+def test_least_recently_used_entries_are_evicted_over_the_byte_budget():
+    for key in "abc":
+        assert render_cache.get_or_render(key, lambda: key.encode() * 40) == key.encode() * 40
+        if key == "b": render_cache.get("a")   # a is now the more recently used
+    assert render_cache.get("b") is None
+    assert render_cache.get("a") == b"a" * 40 and render_cache.get("c") == b"c" * 40
+    assert render_cache._total_bytes == 80
+
+def test_evicted_entries_spill_to_disk_and_read_back(monkeypatch, tmp_path):
+    monkeypatch.setattr(render_cache, "SPILL_DIR", str(tmp_path / "spill"))
+    for key in "abc": render_cache.get_or_render(key, lambda: key.encode() * 40)
+    assert os.listdir(tmp_path / "spill") == ["a.pdf"]
+    assert render_cache.get("a") == b"a" * 40   # back in memory, pushing b out to disk in turn
+    assert sorted(os.listdir(tmp_path / "spill")) == ["a.pdf", "b.pdf"]
+    render_cache._entries.clear()
+    assert render_cache.get_or_render("b", lambda: pytest.fail("rendered again")) == b"b" * 40
+
+def test_a_large_render_stays_on_disk_and_is_removed_when_evicted(monkeypatch, empty_cache):
+    doc = render_cache.get_or_render("big", rendered(b"x" * 1000))
+    assert isinstance(doc, render_cache.FileDocument) and len(doc) == 1000 and doc.read() == b"x" * 1000
+    assert render_cache._total_bytes == 0
+    assert isinstance(render_cache.get_or_render("small", rendered(b"y" * 10)), bytes)
+    # With no spill folder the file has nowhere to be found again once evicted
+    monkeypatch.setattr(render_cache, "MAX_ENTRIES", 1)
+    render_cache.get_or_render("other", lambda: b"z")
+    assert not os.path.exists(doc.path)
+    # and the private folder itself is removed at exit
+    [(remove, args, kwargs)] = empty_cache
+    remove(*args, **kwargs)
+    assert not os.path.exists(os.path.dirname(doc.path))
+
+def test_a_large_spilled_render_is_served_from_its_file(monkeypatch, tmp_path):
+    monkeypatch.setattr(render_cache, "SPILL_DIR", str(tmp_path / "spill"))
+    render_cache.get_or_render("big", rendered(b"x" * 1000))
+    assert os.listdir(tmp_path / "spill") == ["big.pdf"]
+    render_cache._entries.clear()   # a restart
+    doc = render_cache.get("big")
+    assert isinstance(doc, render_cache.FileDocument) and doc.read() == b"x" * 1000
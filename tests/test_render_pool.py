@@ -0,0 +1,11 @@
+"""render_pool.imap(): every chunk comes back, whatever the chunks hold."""
+import render_pool
+
+
+def test_empty_and_falsy_chunks_do_not_end_the_queue(monkeypatch):
+    monkeypatch.setattr(render_pool, "RENDER_WORKERS", 2)
+    chunks = [[1], [], [2, 3], (), [4], [5, 6, 7]]
+    try:
+        assert sorted(render_pool.imap(len, chunks, workers=2)) == sorted(len(c) for c in chunks)
+    finally:
+        render_pool.shutdown()
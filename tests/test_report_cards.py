@@ -0,0 +1,33 @@
+"""Cards, rank change and lookup match students up by out_df's 'Key', never by re-normalizing the display Name."""
+import numpy as np
+import pandas as pd
+
+import history
+import lookup
+import report_cards
+import scoring
+
+# Title case does not always lower back to the name as typed ("Ilkay" is "ilkay", not "ılkay")
+NAMES = ["ılkay demir", "mcdonald ray", "o'neil x"]
+
+
+def month(*tests):
+    return [{"file_max": 10.0, "scores": pd.Series(scores, dtype=float), "digest": f"test{i}"} for i, scores in enumerate(tests)]
+
+def test_cards_find_every_students_scores():
+    files = month(dict(zip(NAMES, (9, 8, 7))), dict(zip(NAMES, (6, 5, np.nan))))
+    out_df, _ = scoring.aggregate_scores(files)
+    assert out_df['Name'].tolist() == ["Ilkay Demir", "Mcdonald Ray", "O'Neil X"] and out_df['Key'].tolist() == NAMES
+    _, cards = report_cards.card_data(out_df, files)
+    scores = np.array([card[-1] for card in cards])
+    np.testing.assert_array_equal(scores, [[9, 6], [8, 5], [7, np.nan]])
+    assert all(b'"Rank"' in lookup.ResultIndex(out_df).get(name) for name in NAMES)
+
+def test_rank_change_and_saved_results_keep_the_key(tmp_path):
+    db = str(tmp_path / "history.sqlite")
+    nov, _ = scoring.aggregate_scores(month(dict(zip(NAMES, (5, 8, 7)))))
+    history.save_month("2026-11", [], nov, 10, path=db)
+    assert history.load_results("2026-11", path=db).equals(nov)
+    dec, _ = scoring.aggregate_scores(month(dict(zip(NAMES, (9, 8, 7)))))
+    dec, prev = history.add_rank_change(dec, "2026-12", path=db)
+    assert prev == "2026-11" and dec.set_index('Key')['Rank Change'].to_dict() == {"ılkay demir": 2, "mcdonald ray": -1, "o'neil x": -1}
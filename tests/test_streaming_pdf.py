@@ -0,0 +1,101 @@
+"""StreamingCanvas leans on reportlab internals (see streaming_pdf.py), so every document it writes
+is read back here with pypdf in strict mode and its cross-reference table checked byte by byte.
+A reportlab release that moves those internals fails these tests instead of shipping broken PDFs."""
+import io
+import re
+
+import pytest
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+import scoring
+import report_pdf
+import report_cards
+from streaming_pdf import StreamingCanvas
+from benchmarks.synthetic import generate_class
+
+pypdf = pytest.importorskip("pypdf")
+
+
+@pytest.fixture(scope="module")
+def month(tmp_path_factory):
+    paths = generate_class(str(tmp_path_factory.mktemp("month")), students=300, tests=6, seed=7)
+    per_file_data, errors = scoring.load_score_files(paths)
+    assert not errors
+    out_df, total_max_marks = scoring.aggregate_scores(per_file_data)
+    return per_file_data, out_df, total_max_marks
+
+def check_xref(data):
+    """Every in-use xref entry points at its own 'N 0 obj', and startxref points at the table."""
+    start = int(re.findall(rb"startxref\s+(\d+)", data)[-1])
+    assert data[start:start + 4] == b"xref"
+    first, count = map(int, re.match(rb"xref\s+(\d+) (\d+)\s+", data[start:]).groups())
+    entries = re.findall(rb"(\d{10}) (\d{5}) ([nf])", data[start:])[:count]
+    assert len(entries) == count
+    for number, (offset, _, kind) in enumerate(entries, first):
+        if kind == b"n": assert data[int(offset):].startswith(b"%d 0 obj" % number), f"object {number}"
+    return count
+
+def read_strict(data):
+    check_xref(data)
+    reader = pypdf.PdfReader(io.BytesIO(data), strict=True)
+    text = [page.extract_text() for page in reader.pages]
+    return reader, text
+
+def test_report_is_a_valid_pdf(month):
+    per_file_data, out_df, total_max_marks = month
+    buffer = io.BytesIO()
+    pages = report_pdf.write_report_pdf(out_df, total_max_marks, 40, 70, "TEST REPORT", "TEST SUMMARY", buffer, per_file_data=per_file_data)
+    reader, text = read_strict(buffer.getvalue())
+    assert pages > 5 and len(reader.pages) == pages
+    assert all(f"Page {n}/{pages}" in t for n, t in enumerate(text, 1))
+    assert out_df['Name'].iloc[0] in text[0] and out_df['Name'].iloc[-1] in "".join(text)
+
+def test_report_cards_index_points_at_every_card(month):
+    per_file_data, out_df, _ = month
+    buffer = io.BytesIO()
+    cards = report_cards.write_report_cards_pdf(out_df, per_file_data, 40, 70, "TEST REPORT", buffer)
+    reader, text = read_strict(buffer.getvalue())
+    assert len(reader.pages) == cards == len(out_df)
+    targets = [reader.get_destination_page_number(entry) for group in reader.outline if isinstance(group, list) for entry in group]
+    assert sorted(targets) == list(range(cards))
+    for i in (0, cards // 2, cards - 1):
+        assert out_df['Name'].iloc[i].upper() in text[i]
+
+def draw(c, pages):
+    # Plain pages plus a forward link and a bookmark defined after the page that links to it
+    for p in range(pages):
+        if p == 0: c.linkAbsolute("to the end", "last", (50, 700, 200, 720))
+        if p == pages - 1: c.bookmarkPage("last")
+        c.drawString(72, 720, f"page {p + 1} of {pages}")
+        c.addOutlineEntry(f"page {p + 1}", "last" if p == pages - 1 else f"p{p}", level=0)
+        if p < pages - 1: c.bookmarkPage(f"p{p}")
+        c.showPage()
+    c.save()
+
+def test_same_document_as_plain_canvas():
+    plain, streamed = io.BytesIO(), io.BytesIO()
+    draw(canvas.Canvas(plain, pagesize=A4, invariant=1), 25)
+    draw(StreamingCanvas(streamed, pagesize=A4, invariant=1), 25)
+    (a, text_a), (b, text_b) = read_strict(plain.getvalue()), read_strict(streamed.getvalue())
+    assert text_a == text_b and [t.strip() for t in text_b] == [f"page {p + 1} of 25" for p in range(25)]
+    assert [a.get_destination_page_number(o) for o in a.outline] == [b.get_destination_page_number(o) for o in b.outline]
+    assert b.get_destination_page_number(b.outline[-1]) == 24
+
+def test_streams_are_raw_without_touching_other_canvases():
+    from PIL import Image
+    from reportlab import rl_config
+    from image_readers import SharedImageReader
+    image = SharedImageReader(Image.new("RGB", (8, 8), (200, 40, 40)))
+    docs = {}
+    for kind, make in (("plain", canvas.Canvas), ("streamed", StreamingCanvas)):
+        buffer = io.BytesIO()
+        c = make(buffer, pagesize=A4)
+        c.drawImage(image, 72, 72, 40, 40)
+        c.drawString(72, 720, "x")
+        c.showPage()
+        c.save()
+        docs[kind] = buffer.getvalue()
+    assert rl_config.useA85 == 1
+    assert b"/ASCII85Decode" in docs["plain"] and b"/ASCII85Decode" not in docs["streamed"]
+    read_strict(docs["streamed"])
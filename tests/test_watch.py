@@ -0,0 +1,88 @@
+"""watch.py on a temporary folder: filing exports under months, replacing a re-saved one, the
+private JSON ledgers and closing a month."""
+import os
+import argparse
+
+import pandas as pd
+import pytest
+
+import history
+import scoring
+import watch
+
+OLD = 1_000_000_000   # an mtime long settled (2001), far from the months files are filed under
+
+
+def export(folder, name, rows, mtime=OLD):
+    path = os.path.join(folder, name)
+    with open(path, "w") as f: f.write("Name,Score,Max Marks\n" + "".join(f"{n},{s},10\n" for n, s in rows.items()))
+    os.utime(path, (mtime, mtime))
+    return path
+
+def close_args(watch_dir, out):
+    return argparse.Namespace(watch_dir=str(watch_dir), out=str(out), merge_names=False, title="T {batch}", summary_title="S", output_name="R {batch}",
+                              yellow=40, green=70, date="01-11-2026", per_student=False, jobs=1, profile="mobile", report_cards=None)
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / "drop"
+    folder.mkdir()
+    return str(folder)
+
+def totals(ledger):
+    return ledger.snapshot()[0].drop(columns="Key").values.tolist()
+
+def test_new_exports_are_filed_under_the_given_month_not_their_dates(folder):
+    export(folder, "a.csv", {"riya": 8, "amit": 5})
+    ledgers = {}
+    assert watch.poll(folder, ledgers, set(), "2026-10") == {"2026-10"}
+    assert list(ledgers) == ["2026-10"] and len(ledgers["2026-10"].per_file_data) == 1
+
+def test_a_resaved_export_replaces_its_version_in_its_own_month(folder):
+    export(folder, "a.csv", {"riya": 8, "amit": 5})
+    export(folder, "b.csv", {"riya": 6})
+    ledgers = {}
+    watch.poll(folder, ledgers, set(), "2026-10")
+    export(folder, "a.csv", {"riya": 9, "amit": 5, "neha": 7}, mtime=OLD + 60)
+    assert [(name, month) for name, _, _, month in watch.pending_files(folder, ledgers, "2026-11")] == [("a.csv", "2026-10")]
+    assert watch.poll(folder, ledgers, set(), "2026-11") == {"2026-10"}
+    ledger = ledgers["2026-10"]
+    expected, _ = scoring.aggregate_scores([scoring.parse_score_file(os.path.join(folder, n)) for n in ("a.csv", "b.csv")])
+    pd.testing.assert_frame_equal(ledger.snapshot()[0], expected)
+    assert list(ledgers) == ["2026-10"] and len(ledger.per_file_data) == 2 and watch.pending_files(folder, ledgers, "2026-11") == []
+
+def test_a_late_copy_of_an_export_is_skipped(folder):
+    export(folder, "a.csv", {"riya": 8})
+    ledgers = {}
+    watch.poll(folder, ledgers, set(), "2026-10")
+    export(folder, "a copy.csv", {"riya": 8})
+    watch.poll(folder, ledgers, set(), "2026-11")
+    assert ledgers["2026-11"].per_file_data == [] and watch.pending_files(folder, ledgers, "2026-11") == []
+
+def test_ledgers_are_json_kept_outside_the_watch_folder(folder):
+    export(folder, "a.csv", {"riya": 8.25, "amit": 5})
+    export(folder, "b.csv", {"amit": 0.1, "neha": 0.2})
+    ledgers = {}
+    watch.poll(folder, ledgers, set(), "2026-10")
+    ledgers["2026-10"].save(folder)
+    path = watch.ledger_path(folder, "2026-10")
+    assert not path.startswith(os.path.realpath(folder)) and sorted(os.listdir(folder)) == ["a.csv", "b.csv"]
+    with open(os.path.join(folder, "2026-09.json"), "w") as f: f.write("planted")   # never read: not the ledger folder
+    loaded = watch.load_ledgers(folder)
+    assert list(loaded) == ["2026-10"] and loaded["2026-10"].files == ledgers["2026-10"].files
+    assert totals(loaded["2026-10"]) == totals(ledgers["2026-10"])
+    assert not watch.pending_files(folder, loaded, "2026-10")
+
+def test_closing_a_month(folder, tmp_path):
+    export(folder, "a.csv", {"riya": 8, "amit": 5})
+    ledgers = {}
+    watch.poll(folder, ledgers, set(), "2026-10")
+    ledger = ledgers["2026-10"]
+    result = watch.close_month(ledger, close_args(folder, tmp_path / "out"), None)
+    assert ledger.closed and watch.load_ledgers(folder)["2026-10"].closed
+    assert [os.path.basename(p) for p in result["outputs"]][0] == "R 2026-10.pdf" and all(os.path.exists(p) for p in result["outputs"])
+    assert history.load_results("2026-10")['Name'].tolist() == ["Riya", "Amit"]
+    # Once closed, a changed export is a new export of the month it arrives in
+    export(folder, "a.csv", {"riya": 9, "amit": 5}, mtime=OLD + 60)
+    assert watch.poll(folder, ledgers, set(), "2026-11") == {"2026-11"}
+    assert len(ledger.per_file_data) == 1 and len(ledgers["2026-11"].per_file_data) == 1
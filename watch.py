@@ -0,0 +1,355 @@
+"""Watch-folder daemon: test exports are ingested as they arrive, so month-end needs no aggregation.
+
+Usage:
+    python watch.py WATCH_DIR [--out reports] [--interval 10] [--once] [--month YYYY-MM] [--close-month YYYY-MM]
+                    [--no-auto-close] [--title ...] [--summary-title ...] [--output-name ...]
+                    [--green 70] [--yellow 40] [--date DD-MM-YYYY] [--merge-names]
+                    [--per-student] [--report-cards zip|pdf] [--profile print|mobile]
+                    [--offline] [--asset-dir DIR] [--serve PORT]
+
+Every poll looks for CSVs it has not seen yet. Each new file is parsed once, on arrival
+(scoring.parse_score_file) and added to its month's ledger. The ledger keeps running
+per-student totals, present counts and total_max_marks, updated in place. After every arrival
+the month's out_df snapshot, ranks included, is rebuilt from those totals. It is therefore
+always current, and is printed as a one-line status.
+
+A file is only read once it has stopped changing for SETTLE_SECONDS. A new export belongs to the
+month the daemon first sees it in (the clock at that poll, not the file's own dates), or to the
+month given with --month or --close-month. The month it was filed under is recorded in the
+ledger: while that month is open, saving the export again replaces its earlier version there,
+and a copy of an export some month already holds is skipped. A month is closed once the calendar
+has moved past it (unless --no-auto-close), or straight away with --close-month; an export of a
+closed month that changes after that is a new export of the month it then arrives in. Closing saves it to the history store and renders its
+report and certificates (pipeline.render_outputs) from memory, with no CSV read again.
+"{batch}" in any title or name becomes the month. --serve also runs the result lookup service
+(lookup.py) in the daemon, answering from the newest snapshot the moment it is built.
+
+With --merge-names, spellings of one student (identity.py) are merged once, when the month is
+closed: resolving has to look at the whole month, so doing it on every arrival would cost a full
+rebuild each time. Until then the status line and the lookup service show names as typed.
+
+Each ledger is saved after every arrival, so a restarted daemon carries on without re-parsing
+anything. Ledgers live in a private folder per watch folder under SCORECARD_STATE_DIR (default
+~/.cache/murlidhar-scorecard/watch), never in the watch folder, which others can write to. They
+are plain JSON (the parsed tests; the totals are rebuilt from them on load), so reading one can
+never run code.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+import argparse
+import datetime
+
+import numpy as np
+import pandas as pd
+
+import assets
+import history
+import identity
+import instrument
+import pipeline
+import lookup
+from config import ASSET_IDS, OUTPUT_PROFILES, DEFAULT_PROFILE
+from scoring import parse_score_file, results_table, aggregate_scores_cached
+
+SETTLE_SECONDS = 5            # a file still being copied in is left for the next poll
+STATE_DIR = os.environ.get("SCORECARD_STATE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "murlidhar-scorecard", "watch"))
+LEDGER_FORMAT = 1
+
+
+class MonthLedger:
+    """One month of tests as they arrive, with its per-student totals kept up to date."""
+
+    def __init__(self, month):
+        self.month = month
+        self.closed = False
+        self.files = {}            # file name -> (size, mtime_ns, digest) as ingested
+        self.per_file_data = []    # parsed tests, in arrival order
+        self._reset_totals()
+
+    def _reset_totals(self):
+        self.students = pd.Index([], dtype=object)   # normalized names, first-seen order (as aggregate_scores)
+        self.obtained = np.zeros(0)
+        self.present = np.zeros(0, dtype=int)
+        self.total_max_marks = 0.0
+        self._snapshot = None
+
+    def _add_totals(self, parsed):
+        scores = parsed['scores']
+        codes = self.students.get_indexer(scores.index)
+        new = scores.index[codes < 0]
+        if len(new):
+            self.students = self.students.append(pd.Index(new, dtype=object))
+            self.obtained = np.concatenate([self.obtained, np.zeros(len(new))])
+            self.present = np.concatenate([self.present, np.zeros(len(new), dtype=int)])
+            codes = self.students.get_indexer(scores.index)
+        # Names are unique within a test, so plain fancy-index adds are safe; one test at a time,
+        # in arrival order, is the same float order aggregate_scores() sums in
+        self.obtained[codes] += scores.to_numpy(dtype=float)
+        self.present[codes] += 1
+        self.total_max_marks += parsed['file_max']
+
+    def add(self, file_name, stat, parsed):
+        """Ingests one parsed export; returns "new", "replaced" or "duplicate"."""
+        previous = self.files.get(file_name)
+        self.files[file_name] = (stat.st_size, stat.st_mtime_ns, parsed['digest'])
+        digests = [f['digest'] for f in self.per_file_data]
+        if previous is not None and previous[2] in digests:
+            if previous[2] == parsed['digest']: return "duplicate"
+            # Saved again with new marks: swap the test in place and rebuild the totals from memory
+            self.per_file_data[digests.index(previous[2])] = parsed
+            self._reset_totals()
+            for f in self.per_file_data: self._add_totals(f)
+            return "replaced"
+        if parsed['digest'] in digests: return "duplicate"   # the same export under another name
+        self.per_file_data.append(parsed)
+        self._add_totals(parsed)
+        self._snapshot = None
+        return "new"
+
+    def seen(self, file_name, stat):
+        known = self.files.get(file_name)
+        return known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns)
+
+    def snapshot(self, resolve_names=False, aliases=None):
+        """(out_df, total_max_marks, per_file_data, merges) for the month so far; cached until the next arrival.
+
+        Without merges the table comes straight from the running totals. When identity.resolve()
+        does merge spellings (it has to see the whole month for that), the resolved tests are
+        aggregated from memory instead.
+        """
+        key = (resolve_names, tuple(sorted((aliases or {}).items())))
+        if self._snapshot is not None and self._snapshot[0] == key: return self._snapshot[1]
+        with instrument.stage("watch.snapshot", tests=len(self.per_file_data), students=len(self.students)):
+            merges = identity.no_decisions()
+            per_file_data = self.per_file_data
+            if resolve_names and per_file_data: per_file_data, merges = identity.resolve_cached(per_file_data, aliases)
+            if len(merges):
+                out_df, total_max_marks = aggregate_scores_cached(per_file_data)
+            else:
+                out_df = results_table(self.students.to_numpy(), self.present.copy(), self.obtained.copy(), len(self.per_file_data), self.total_max_marks)
+                total_max_marks = self.total_max_marks
+        self._snapshot = (key, (out_df, total_max_marks, per_file_data, merges))
+        return self._snapshot[1]
+
+    # ---------------- PERSISTENCE ----------------
+    def to_json(self):
+        tests = [{"file_max": f['file_max'], "digest": f['digest'], "names": f['scores'].index.tolist(), "scores": f['scores'].tolist()}
+                 for f in self.per_file_data]
+        return {"format": LEDGER_FORMAT, "month": self.month, "closed": self.closed, "files": self.files, "tests": tests}
+
+    @classmethod
+    def from_json(cls, state):
+        if state.get("format") != LEDGER_FORMAT: raise ValueError(f"unknown ledger format {state.get('format')!r}")
+        ledger = cls(history.check_month(state['month']))
+        ledger.closed = bool(state['closed'])
+        ledger.files = {name: tuple(known) for name, known in state['files'].items()}
+        for t in state['tests']:
+            scores = pd.Series(np.asarray(t['scores'], dtype=float), index=pd.Index(t['names'], dtype=object))
+            ledger.per_file_data.append({"file_max": float(t['file_max']), "scores": scores, "digest": t['digest']})
+            ledger._add_totals(ledger.per_file_data[-1])   # same order and sums as when the tests arrived
+        return ledger
+
+    def save(self, watch_dir):
+        path = ledger_path(watch_dir, self.month)
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding="utf-8") as f: json.dump(self.to_json(), f, separators=(",", ":"))
+        os.replace(tmp, path)   # a crash mid-write leaves the previous ledger intact
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f: return cls.from_json(json.load(f))
+
+def ledger_dir(watch_dir):
+    """The private folder watch_dir's ledgers are kept in (one per watch folder, outside it)."""
+    watch_dir = os.path.realpath(watch_dir)
+    tag = hashlib.sha256(watch_dir.encode()).hexdigest()[:12]
+    return os.path.join(STATE_DIR, f"{os.path.basename(watch_dir) or 'root'}-{tag}")
+
+def ledger_path(watch_dir, month):
+    return os.path.join(ledger_dir(watch_dir), f"{history.check_month(month)}.json")
+
+def ledger_files(watch_dir):
+    """[(month, mtime_ns)] of the ledgers saved for watch_dir."""
+    folder = ledger_dir(watch_dir)
+    if not os.path.isdir(folder): return []
+    return [(entry.name[:-len(".json")], entry.stat().st_mtime_ns) for entry in os.scandir(folder)
+            if entry.name.endswith(".json") and history.MONTH_RE.match(entry.name[:-len(".json")])]
+
+def load_ledgers(watch_dir):
+    """{month: MonthLedger} saved for watch_dir by an earlier run."""
+    return {month: MonthLedger.load(ledger_path(watch_dir, month)) for month, _ in ledger_files(watch_dir)}
+
+def filed_under(ledgers):
+    """{file name: month} of every export the ledgers hold; the latest month wins for a name filed twice."""
+    owners = {}
+    for month, ledger in sorted(ledgers.items()):
+        for name in ledger.files: owners[name] = month
+    return owners
+
+def pending_files(watch_dir, ledgers, month, now=None):
+    """[(file name, path, stat, month)] of settled exports not ingested in their current form, oldest first.
+
+    An export keeps the month its ledger filed it under; a new one (or a changed one whose month
+    is closed) goes to `month`.
+    """
+    now = time.time() if now is None else now
+    owners = filed_under(ledgers)
+    found = []
+    for entry in os.scandir(watch_dir):
+        if not entry.is_file() or not entry.name.lower().endswith(".csv"): continue
+        stat = entry.stat()
+        if now - stat.st_mtime < SETTLE_SECONDS: continue
+        owner = ledgers.get(owners.get(entry.name))
+        if owner is not None and owner.seen(entry.name, stat): continue
+        target = owner.month if owner is not None and not owner.closed else month
+        found.append((entry.name, entry.path, stat, target))
+    return sorted(found, key=lambda item: (item[2].st_mtime_ns, item[0]))
+
+def poll(watch_dir, ledgers, failed, month=None):
+    """Ingests every pending export; returns the months that changed. failed remembers unreadable files by (name, size, mtime).
+
+    New exports are filed under `month` (default: the current month).
+    """
+    changed = set()
+    for name, path, stat, target in pending_files(watch_dir, ledgers, month or history.current_month()):
+        if (name, stat.st_size, stat.st_mtime_ns) in failed: continue
+        ledger = ledgers.setdefault(target, MonthLedger(target))
+        if ledger.closed:
+            print(f"[{target}] {name} arrived after the month was closed; ignored", file=sys.stderr)
+            ledger.files[name] = (stat.st_size, stat.st_mtime_ns, None)
+            changed.add(target)
+            continue
+        try:
+            with instrument.stage("watch.ingest", files=1):
+                parsed = parse_score_file(path)
+        except Exception as e:
+            failed.add((name, stat.st_size, stat.st_mtime_ns))
+            print(f"[{target}] Error processing {name}: {e}", file=sys.stderr)
+            continue
+        elsewhere = [m for m, other in ledgers.items() if m != target and any(f['digest'] == parsed['digest'] for f in other.per_file_data)]
+        if elsewhere:
+            # A late copy of an export another month already holds
+            ledger.files[name] = (stat.st_size, stat.st_mtime_ns, None)
+            changed.add(target)
+            print(f"[{target}] {name}: duplicate of a {elsewhere[0]} export; skipped")
+            continue
+        outcome = ledger.add(name, stat, parsed)
+        changed.add(target)
+        print(f"[{target}] {name}: {outcome} ({len(parsed['scores'])} students, max {parsed['file_max']:g})")
+    return changed
+
+def status_line(ledger, out_df, total_max_marks):
+    top = f"  ·  top {out_df['Name'].iloc[0]} {out_df['Percentage'].iloc[0]}%" if len(out_df) else ""
+    return f"[{ledger.month}] {len(ledger.per_file_data)} tests, {len(out_df)} students, {int(total_max_marks)} marks" + top
+
+def close_month(ledger, args, aliases):
+    """Saves the month to history and renders its documents from the ledger; returns render_outputs()' summary."""
+    out_df, total_max_marks, per_file_data, merges = ledger.snapshot(args.merge_names, aliases)
+    if not per_file_data: raise ValueError(f"no tests were ingested for {ledger.month}")
+    out_dir = os.path.join(args.out, ledger.month)
+    result = pipeline.render_outputs(ledger.month, out_df, total_max_marks, per_file_data, merges, out_dir, args.title, args.summary_title,
+                                     args.output_name, args.yellow, args.green, args.date or datetime.date.today().strftime('%d-%m-%Y'), args.per_student, args.jobs, ledger.month,
+                                     args.profile, args.report_cards)
+    ledger.closed = True
+    ledger.save(args.watch_dir)
+    return result
+
+def _report_close(month, result):
+    stages = "  ".join(f"{k} {v:.2f}s" for k, v in result["timings"].items())
+    print(f"[{month}] closed: {result['students']} students  |  {stages}")
+    for line in pipeline.merge_lines(result["merges"]): print(line)
+    for path in result["outputs"]: print(f"    {path}")
+
+def run(args):
+    ledgers = load_ledgers(args.watch_dir)
+    aliases = pipeline.load_aliases() if args.merge_names else None
+    failed = set()
+    if args.serve:
+        server = lookup.serve(port=args.serve)
+        print(f"Lookup service on http://127.0.0.1:{server.server_address[1]}/")
+        open_months = [m for m, ledger in ledgers.items() if ledger.per_file_data]
+        if open_months:
+            newest = ledgers[max(open_months)]
+            lookup.publish(newest.snapshot()[0], f"ledger {newest.month} ({len(newest.per_file_data)} tests)")
+    if args.close_month:
+        # Anything that landed since the last poll still counts, even if it is the month's first file
+        for month in poll(args.watch_dir, ledgers, failed, args.close_month): ledgers[month].save(args.watch_dir)
+        ledger = ledgers.get(args.close_month)
+        if ledger is None: raise ValueError(f"no exports from {args.watch_dir} are filed under {args.close_month}")
+        _report_close(args.close_month, close_month(ledger, args, aliases))
+        return 0
+
+    while True:
+        run_record = instrument.start_run("watch", folder=os.path.basename(os.path.normpath(args.watch_dir)))
+        try:
+            for month in sorted(poll(args.watch_dir, ledgers, failed, args.month)):
+                ledger = ledgers[month]
+                ledger.save(args.watch_dir)
+                if not ledger.closed and ledger.per_file_data:
+                    out_df, total_max_marks, _, _ = ledger.snapshot()
+                    print(status_line(ledger, out_df, total_max_marks))
+                    if args.serve and month == max(ledgers): lookup.publish(out_df, f"ledger {month} ({len(ledger.per_file_data)} tests)")
+            current = history.current_month()
+            if not args.no_auto_close:
+                for month, ledger in sorted(ledgers.items()):
+                    if month < current and month != args.month and not ledger.closed and ledger.per_file_data:
+                        try:
+                            _report_close(month, close_month(ledger, args, aliases))
+                        except Exception as e:
+                            print(f"[{month}] closing failed: {e}", file=sys.stderr)
+        finally:
+            instrument.finish_run(run_record)
+        if args.once: return 0
+        time.sleep(args.interval)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest test exports as they land in a folder; close each month straight into its report and certificates.")
+    parser.add_argument("watch_dir", help="folder the daily test CSVs are saved into")
+    parser.add_argument("--out", default="reports", help="output folder; each month gets a sub-folder")
+    parser.add_argument("--interval", type=float, default=10, help="seconds between polls")
+    parser.add_argument("--once", action="store_true", help="poll once and exit (for cron)")
+    parser.add_argument("--month", default=None, help="YYYY-MM; file new exports under this month instead of the current one (it is not closed automatically)")
+    parser.add_argument("--close-month", default=None, help="YYYY-MM; file new exports under this month, close it now (render and save to history) and exit")
+    parser.add_argument("--no-auto-close", action="store_true", help="never close a month just because the calendar moved on")
+    parser.add_argument("--title", default=pipeline.DEFAULT_REPORT_TITLE, help="main report header (also printed on certificates)")
+    parser.add_argument("--summary-title", default=pipeline.DEFAULT_SUMMARY_TITLE)
+    parser.add_argument("--output-name", default=pipeline.DEFAULT_OUTPUT_NAME, help="report file name without .pdf")
+    parser.add_argument("--green", type=float, default=70, help="green zone, >= %%")
+    parser.add_argument("--yellow", type=float, default=40, help="yellow zone, >= %%")
+    parser.add_argument("--date", default=None, help="certificate date (default: the day the month is closed)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="render processes for the per-student files")
+    parser.add_argument("--per-student", action="store_true", help="also write a ZIP with one certificate PDF per awardee")
+    parser.add_argument("--report-cards", choices=("zip", "pdf"), default=None, help="also write every student's report card")
+    parser.add_argument("--merge-names", action="store_true", help="merge spellings of the same student (changes totals and ranks; merges are printed)")
+    parser.add_argument("--profile", choices=list(OUTPUT_PROFILES), default=DEFAULT_PROFILE, help="print quality, or small files for sharing on a phone")
+    parser.add_argument("--offline", action="store_true", default=assets.OFFLINE, help="never download images")
+    parser.add_argument("--asset-dir", default=None, help="local folder with the images (<name>.jpg or <drive id>.jpg)")
+    parser.add_argument("--serve", type=int, default=None, metavar="PORT", help="also serve result lookups (lookup.py) on this local port")
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.watch_dir): parser.error(f"{args.watch_dir} is not a folder")
+    try:
+        if args.month: args.month = history.check_month(args.month)
+        if args.close_month: args.close_month = history.check_month(args.close_month)
+    except ValueError as e:
+        parser.error(str(e))
+
+    assets.OFFLINE = args.offline
+    if args.asset_dir: assets.LOCAL_ASSET_DIR = args.asset_dir
+    assets.register_assets(ASSET_IDS)
+    missing = [name for name, data in assets.fetch_assets(ASSET_IDS).items() if not data]
+    if missing: print(f"Warning: images not available: {', '.join(missing)}", file=sys.stderr)
+    try:
+        return run(args)
+    except KeyboardInterrupt:
+        return 0
+    except (ValueError, OSError, sqlite3.Error) as e:
+        print(e, file=sys.stderr)
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())